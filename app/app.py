@@ -1,32 +1,82 @@
 # ---- Imports (deine bleiben bestehen; wichtig ist Response & PIL falls genutzt) ----
-from flask import Flask, render_template, request, redirect, url_for, send_file, abort, flash, Response, session, g
+from flask import Flask, render_template, stream_template, request, redirect, url_for, send_file, abort, flash, Response, session, g, jsonify, stream_with_context
 from datetime import datetime, timedelta, date
 from io import BytesIO
-import os, re, random, string, unicodedata, textwrap
-from PIL import Image, ImageDraw, ImageFont
+import hmac, os, re, json, random, secrets, string, unicodedata, textwrap, threading, time
+from functools import lru_cache, wraps
+from itertools import islice
 from urllib.parse import quote
 import csv
-from io import StringIO
-from .config import SITE_NAME, OWNER_NAME, IBAN, BIC, PRICE_EUR_A, PRICE_EUR_B, FEATURE_DAYS, FEATURE_GRACE_HOURS, ADMIN_TOKEN
-from .db import db, init_db
+from io import StringIO, BufferedReader, TextIOWrapper
+from .config import SITE_NAME, OWNER_NAME, IBAN, BIC, FEATURE_DAYS, FEATURE_GRACE_HOURS, ADMIN_TOKEN, WARMUP_RENDERERS
+from .config import AB_EXPERIMENT, DEDUP_POLICY, STREAM_CHUNK, HOUSEKEEPING_INTERVAL, INGEST_TOKEN, INGEST_PENDING_BLOCK, INGEST_REBUILD_MIN, ARCHIVE_POLICY
+from .config import ALERT_BASE_URL, IMG_MAX_AGE, RATE_LIMITS, RATE_LIMIT_MAX_KEYS, RATE_LIMIT_DB, BOT_CLICK_POLICY, BOT_BURST, BOT_BURST_WINDOW
+from .db import read_db, init_db, insert_click, prune_job_changes
 from .payment import make_epc_qr_png
-# PDF
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
+from .ratelimit import make_limiter, retry_after_header
+from .botfilter import ClickFilter
+from .conditional import conditional, latest, make_etag, parse_ts
+from . import compress
+from . import fragments
+from . import geo
+from . import similar
+from . import ingest
+from . import archive
+from . import clicklog
+from . import bankimport
+from . import experiments
+from . import orders as orders_console
+from . import invoices
+from .invoices import invoice_pdf_buffer
+from . import suggest
+from . import jobsapi
+from . import alerts
+from . import dedup
+from . import imgproxy
+from .facets import FacetIndex, mask_of, ids_of
+from .writer import writer, savepoint
+# Pillow, ReportLab und segno werden erst bei Bedarf importiert (og.png, Rechnungen, QR),
+# damit ein frischer Worker schneller bereit ist.
 
 app = Flask(__name__, template_folder="templates", static_folder="static")
 app.secret_key = os.getenv("FLASK_SECRET", "dev-secret")
+compress.init_app(app)
+fragments.init_app(app)
+imgproxy.init_app(app)
 def _client_ip() -> str:
     # hinter Proxy/Render/… nimmt er X-Forwarded-For, sonst remote_addr
     return (request.headers.get("X-Forwarded-For") or request.remote_addr or "").split(",")[0].strip()
 
+# --- Rate-Limiting ---
+limiter = make_limiter(RATE_LIMITS, shared_db=RATE_LIMIT_DB, max_keys=RATE_LIMIT_MAX_KEYS)
+
+def rate_limited(route_class: str, methods=None):
+    # unter @app.get/@app.route setzen; methods=None -> alle Methoden zählen
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if methods is None or request.method in methods:
+                wait = limiter.take(route_class, _client_ip())
+                if wait:
+                    return Response("Zu viele Anfragen — bitte kurz warten.\n", status=429,
+                                    mimetype="text/plain",
+                                    headers={"Retry-After": retry_after_header(wait)})
+            return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+# --- Bot-/Crawler-Filter für Klick-Logging ---
+click_filter = ClickFilter(burst=BOT_BURST, window=BOT_BURST_WINDOW)
+
 @app.context_processor
 def inject_site_name():
     # SITE_NAME aus der Config global in allen Templates verfügbar machen
     return dict(SITE_NAME=SITE_NAME)
 
 
+@lru_cache(maxsize=8)
 def _load_font(size: int):
+    from PIL import ImageFont
     # robuste Font-Suche (Windows/Linux/macOS), sonst Default
     for p in [
         "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
@@ -41,15 +91,90 @@ def _load_font(size: int):
                 pass
     return ImageFont.load_default()
 
+# --- Conditional Requests (ETag/Last-Modified aus Zeilenversionen) ---
+def _fetch_row(table: str, row_id: int):
+    with read_db() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SELECT * FROM {table} WHERE id=?", (row_id,))
+        return cur.fetchone()
+
+def _fetch_job(job_id: int):
+    # Checkout/Rechnung brauchen den Job auch nach der Archivierung
+    with read_db() as conn:
+        return archive.find_job(conn.cursor(), job_id)
+
+def _sponsor_parts():
+    # Sponsor-Banner steckt in base.html -> gehört in den ETag jeder HTML-Seite
+    s = current_active_sponsor()
+    return (s["id"], s.get("version", 0)) if s else ("-",)
+
+def similar_for(job_id: int):
+    # pro Request einmal lesen: ETag-Berechnung und Rendern nutzen dieselbe Liste
+    if "_similar" not in g:
+        with read_db() as conn:
+            g._similar = similar.similar_jobs(conn.cursor(), job_id)
+    return g._similar
+
+def job_page_version(job_id: int):
+    job = _fetch_row("jobs", job_id)
+    if not job or job["status"] != "published":
+        return None
+    sp = current_active_sponsor()
+    sim = tuple((r["id"], r["version"]) for r in similar_for(job_id))
+    return ((job_id, job.get("version", 0), featured_or_grace(job), sim, *_sponsor_parts()),
+            latest(job.get("updated_at"), job["created_at"], sp and sp.get("updated_at")))
+
+def job_og_version(job_id: int):
+    job = _fetch_row("jobs", job_id)
+    if not job:
+        return None
+    return (job_id, job.get("version", 0), SITE_NAME), latest(job.get("updated_at"), job["created_at"])
+
+def checkout_version(order_id: int):
+    order = _fetch_row("orders", order_id)
+    if not order:
+        return None
+    job = _fetch_job(order["job_id"]) if order["job_id"] else None
+    return ((order_id, order.get("version", 0), job and job.get("version", 0), *_sponsor_parts()),
+            latest(order.get("updated_at"), order["created_at"], job and job.get("updated_at")))
+
+def qr_version(order_id: int):
+    order = _fetch_row("orders", order_id)
+    if not order:
+        return None
+    # QR hängt nur an Betrag/Referenz/Bankdaten
+    return (order_id, order["price_cents"], order["reference"], IBAN, BIC, OWNER_NAME), parse_ts(order["created_at"])
+
+def invoice_version(order_id: int):
+    if request.endpoint == "order_invoice_pdf" and request.args.get("token", "") != ADMIN_TOKEN:
+        return None
+    order = _fetch_row("orders", order_id)
+    if not order:
+        return None
+    with read_db() as conn:
+        cur = conn.cursor()
+        if order["job_id"] != 0:
+            other = archive.find_job(cur, order["job_id"]) or {}
+        else:
+            cur.execute("SELECT version, updated_at FROM sponsors WHERE order_id=?", (order_id,))
+            other = cur.fetchone() or {}
+    # Rechnungsdatum = heute -> Tageswechsel invalidiert
+    today = datetime.utcnow().strftime("%Y-%m-%d")
+    return ((order_id, order.get("version", 0), other.get("version"), today),
+            latest(order.get("updated_at"), order["created_at"], other.get("updated_at"), today + " 00:00:00"))
+
 @app.get("/job/<int:job_id>/og.png")
+@conditional(job_og_version, "public, max-age=86400")
+@rate_limited("render")
 def job_og_image(job_id: int):
-    with db() as conn:
+    with read_db() as conn:
         cur = conn.cursor()
         cur.execute("SELECT * FROM jobs WHERE id=?", (job_id,))
         job = cur.fetchone()
         if not job:
             abort(404)
 
+    from PIL import Image, ImageDraw
     W, H = 1200, 630
     img = Image.new("RGB", (W, H), (7, 35, 72))
     draw = ImageDraw.Draw(img)
@@ -88,33 +213,58 @@ def job_og_image(job_id: int):
     bio.seek(0)
     return Response(bio.getvalue(), mimetype="image/png")
 
+@app.get("/img/<key>/<variant>")
+def img_proxy(key: str, variant: str):
+    # Logos/Banner über den eigenen Host: Treffer direkt von Platte, sonst einmal laden + skalieren
+    if variant not in imgproxy.VARIANTS or not imgproxy.KEY_RE.fullmatch(key):
+        abort(404)
+    fmt = "webp" if "image/webp" in request.headers.get("Accept", "") else "png"
+    hit = images.cached(key, variant, fmt)
+    if hit is None:
+        with read_db() as conn:
+            url = imgproxy.lookup(conn.cursor(), key)
+        if not url:
+            abort(404)
+        hit = images.produce(key, url, variant, fmt)
+        if hit is None:
+            abort(404)
+    path, sha = hit
+    resp = send_file(path, mimetype=imgproxy.MIMETYPES[fmt], etag=f"{sha[:16]}-{variant}-{fmt}",
+                     conditional=True, max_age=IMG_MAX_AGE)
+    # Inhalt zu einem Schlüssel ändert sich nicht (Original wird nur einmal geladen)
+    resp.headers["Cache-Control"] = f"public, max-age={IMG_MAX_AGE}, immutable"
+    resp.vary.add("Accept")
+    return resp
+
 @app.get("/job/<int:job_id>/apply")
+@rate_limited("apply")
 def job_apply(job_id: int):
     # Job laden
-    with db() as conn:
+    with read_db() as conn:
         cur = conn.cursor()
-        cur.execute("SELECT * FROM jobs WHERE id=?", (job_id,))
-        job = cur.fetchone()
+        job = archive.find_job(cur, job_id)
         if not job:
             abort(404)
+    if job.get("archived_at"):
+        # archiviert -> Detailseite entscheidet (410 oder Umleitung)
+        return redirect(url_for("job_detail", job_id=job_id))
 
-    email = (job["contact_email"] or "").strip()
+    email = (job.get("contact_email") or job.get("email") or "").strip()
     if not email:
         # Kein Kontakt hinterlegt -> zurück zur Detailseite
         return redirect(url_for("job_detail", job_id=job_id))
 
-    # Klick loggen (best effort)
-    try:
-        from .db import log_click
-        log_click(
-            job_id,
-            "apply",
-            _client_ip(),
-            request.headers.get("User-Agent", ""),
-            request.referrer or "",
-        )
-    except Exception:
-        pass
+    # Klick loggen (best effort) — Bots/Prefetcher vorher aussortieren
+    ip = _client_ip()
+    ua = request.headers.get("User-Agent", "")
+    bot = click_filter.classify(ua, ip, request.headers)
+    if bot and BOT_CLICK_POLICY == "drop":
+        click_filter.record(dropped=True)
+    else:
+        if bot:
+            click_filter.record(dropped=False)
+        # nicht auf den Commit warten; Fehler zählt der Writer (metrics)
+        writer.submit(insert_click, job_id, "apply_bot" if bot else "apply", ip, ua, request.referrer or "")
 
     # Mailto bauen
     subject = f"Bewerbung: {job['title']}"
@@ -136,10 +286,12 @@ def job_apply(job_id: int):
 """
     return Response(html, mimetype="text/html")
 
-@app.context_processor
-def inject_active_sponsor():
+def current_active_sponsor():
+    # pro Request einmal laden (Context-Processor + ETag-Berechnung)
+    if "_active_sponsor" in g:
+        return g._active_sponsor
     now = datetime.utcnow().isoformat(sep=" ", timespec="seconds")
-    with db() as conn:
+    with read_db() as conn:
         cur = conn.cursor()
         # 1) Aktiver Zeitraum
         cur.execute("""
@@ -162,11 +314,29 @@ def inject_active_sponsor():
               LIMIT 1
             """)
             s = cur.fetchone()
-    return dict(active_sponsor=s)
+    g._active_sponsor = s
+    return s
+
+@app.context_processor
+def inject_active_sponsor():
+    return dict(active_sponsor=current_active_sponsor())
 
 
+# Schema-Check ist ein No-op, wenn user_version schon aktuell ist
 init_db()
 
+def _warmup_renderers():
+    # optional: schwere Renderer im Hintergrund vorladen, statt beim ersten og.png/PDF/QR-Request
+    try:
+        import PIL.Image, PIL.ImageDraw, PIL.ImageFont  # noqa: F401
+        import reportlab.pdfgen.canvas, reportlab.lib.pagesizes  # noqa: F401
+        import segno.helpers  # noqa: F401
+    except Exception:
+        pass
+
+if WARMUP_RENDERERS:
+    threading.Thread(target=_warmup_renderers, name="warmup-renderers", daemon=True).start()
+
 def now():
     return datetime.utcnow()
 
@@ -175,28 +345,53 @@ def order_reference(order_id: int) -> str:
     return f"PYDACH-{order_id:05d}-{rand}"
 
 # --- A/B Preis Steuerung ---
+# Zuteilung deterministisch aus der Besucher-ID (Cookie "vid", siehe experiments.bucket);
+# ein gültiger alter "ab"-Cookie bleibt gültig, damit laufende Besucher ihren Preis behalten
+def visitor_id():
+    vid = request.cookies.get("vid") or getattr(g, "_set_vid", None)
+    if not vid or len(vid) > 64:
+        vid = g._set_vid = secrets.token_urlsafe(12)
+    return vid
+
 def current_ab_group():
     ab = request.cookies.get("ab")
-    if ab in ("A","B"):
+    if ab in experiments.PRICES:
         return ab, False
+    if getattr(g, "_set_ab_cookie", None):
+        return g._set_ab_cookie, True
     # neu zuweisen
-    ab = random.choice(("A","B"))
+    ab = experiments.bucket(visitor_id())
     g._set_ab_cookie = ab
     return ab, True
 
 def current_price_eur():
     ab, _ = current_ab_group()
-    return PRICE_EUR_A if ab == "A" else PRICE_EUR_B
+    return experiments.PRICES[ab]
+
+def price_context() -> dict:
+    # nur für Seiten, die den Preis zeigen (Formular, Admin): erst hier wird vid/ab vergeben ->
+    # öffentlich cachebare Seiten setzen keine Cookies
+    ab, _ = current_ab_group()
+    return dict(price_eur=current_price_eur(), ab_group=ab)
 
 @app.after_request
 def persist_ab_cookie(resp):
-    if hasattr(g, "_set_ab_cookie") and g._set_ab_cookie in ("A","B"):
+    minted = False
+    if getattr(g, "_set_ab_cookie", None) in experiments.PRICES:
         resp.set_cookie("ab", g._set_ab_cookie, max_age=60*60*24*90, samesite="Lax")
+        minted = True
+    if getattr(g, "_set_vid", None):
+        resp.set_cookie("vid", g._set_vid, max_age=60*60*24*365, samesite="Lax")
+        minted = True
+    if minted and resp.cache_control.public:
+        # Antwort mit persönlichem Cookie darf kein geteilter Cache ausliefern
+        resp.cache_control.public = False
+        resp.cache_control.private = True
     return resp
 
 # --- Sponsoring Helper ---
 def active_sponsor():
-    with db() as conn:
+    with read_db() as conn:
         cur = conn.cursor()
         cur.execute("""
             SELECT * FROM sponsors
@@ -209,31 +404,51 @@ def active_sponsor():
 
 @app.context_processor
 def inject_globals():
-    ab, _ = current_ab_group()
-    return dict(SITE_NAME=SITE_NAME, price_eur=current_price_eur(), ab_group=ab, current_sponsor=active_sponsor())
+    # Preis/Bucket bewusst nicht global (price_context): sonst bekäme jede Seite vid/ab-Cookies
+    return dict(SITE_NAME=SITE_NAME, current_sponsor=active_sponsor())
 
 # --- Housekeeping ---
+def _housekeeping_tx(cur):
+    cur.execute("""
+        UPDATE jobs
+        SET grace_expires_at = NULL
+        WHERE grace_expires_at IS NOT NULL
+          AND datetime(grace_expires_at) <= datetime('now')
+    """)
+    cur.execute(f"""
+        UPDATE jobs
+        SET is_featured = 0
+        WHERE is_featured = 1
+          AND NOT EXISTS (
+            SELECT 1 FROM orders o
+            WHERE o.job_id = jobs.id
+              AND o.status = 'paid'
+              AND o.paid_at > datetime('now', '-{FEATURE_DAYS} days')
+          )
+    """)
+    archive.archive_expired(cur)
+    clicklog.maintain(cur)
+    alerts.maintain(cur)
+    prune_job_changes(cur)
+
+_housekeeping_due = [0.0]
+
+# Job-Alerts: Versand im Hintergrund, DB-Zugriffe über den Writer
+alert_sender = alerts.Sender(writer.run, base_url=ALERT_BASE_URL)
+# Bild-Proxy: Plattencache + Worker-Pool für Abruf/Skalierung
+images = imgproxy.ImageCache()
+
 @app.before_request
 def housekeeping():
-    with db() as conn:
-        cur = conn.cursor()
-        cur.execute("""
-            UPDATE jobs
-            SET grace_expires_at = NULL
-            WHERE grace_expires_at IS NOT NULL
-              AND datetime(grace_expires_at) <= datetime('now')
-        """)
-        cur.execute(f"""
-            UPDATE jobs
-            SET is_featured = 0
-            WHERE is_featured = 1
-              AND NOT EXISTS (
-                SELECT 1 FROM orders o
-                WHERE o.job_id = jobs.id
-                  AND o.status = 'paid'
-                  AND o.paid_at > datetime('now', '-{FEATURE_DAYS} days')
-              )
-        """)
+    # Ablauf von Grace/Featured braucht keine Sekundengenauigkeit: höchstens alle
+    # HOUSEKEEPING_INTERVAL Sekunden, asynchron über den Writer (Request wartet nicht)
+    t = time.monotonic()
+    if t < _housekeeping_due[0]:
+        return
+    _housekeeping_due[0] = t + HOUSEKEEPING_INTERVAL
+    writer.submit(_housekeeping_tx)
+    alert_sender.kick()  # u. a. Treffer aus Feed-Importen
+    images.kick_evict()
 
 # --- Marketing Helpers ---
 def slugify(s: str) -> str:
@@ -268,12 +483,94 @@ SKILL_LABEL = { "django":"Django","flask":"Flask","fastapi":"FastAPI","pandas":"
                 "pytorch":"PyTorch","tensorflow":"TensorFlow","spark":"Apache Spark","airflow":"Apache Airflow","kafka":"Apache Kafka",
                 "kubernetes":"Kubernetes","docker":"Docker","aws":"AWS","azure":"Azure","gcp":"Google Cloud (GCP)","sql":"SQL","etl":"ETL","mlops":"MLOps","nlp":"NLP"}
 
+RADIUS_CHOICES = (10, 25, 50, 100)
+
+def radius_km_arg():
+    # ?km=50 -> 50.0; ungültig/leer -> None
+    try:
+        km = float(request.args.get("km", "") or 0)
+    except ValueError:
+        return None
+    return min(km, geo.MAX_RADIUS_KM) if km > 0 else None
+
+def jobs_near(city_slug: str, km: float):
+    c = geo.city(city_slug)
+    if not c:
+        return None
+    with read_db() as conn:
+        return geo.jobs_within(conn.cursor(), c["lat"], c["lon"], km)
+
+def _job_skill_slugs(j):
+    return job_skills(f"{j['title']} {j.get('description','')}")
+
+# Bitset-Facetten über alle Jobs (pro Prozess, inkrementell über job_changes)
+facet_index = FacetIndex({
+    "city": lambda j: location_variants(j.get("location", "") or ""),
+    "skill": _job_skill_slugs,
+})
+
+def _suggest_terms(j):
+    title = " ".join((j.get("title") or "").split())[:80]
+    company = " ".join((j.get("company") or "").split())[:80]
+    terms = {(k, v) for k, v in (("title", title), ("company", company)) if v}
+    return terms | {("skill", SKILL_LABEL.get(s, s.title())) for s in _job_skill_slugs(j)}
+
+# Autovervollständigung (/api/suggest), ebenfalls inkrementell über job_changes
+suggester = suggest.Suggester({
+    "q": _suggest_terms,
+    "loc": lambda j: {("city", city_display(s, j.get("location", ""))) for s in location_variants(j.get("location", "") or "")},
+})
+
 def collect_jobs():
-    with db() as conn:
+    with read_db() as conn:
         cur = conn.cursor()
         cur.execute("SELECT * FROM jobs WHERE status='published' ORDER BY created_at DESC")
         return cur.fetchall()
 
+def listing_order(ids):
+    # schmale Zeilen (ohne Beschreibung) in Listing-Reihenfolge: Featured/Grace zuerst, dann created_at
+    ids = list(ids)
+    rows = []
+    with read_db() as conn:
+        cur = conn.cursor()
+        for start in range(0, len(ids), 900):
+            chunk = ids[start:start + 900]
+            cur.execute(f"""SELECT id, is_featured, grace_expires_at, created_at, location FROM jobs
+                            WHERE status='published' AND id IN ({','.join('?' * len(chunk))})""", chunk)
+            rows.extend(cur.fetchall())
+    rows.sort(key=lambda j: (not featured_or_grace(j), j["created_at"], -j["id"]))
+    return rows
+
+def iter_jobs(ids, chunk: int = STREAM_CHUNK):
+    # volle Zeilen blockweise in vorgegebener Reihenfolge; läuft erst beim Streamen des Templates
+    ids = list(ids)
+    with read_db() as conn:
+        cur = conn.cursor()
+        for start in range(0, len(ids), chunk):
+            part = ids[start:start + chunk]
+            cur.execute(f"SELECT * FROM jobs WHERE id IN ({','.join('?' * len(part))})", part)
+            rows = {r["id"]: r for r in cur.fetchall()}
+            for job_id in part:
+                if job_id in rows:
+                    yield rows[job_id]
+
+def iter_query(sql: str, params=(), chunk: int = STREAM_CHUNK):
+    with read_db() as conn:
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(chunk)
+            if not rows:
+                return
+            yield from rows
+
+def render_listing(template: str, **context):
+    # Kopf, Filter und Chips gehen sofort raus, die Job-Liste folgt blockweise.
+    # Flash-Meldungen verlassen die Session erst beim Rendern -> dann klassisch rendern
+    if session.get("_flashes"):
+        return render_template(template, **context)
+    return stream_template(template, **context)
+
 CITY_STOP = {"de","ch","at","dach","remote","homeoffice","hybrid","gmbh","ag"}
 
 def valid_city_token(raw: str) -> bool:
@@ -310,9 +607,15 @@ def valid_city_token(raw: str) -> bool:
 
     return True
 
+@lru_cache(maxsize=8192)
 def location_variants(loc: str):
     if not loc:
-        return []
+        return ()
+    # 1) Gazetteer: "München", "Muenchen", "Munich" -> ein kanonischer Slug
+    known = geo.resolve_city_slugs(loc)
+    if known:
+        return known
+    # 2) Fallback für Orte, die nicht im Gazetteer stehen: Heuristik pro Fragment
     parts = re.split(r"[,\-/|–—]+", loc)
     out = []
     for p in parts:
@@ -320,7 +623,16 @@ def location_variants(loc: str):
             s = slugify(p.strip())
             if s and s not in out:
                 out.append(s)
-    return out
+    return tuple(out)
+
+def city_display(slug: str, loc_label: str = "") -> str:
+    c = geo.city(slug)
+    if c:
+        return c["name"]
+    for part in re.split(r"[,\-/|–—]+", loc_label or ""):
+        if slugify(part) == slug:
+            return part.strip().title()
+    return slug.title()
 
 
 def job_skills(text: str):
@@ -346,41 +658,46 @@ def featured_or_grace(job) -> bool:
 def index():
     q = request.args.get("q", "").strip().lower()
     loc = request.args.get("loc", "").strip().lower()
-    jobs = collect_jobs()
+    skill = request.args.get("skill", "").strip().lower()
+    km = radius_km_arg()
+
+    # Umkreis: "loc" als Gazetteer-Stadt auflösen, dann Raster-Index statt Teilstring-Suche
+    near = None
+    if loc:
+        centers = geo.resolve_city_slugs(loc)
+        if centers:
+            # ohne Radius: Stadt-Facette -> "Munich" findet auch "München" (Vorschläge sind kanonisch)
+            near = jobs_near(centers[0], km) if km else set(ids_of(facet_index.sync().get("city", centers[0])))
 
     def match(j):
         ok = True
         if q:
             ok = q in j["title"].lower() or q in j["company"].lower() or q in (j["description"] or "").lower()
         if ok and loc:
-            ok = loc in (j.get("location","") or "").lower()
+            if near is not None and j["id"] in near:
+                ok = True
+            else:
+                # Umkreissuche ist exakt, sonst zusätzlich Teilstring (Orte außerhalb des Gazetteers)
+                ok = not (km and near is not None) and loc in (j.get("location","") or "").lower()
         return ok
 
-    jobs = [j for j in jobs if match(j)]
-    jobs.sort(key=lambda j: (not featured_or_grace(j), j["created_at"]), reverse=False)
-
-    # Cities
-    city_counts = {}
-    for j in jobs:
-        for ls in location_variants(j.get("location","")):
-            if ls:
-                city_counts[ls] = city_counts.get(ls, 0) + 1
-    city_name = {}
-    for j in jobs:
-        loc_label = j.get("location") or ""
-        for part in re.split(r"[,\-/|–—]+", loc_label):
-            s = slugify(part)
-            if s and s not in city_name:
-                city_name[s] = part.strip().title()
-    top_cities = sorted([(s, city_name.get(s, s.title()), c) for s,c in city_counts.items()], key=lambda x: x[2], reverse=True)[:12]
-
-    # Skills
-    skill_counts = {}
-    for j in jobs:
-        txt = f"{j['title']} {j.get('description','')}"
-        for s in job_skills(txt):
-            skill_counts[s] = skill_counts.get(s, 0) + 1
-    top_skills = sorted([(s, SKILL_LABEL.get(s, s.title()), c) for s,c in skill_counts.items()], key=lambda x: x[2], reverse=True)[:12]
+    # Facetten per Bitset: Maske der Treffer, optional mit Skill geschnitten.
+    # Suche: nur die Such-Spalten blockweise prüfen, es bleiben nur IDs im Speicher
+    fx = facet_index.sync()
+    if near is not None and km and not q:
+        # reine Umkreissuche ist exakt: Raster-Treffer direkt, kein Scan
+        mask = mask_of(near) & fx.published()
+    elif q or loc:
+        hits = (j["id"] for j in iter_query(
+            "SELECT id, title, company, description, location FROM jobs WHERE status='published'") if match(j))
+        mask = mask_of(hits)
+    else:
+        mask = fx.published()
+    if skill:
+        mask &= fx.get("skill", skill)
+    jobs = iter_jobs(j["id"] for j in listing_order(ids_of(mask)))
+    top_cities = [(s, city_display(s), c) for s, c in fx.counts("city", mask, 12)]
+    top_skills = [(s, SKILL_LABEL.get(s, s.title()), c) for s, c in fx.counts("skill", mask, 12)]
 
     # ✅ Meta-Infos (fixiert)
     meta_title = f"{SITE_NAME} — Aktuelle Python-Jobs (DACH)"
@@ -388,11 +705,14 @@ def index():
     meta_img   = url_for("static", filename="og.png", _external=True)
 
     # ✅ Render: Meta-Parameter nur einmal übergeben
-    return render_template(
+    return render_listing(
         "index.html",
         jobs=jobs,
         top_cities=top_cities,
         top_skills=top_skills,
+        skill=skill,
+        km=km,
+        radius_choices=RADIUS_CHOICES,
         meta_title=meta_title,
         meta_desc=meta_desc,
         meta_img=meta_img,
@@ -400,6 +720,149 @@ def index():
 
 
 
+@app.get("/api/suggest")
+def api_suggest():
+    # ?field=q|loc&prefix=… -> häufigste Begriffe mit diesem Präfix; pro Präfix cachebar
+    field = request.args.get("field", "q")
+    if field not in suggest.FIELDS:
+        abort(400)
+    prefix = request.args.get("prefix", "")
+    items = suggester.sync().suggest(field, prefix)
+    resp = jsonify(field=field, prefix=prefix, suggestions=[dict(value=v, kind=k, count=n) for v, k, n in items])
+    resp.headers["Cache-Control"] = "public, max-age=60"
+    resp.set_etag(make_etag(field, suggest.normalize(prefix), *items))
+    return resp.make_conditional(request)
+
+
+# --- Lese-API für Partner ---
+API_COMPUTED = {
+    "skills": lambda j: sorted(_job_skill_slugs(j)),
+    "cities": lambda j: list(location_variants(j.get("location", "") or "")),
+    "url": lambda j: url_for("job_detail", job_id=j["id"], _external=True),
+}
+
+API_LINK_ARGS = ("fields", "skill", "city", "since", "limit", "format")
+
+def api_jobs_version():
+    # jede Job-Änderung landet in job_changes -> höchste seq + Anfrage = Validator
+    with read_db() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT COALESCE(MAX(seq), 0) AS s FROM job_changes")
+        seq = cur.fetchone()["s"]
+    return (request.host_url, tuple(sorted(request.args.items(multi=True))), request.accept_mimetypes.best, seq), None
+
+@app.get("/api/jobs")
+@rate_limited("api")
+@conditional(api_jobs_version, "public, max-age=30")
+def api_jobs():
+    try:
+        fields = jobsapi.parse_fields(request.args.get("fields", ""))
+        since = jobsapi.parse_since(request.args.get("since", ""))
+        cursor = request.args.get("cursor", type=int)
+        limit = min(max(request.args.get("limit", jobsapi.DEFAULT_LIMIT, type=int), 1), jobsapi.MAX_LIMIT)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    skill = request.args.get("skill", "").strip().lower()
+    city = request.args.get("city", "").strip().lower()
+
+    # Skill/Stadt über die Bitset-Facetten -> nur passende IDs lesen
+    ids = None
+    if skill or city:
+        fx = facet_index.sync()
+        mask = fx.published()
+        if skill:
+            mask &= fx.get("skill", skill)
+        if city:
+            mask &= fx.get("city", geo.canonical_slug(city) or slugify(city))
+        ids = ids_of(mask)
+    cols = jobsapi.select_columns(fields)
+
+    if request.args.get("format") == "ndjson" or request.accept_mimetypes.best == "application/x-ndjson":
+        # Massenabzug: alles ab Cursor, zeilenweise gestreamt
+        def lines():
+            with read_db() as conn:
+                for row in jobsapi.iter_rows(conn.cursor(), cols, since, cursor, ids):
+                    yield json.dumps(jobsapi.project(row, fields, API_COMPUTED), ensure_ascii=False) + "\n"
+        return Response(stream_with_context(lines()), mimetype="application/x-ndjson")
+
+    with read_db() as conn:
+        rows = list(islice(jobsapi.iter_rows(conn.cursor(), cols, since, cursor, ids), limit + 1))
+    more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = rows[-1]["id"] if more else None
+    # nur bekannte Parameter weiterreichen: Client-Keys wie _external/_anchor gehören nicht in url_for
+    args = {k: v for k in API_LINK_ARGS if (v := request.args.get(k))}
+    args["cursor"] = next_cursor
+    return jsonify(jobs=[jobsapi.project(r, fields, API_COMPUTED) for r in rows], count=len(rows),
+                   next_cursor=next_cursor,
+                   next=url_for("api_jobs", _external=True, **args) if more else None)
+
+
+# --- Job-Alerts ---
+@app.post("/alerts")
+@rate_limited("write")
+def alert_new():
+    # gespeicherte Suche aus dem Suchformular der Startseite
+    email = request.form.get("email", "").strip()
+    q = request.form.get("q", "").strip()[:100]
+    loc = request.form.get("loc", "").strip()[:100]
+    skill = request.form.get("skill", "").strip().lower()
+    back = url_for("index", **{k: v for k, v in dict(q=q, loc=loc, skill=skill).items() if v})
+    if request.form.get("homepage"):
+        return redirect(back)
+    if not ingest._EMAIL_RE.match(email) or (skill and skill not in SKILLS):
+        flash("Bitte eine gültige E-Mail-Adresse angeben.", "error")
+        return redirect(back)
+    if not alerts.alert_terms(q, loc, skill):
+        flash("Für einen Alert mindestens Stichwort, Ort oder Skill angeben.", "error")
+        return redirect(back)
+    alert = writer.run(alerts.subscribe, email, q, loc, skill)
+    if alert["status"] == "active":
+        flash("Diesen Alert gibt es schon – neue passende Jobs kommen per E-Mail.", "success")
+    else:
+        alert_sender.send_confirm(alert)  # auch erneut, falls die erste Mail verloren ging
+        flash("Fast geschafft: bitte den Link in der Bestätigungsmail anklicken.", "success")
+    return redirect(back)
+
+# Bestätigen/Abbestellen: GET zeigt nur ein Formular (Link-Scanner in Mail-Clients rufen Links ab),
+# erst der POST ändert etwas. POST /alerts/off/<token> ist zugleich das RFC-8058-One-Click-Ziel.
+def _alert_page(token: str, action: str):
+    with read_db() as conn:
+        alert = alerts.lookup(conn.cursor(), token)
+    if not alert:
+        abort(404)
+    return (render_template("alert_action.html", alert=alert, what=alerts.describe(alert), action=action, token=token),
+            200, {"Cache-Control": "no-store"})
+
+@app.get("/alerts/confirm/<token>")
+def alert_confirm_form(token: str):
+    return _alert_page(token, "confirm")
+
+@app.post("/alerts/confirm/<token>")
+@rate_limited("write")
+def alert_confirm(token: str):
+    if writer.run(alerts.confirm, token):
+        flash("Alert bestätigt – neue passende Jobs kommen per E-Mail.", "success")
+    else:
+        flash("Alert nicht gefunden oder schon bestätigt.", "error")
+    return redirect(url_for("index"))
+
+@app.get("/alerts/off/<token>")
+def alert_unsubscribe_form(token: str):
+    return _alert_page(token, "off")
+
+@app.post("/alerts/off/<token>")
+def alert_unsubscribe(token: str):
+    ok = writer.run(alerts.unsubscribe, token)
+    if request.form.get("List-Unsubscribe") == "One-Click":
+        return ("", 200)  # Mail-Client, kein Browser
+    if ok:
+        flash("Alert abbestellt.", "success")
+    else:
+        flash("Alert nicht gefunden oder schon abbestellt.", "error")
+    return redirect(url_for("index"))
+
+
 # --- Anti-Spam helpers ---
 def is_bot_post(form_key_prefix: str) -> bool:
     # Honeypot
@@ -416,6 +879,7 @@ def is_bot_post(form_key_prefix: str) -> bool:
     return given != target
 
 @app.route("/jobs/new", methods=["GET", "POST"])
+@rate_limited("write", methods=("POST",))
 def post_job():
     if request.method == "POST":
         if is_bot_post("job"):
@@ -423,7 +887,7 @@ def post_job():
             # neue Aufgabe erzeugen und Formular erneut rendern
             a,b = random.randint(1,9), random.randint(1,9)
             session["captcha_job"] = a + b
-            return render_template("post_job.html", cap_a=a, cap_b=b)
+            return render_template("post_job.html", cap_a=a, cap_b=b, **price_context())
         title = request.form.get("title","").strip()
         company = request.form.get("company","").strip()
         location = request.form.get("location","").strip()
@@ -434,51 +898,101 @@ def post_job():
             flash("Titel, Unternehmen und Beschreibung sind Pflichtfelder.", "error")
             a,b = random.randint(1,9), random.randint(1,9)
             session["captcha_job"] = a + b
-            return render_template("post_job.html", cap_a=a, cap_b=b)
+            return render_template("post_job.html", cap_a=a, cap_b=b, **price_context())
         grace_until = (now() + timedelta(hours=FEATURE_GRACE_HOURS)).isoformat(sep=" ", timespec="seconds")
-        with db() as conn:
-            cur = conn.cursor()
+        # alles, was request/session braucht, vorher berechnen (der Writer läuft in einem eigenen Thread)
+        price_cents = int(round(current_price_eur() * 100))
+        ab = current_ab_group()[0]
+        skills = job_skills(f"{title} {description}")
+        sig = dedup.signature(title, company, description) if DEDUP_POLICY != "off" else b""
+
+        retry = []
+
+        def tx(cur):
+            # Dubletten: nur Jobs aus denselben LSH-Buckets vergleichen
+            dups = dedup.find(cur, sig)
+            if dups and DEDUP_POLICY == "reject":
+                return None, dups[0][0]
             cur.execute("""INSERT INTO jobs (title, company, location, email, logo_url, description, grace_expires_at)
                            VALUES (?,?,?,?,?,?,?)""",
                         (title, company, location, email, logo_url, description, grace_until))
             job_id = cur.lastrowid
-            price_cents = int(round(current_price_eur() * 100))
-            ab = current_ab_group()[0]
-            cur.execute("""INSERT INTO orders (job_id, price_cents, currency, reference, ab_group)
-                           VALUES (?,?,?,?,?)""", (job_id, price_cents, "EUR", "TEMP", ab))
+            imgproxy.register(cur, logo_url)
+            if sig:
+                dedup.store(cur, job_id, sig)
+                dedup.flag(cur, job_id, dups)
+            geo.index_job_geo(cur, job_id, location)
+            # ähnliche Jobs inkrementell nachziehen (Anzeige geht auch ohne); eigener Savepoint, damit ein
+            # Fehler keine halben Nachbarlisten hinterlässt. Fehlschlag -> Nacharbeiten-Queue wie beim Import
+            # (process_pending wiederholt, zählt attempts; Dead Letters in /admin/metrics.json)
+            try:
+                with savepoint(cur, "similar"):
+                    similar.update_job(cur, job_id, title, description, skills)
+            except Exception:
+                app.logger.exception("Ähnliche Jobs für Job %s fehlgeschlagen", job_id)
+                cur.execute("INSERT OR IGNORE INTO ingest_pending (job_id) VALUES (?)", (job_id,))
+                retry.append(job_id)
+            alerts.percolate(cur, job_id, alerts.job_terms(title, company, location, description, skills,
+                                                           geo.resolve_city_slugs(location)))
+            cur.execute("""INSERT INTO orders (job_id, price_cents, currency, reference, ab_group, experiment)
+                           VALUES (?,?,?,?,?,?)""", (job_id, price_cents, "EUR", "TEMP", ab, AB_EXPERIMENT))
             order_id = cur.lastrowid
-            ref = order_reference(order_id)
-            cur.execute("UPDATE orders SET reference=? WHERE id=?", (ref, order_id))
+            cur.execute("UPDATE orders SET reference=? WHERE id=?", (order_reference(order_id), order_id))
+            return order_id, None
+
+        order_id, dup_of = writer.run(tx)
+        if dup_of:
+            flash(f"Diese Anzeige ist bereits online (siehe Job #{dup_of}). Bitte keine Dubletten einstellen.", "error")
+            a,b = random.randint(1,9), random.randint(1,9)
+            session["captcha_job"] = a + b
+            return render_template("post_job.html", cap_a=a, cap_b=b, **price_context())
+        if retry:
+            queue_pending()
+        alert_sender.kick()
         return redirect(url_for("checkout", order_id=order_id))
     # GET → captcha erzeugen
     a,b = random.randint(1,9), random.randint(1,9)
     session["captcha_job"] = a + b
-    return render_template("post_job.html", cap_a=a, cap_b=b, meta_title=f"Job einstellen — {SITE_NAME}")
+    return render_template("post_job.html", cap_a=a, cap_b=b, **price_context(), meta_title=f"Job einstellen — {SITE_NAME}")
+
+def archived_job_response(job):
+    # ARCHIVE_POLICY: "redirect" -> Stadtseite (sonst Startseite), sonst 410 mit Hinweisseite
+    slugs = location_variants(job.get("location") or "")
+    city_url = url_for("city_page", city_slug=slugs[0]) if slugs else None
+    if ARCHIVE_POLICY == "redirect":
+        return redirect(city_url or url_for("index"), code=301)
+    html = render_template("job_gone.html", job=job, city_url=city_url,
+                           city_name=city_display(slugs[0], job.get("location") or "") if slugs else "",
+                           meta_title=f"Stelle nicht mehr verfügbar — {SITE_NAME}")
+    return Response(html, status=410, headers={"Cache-Control": "public, max-age=3600"})
 
 @app.get("/job/<int:job_id>")
+@conditional(job_page_version, "public, max-age=60")
 def job_detail(job_id: int):
-    with db() as conn:
+    with read_db() as conn:
         cur = conn.cursor()
-        cur.execute("SELECT * FROM jobs WHERE id=?", (job_id,))
-        job = cur.fetchone()
+        job = archive.find_job(cur, job_id)
+    if job and job.get("archived_at"):
+        return archived_job_response(job)
     if not job or job["status"] != "published":
         abort(404)
     return render_template("job_detail.html",
                            job=job,
                            featured=featured_or_grace(job),
+                           similar_jobs=similar_for(job_id),
                            meta_title=f"{job['title']} — {job['company']} | {SITE_NAME}",
                            meta_desc=(job.get('description','')[:160] or f"Job bei {job['company']}"))
 
 @app.get("/checkout/<int:order_id>")
+@conditional(checkout_version, "private, no-cache")
 def checkout(order_id: int):
-    with db() as conn:
+    with read_db() as conn:
         cur = conn.cursor()
         cur.execute("SELECT * FROM orders WHERE id=?", (order_id,))
         order = cur.fetchone()
         if not order:
             abort(404)
-        cur.execute("SELECT * FROM jobs WHERE id=?", (order["job_id"],))
-        job = cur.fetchone()
+        job = archive.find_job(cur, order["job_id"])
     amount = order["price_cents"] / 100.0
     return render_template("checkout.html",
                            order=order, job=job,
@@ -487,8 +1001,10 @@ def checkout(order_id: int):
                            meta_desc="Überweisung per EPC‑QR/GiroCode — schnell & ohne Gateway.")
 
 @app.get("/checkout/<int:order_id>/qr.png")
+@conditional(qr_version, "private, max-age=86400")
+@rate_limited("render")
 def checkout_qr(order_id: int):
-    with db() as conn:
+    with read_db() as conn:
         cur = conn.cursor()
         cur.execute("SELECT * FROM orders WHERE id=?", (order_id,))
         order = cur.fetchone()
@@ -505,17 +1021,20 @@ def admin():
     if token != ADMIN_TOKEN:
         abort(403)
 
-    with db() as conn:
+    with read_db() as conn:
         cur = conn.cursor()
 
         # --- Bewerben-Klicks (KPIs) ---
-        cur.execute("SELECT COUNT(*) AS n FROM clicks WHERE kind='apply'")
-        apply_total = (cur.fetchone() or {}).get("n", 0)
+        apply_total = clicklog.total_by_kind(cur, "apply")
 
+        # Roh-Partitionen + verdichtete Monate (click_daily)
         cur.execute("""
-            SELECT j.id, j.title, COUNT(c.id) AS n
+            SELECT j.id, j.title, SUM(c.n) AS n
             FROM jobs j
-            JOIN clicks c ON c.job_id = j.id AND c.kind='apply'
+            JOIN (SELECT job_id, COUNT(*) AS n FROM clicks WHERE kind='apply' GROUP BY job_id
+                  UNION ALL
+                  SELECT job_id, SUM(n) FROM click_daily WHERE kind='apply' GROUP BY job_id) c
+              ON c.job_id = j.id
             GROUP BY j.id
             ORDER BY n DESC
             LIMIT 20
@@ -529,42 +1048,21 @@ def admin():
         """)
         apply_7d = (cur.fetchone() or {}).get("n7", 0)
 
-        # --- Bestehende Admin-Auswertung ---
-        cur.execute("SELECT * FROM orders ORDER BY created_at DESC LIMIT 200")
-        orders = cur.fetchall()
+        # --- Bestellungen: eine Seite per Keyset, Job/Sponsor im selben JOIN ---
+        filters = orders_console.parse_filters(request.args)
+        before = request.args.get("before", type=int)
+        after = request.args.get("after", type=int)
+        console = orders_console.page(cur, filters, before=before, after=after)
 
-        jobs = {}
-        ids = [o["job_id"] for o in orders if o["job_id"] != 0]
-        if ids:
-            cur.execute(f"SELECT * FROM jobs WHERE id IN ({','.join(['?']*len(ids))})", tuple(set(ids)))
-            jobs = {j["id"]: j for j in cur.fetchall()}
-
-        # A/B-Report
-        cur.execute("""
-            SELECT COALESCE(ab_group,'—') AS ab,
-                   COUNT(*) AS orders,
-                   SUM(CASE WHEN status='paid' THEN 1 ELSE 0 END) AS paid,
-                   SUM(CASE WHEN status='paid' THEN price_cents ELSE 0 END) AS revenue_cents
-            FROM orders GROUP BY COALESCE(ab_group,'—') ORDER BY ab
-        """)
-        ab_report = []
-        for r in cur.fetchall():
-            o = r["orders"] or 0
-            p = r["paid"] or 0
-            ab_report.append(dict(
-                ab=r["ab"], orders=o, paid=p,
-                conv=round((p/o*100.0) if o else 0.0, 1),
-                revenue_eur=(r["revenue_cents"] or 0)/100.0
-            ))
+        # A/B-Report aus den laufenden Aggregaten (experiment_stats), eine Zeile je Arm
+        ab_report = experiments.report(cur)
 
         # KPIs gesamt & 7 Tage
         week_ago = (datetime.utcnow() - timedelta(days=7)).isoformat(sep=" ", timespec="seconds")
-        cur.execute("SELECT COUNT(*) AS c FROM orders")
-        total_orders = cur.fetchone()["c"]
-        cur.execute("SELECT COUNT(*) AS c FROM orders WHERE status='paid'")
-        paid_orders = cur.fetchone()["c"]
-        cur.execute("SELECT SUM(price_cents) AS s FROM orders WHERE status='paid'")
-        revenue_total = (cur.fetchone()["s"] or 0)/100.0
+        totals = experiments.totals(cur)
+        total_orders = totals["orders"]
+        paid_orders = totals["paid"]
+        revenue_total = totals["revenue_cents"]/100.0
         cur.execute("SELECT COUNT(*) AS c FROM orders WHERE created_at >= ?", (week_ago,))
         orders_7d = cur.fetchone()["c"]
         cur.execute("SELECT SUM(price_cents) AS s FROM orders WHERE status='paid' AND paid_at >= ?", (week_ago,))
@@ -577,24 +1075,20 @@ def admin():
             conv_total=round((paid_orders/total_orders*100.0) if total_orders else 0.0, 1),
         )
 
-    for o in orders:
-        o["job"] = jobs.get(o["job_id"])
-        o["amount"] = o["price_cents"]/100.0
-
-    with db() as conn2:
-        cur2 = conn2.cursor()
-        cur2.execute("SELECT * FROM sponsors ORDER BY created_at DESC LIMIT 100")
-        sponsors = cur2.fetchall()
-
     return render_template(
         "admin.html",
-        orders=orders,
-        sponsors=sponsors,
+        **price_context(),
+        orders=console["orders"],
+        older=console["older"],
+        newer=console["newer"],
+        filters=filters,
         ab_report=ab_report,
         kpis=kpis,
         apply_total=apply_total,
         apply_7d=apply_7d,
         apply_by_job=apply_by_job,
+        ratelimit=limiter.stats(),
+        bot_clicks=click_filter.stats(),
         token=token,
         meta_title=f"Admin — {SITE_NAME}",
     )
@@ -605,8 +1099,8 @@ def admin_order_mark_paid(order_id: int):
     if token != ADMIN_TOKEN:
         abort(403)
     now = datetime.utcnow().isoformat(sep=" ", timespec="seconds")
-    with db() as conn:
-        cur = conn.cursor()
+
+    def tx(cur):
         # Order auf paid setzen
         cur.execute("UPDATE orders SET status='paid', paid_at=? WHERE id=?", (now, order_id))
         # Wenn es ein Sponsor-Order ist (job_id == 0) -> Sponsor aktivieren
@@ -618,20 +1112,19 @@ def admin_order_mark_paid(order_id: int):
             if s:
                 ends = (datetime.utcnow() + timedelta(days=7)).isoformat(sep=" ", timespec="seconds")
                 cur.execute("UPDATE sponsors SET status='active', starts_at=?, ends_at=? WHERE id=?", (now, ends, s["id"]))
+
+    writer.run(tx)
     return redirect(url_for("admin", token=token))
 
 @app.post("/admin/order/<int:order_id>/mark_unpaid")
 def mark_unpaid(order_id: int):
     if request.args.get("token") != ADMIN_TOKEN:
         abort(401)
-    with db() as conn:
-        cur = conn.cursor()
+    def tx(cur):
         cur.execute("UPDATE orders SET status='pending', paid_at=NULL WHERE id=?", (order_id,))
-        try:
-            cur.execute("UPDATE sponsors SET status='pending' WHERE order_id=?", (order_id,))
-        except Exception:
-            pass
-        conn.commit()
+        cur.execute("UPDATE sponsors SET status='pending' WHERE order_id=?", (order_id,))
+
+    writer.run(tx)
     return redirect(url_for("admin", token=request.args.get("token")))
 
 @app.post("/admin/import")
@@ -653,22 +1146,20 @@ def import_csv():
     if purpose_idx is None:
         flash("Konnte Spalte mit Verwendungszweck/Reference nicht erkennen.", "error")
         return redirect(url_for("admin", token=token))
-    imported = 0
-    updated = 0
-    with db() as conn:
-        cur = conn.cursor()
-        for ln in lines[1:]:
-            cols = [c.strip() for c in ln.split(",")]
-            if purpose_idx >= len(cols):
-                continue
-            purpose = cols[purpose_idx]
-            ref = None
-            for part in purpose.replace(";", " ").split():
-                if part.upper().startswith("PYDACH-"):
-                    ref = part.upper().strip(".,;")
-                    break
-            if not ref:
-                continue
+    refs = []
+    for ln in lines[1:]:
+        cols = [c.strip() for c in ln.split(",")]
+        if purpose_idx >= len(cols):
+            continue
+        for part in cols[purpose_idx].replace(";", " ").split():
+            if part.upper().startswith("PYDACH-"):
+                refs.append(part.upper().strip(".,;"))
+                break
+
+    def tx(cur):
+        imported = 0
+        updated = 0
+        for ref in refs:
             cur.execute("SELECT * FROM orders WHERE reference=?", (ref,))
             o = cur.fetchone()
             if not o:
@@ -681,6 +1172,9 @@ def import_csv():
                     cur.execute("UPDATE sponsors SET status='paid' WHERE order_id=?", (o["id"],))
                 updated += 1
             imported += 1
+        return imported, updated
+
+    imported, updated = writer.run(tx)
     flash(f"Import fertig. Einträge geprüft: {imported}, neu bezahlt: {updated}.", "success")
     return redirect(url_for("admin", token=token))
 
@@ -691,7 +1185,7 @@ def admin_social():
         abort(403)
 
     since = (datetime.utcnow() - timedelta(days=7)).isoformat(sep=" ", timespec="seconds")
-    with db() as conn:
+    with read_db() as conn:
         cur = conn.cursor()
         cur.execute("""
             SELECT id, title, company, location
@@ -725,7 +1219,7 @@ def admin_social():
 def admin_clicks_csv():
     if request.args.get("token") != ADMIN_TOKEN:
         abort(401)
-    with db() as conn:
+    with read_db() as conn:
         cur = conn.cursor()
         cur.execute("""
             SELECT created_at, job_id, kind, ip, ref, ua
@@ -750,43 +1244,43 @@ def admin_clicks_csv():
         headers={"Content-Disposition": "attachment; filename=clicks.csv"}
     )
 
+@app.get("/admin/metrics.json")
+def admin_metrics():
+    if request.args.get("token") != ADMIN_TOKEN:
+        abort(401)
+    with read_db() as conn:
+        archive_stats = archive.stats(conn.cursor())
+        click_stats = clicklog.stats(conn.cursor())
+        ab_stats = experiments.report(conn.cursor())
+        alert_stats = dict(alerts.stats(conn.cursor()), sender=alert_sender.stats())
+        ingest_stats = dict(pending=ingest.pending_count(conn.cursor()), failed=ingest.failed_count(conn.cursor()))
+    return dict(ratelimit=limiter.stats(), bot_clicks=click_filter.stats(), compression=compress.cache.stats(),
+                facets=facet_index.stats(), writer=writer.stats(), archive=archive_stats,
+                clicks=click_stats, fragments=fragments.cache.stats(), experiment={AB_EXPERIMENT: ab_stats},
+                suggest=suggester.stats(), alerts=alert_stats, images=images.stats(), ingest=ingest_stats)
+
+def _mark_order_paid(cur, order_id: int):
+    # 1) Order auf 'paid'
+    cur.execute("UPDATE orders SET status='paid', paid_at = datetime('now') WHERE id=?", (order_id,))
+    # 2) Sponsoring aktivieren (trifft nur Sponsor-Orders)
+    cur.execute("""
+        UPDATE sponsors
+           SET status='active',
+               starts_at = COALESCE(starts_at, datetime('now')),
+               ends_at   = COALESCE(ends_at, datetime('now', '+7 days'))
+         WHERE order_id=?
+    """, (order_id,))
+    # 3) Job featuren (Laufzeit ergibt sich aus paid_at + FEATURE_DAYS, siehe housekeeping)
+    cur.execute("""UPDATE jobs SET is_featured=1
+                   WHERE id=(SELECT job_id FROM orders WHERE id=? AND job_id != 0)""", (order_id,))
+
 @app.post("/admin/order/<int:order_id>/mark_paid")
 def mark_paid(order_id: int):
     # Token prüfen
     if request.args.get("token") != ADMIN_TOKEN:
         abort(401)
 
-    with db() as conn:
-        cur = conn.cursor()
-
-        # 1) Order auf 'paid'
-        cur.execute("UPDATE orders SET status='paid', paid_at = datetime('now') WHERE id=?", (order_id,))
-
-        # 2) Optional: Sponsoring aktivieren (falls vorhanden)
-        try:
-            cur.execute("""
-                UPDATE sponsors
-                   SET status='active',
-                       starts_at = COALESCE(starts_at, datetime('now')),
-                       ends_at   = COALESCE(ends_at, datetime('now', '+7 days'))
-                 WHERE order_id=?
-            """, (order_id,))
-        except Exception:
-            pass  # kein Sponsor-Record vorhanden -> ok
-
-        # 3) Optional: Job featuren (falls Order zu einem Job gehört)
-        try:
-            cur.execute("SELECT job_id FROM orders WHERE id=?", (order_id,))
-            row = cur.fetchone()
-            if row and row.get("job_id"):
-                from datetime import datetime, timedelta
-                feat_until = (datetime.utcnow() + timedelta(days=FEATURE_DAYS)).isoformat(sep=" ", timespec="seconds")
-                cur.execute("UPDATE jobs SET featured_until=? WHERE id=?", (feat_until, row["job_id"]))
-        except Exception:
-            pass  # falls Spalte nicht existiert o.ä.
-
-        conn.commit()
-
+    writer.run(_mark_order_paid, order_id)
     return redirect(url_for("admin", token=request.args.get("token")))
 
 @app.post("/admin/import_csv")
@@ -820,64 +1314,134 @@ def admin_import_csv():
         delim = ";"
 
     reader = csv.DictReader(StringIO(text), delimiter=delim)
-    found, updated, skipped = 0, 0, 0
-
-    with db() as conn:
-        cur = conn.cursor()
-        for row in reader:
-            # In allen Spalten nach PYDACH-Referenzen suchen
-            row_text = " ".join(str(v) for v in row.values() if v is not None).upper()
-            codes = re.findall(r"PYDACH-\d{5}(?:-[A-Z0-9]{3,8})?", row_text)
-            if not codes:
+    codes = []
+    for row in reader:
+        # In allen Spalten nach PYDACH-Referenzen suchen
+        row_text = " ".join(str(v) for v in row.values() if v is not None).upper()
+        codes += re.findall(r"PYDACH-\d{5}(?:-[A-Z0-9]{3,8})?", row_text)
+
+    def tx(cur):
+        found, updated, skipped = 0, 0, 0
+        for code in codes:
+            found += 1
+            # Nur die laufende Nummer als harte Basis nehmen (Suffix kann variieren)
+            core = "-".join(code.split("-")[:2])  # z.B. PYDACH-00004
+            cur.execute("SELECT id, status FROM orders WHERE reference LIKE ? LIMIT 1", (f"{core}%",))
+            o = cur.fetchone()
+            if not o:
                 continue
-            for code in codes:
-                found += 1
-                # Nur die laufende Nummer als harte Basis nehmen (Suffix kann variieren)
-                core = code.split("-")[0]  # z.B. PYDACH-00004
-                cur.execute("SELECT id, status FROM orders WHERE ref LIKE ? LIMIT 1", (f"{core}%",))
-                o = cur.fetchone()
-                if not o:
-                    continue
-                if o["status"] == "paid":
-                    skipped += 1
-                    continue
-
-                # 1) Order auf paid
-                cur.execute("UPDATE orders SET status='paid', paid_at=datetime('now') WHERE id=?", (o["id"],))
-
-                # 2) Sponsoring aktivieren (falls vorhanden)
-                try:
-                    cur.execute("""
-                        UPDATE sponsors
-                           SET status='active',
-                               starts_at = COALESCE(starts_at, datetime('now')),
-                               ends_at   = COALESCE(ends_at, datetime('now','+7 days'))
-                         WHERE order_id=?
-                    """, (o["id"],))
-                except Exception:
-                    pass
-
-                # 3) Job featuren (falls die Order zu einem Job gehört)
-                try:
-                    cur.execute("SELECT job_id FROM orders WHERE id=?", (o["id"],))
-                    r2 = cur.fetchone()
-                    if r2 and r2.get("job_id"):
-                        feat_until = (datetime.utcnow() + timedelta(days=FEATURE_DAYS)).isoformat(sep=" ", timespec="seconds")
-                        cur.execute("UPDATE jobs SET featured_until=? WHERE id=?", (feat_until, r2["job_id"]))
-                except Exception:
-                    pass
-
-                updated += 1
-
-        conn.commit()
+            if o["status"] == "paid":
+                skipped += 1
+                continue
+            _mark_order_paid(cur, o["id"])
+            updated += 1
+        return found, updated, skipped
 
+    found, updated, skipped = writer.run(tx)
     flash(f"CSV-Import: {found} Referenzen erkannt, {updated} bezahlt, {skipped} bereits bezahlt übersprungen.", "success")
     return redirect(url_for("admin", token=request.args.get("token")))
 
+@app.post("/admin/import_statement")
+def admin_import_statement():
+    # CAMT.053/MT940: gestreamt lesen, blockweise abgleichen, Bericht statt Flash
+    token = request.args.get("token", "")
+    if token != ADMIN_TOKEN:
+        abort(403)
+    f = request.files.get("statement")
+    if not f or not f.filename:
+        flash("Kein Kontoauszug ausgewählt.", "error")
+        return redirect(url_for("admin", token=token))
+    fmt = bankimport.detect_format(f.stream.read(64), f.filename)
+    f.stream.seek(0)
+    if not fmt:
+        flash("Format nicht erkannt (CAMT.053 oder MT940). CSV bitte über den CSV-Import.", "error")
+        return redirect(url_for("admin", token=token))
+    dry_run = bool(request.form.get("dry_run"))
+
+    def run_batch(block):
+        return writer.run(bankimport.reconcile_batch, block, _mark_order_paid, dry_run)
+
+    try:
+        report = bankimport.reconcile(bankimport.read_statement(f.stream, fmt), run_batch)
+    except bankimport.ParseError as e:
+        flash(f"XML fehlerhaft: {e}", "error")
+        return redirect(url_for("admin", token=token))
+    return render_template("admin_reconcile.html", report=report, fmt=fmt, dry_run=dry_run,
+                           filename=f.filename, token=token, meta_title=f"Kontoabgleich — {SITE_NAME}")
+
+def queue_pending(update_similar: bool = True):
+    # Nacharbeiten Block für Block: der nächste kommt erst in die Queue, wenn der vorige committet ist ->
+    # Formular/Zahlungen laufen zwischen zwei Blöcken statt hinter allen (Group Commit bündelt sonst alle)
+    def next_block(fut):
+        if fut.exception() is None and fut.result():
+            queue_pending(update_similar)
+    writer.submit(ingest.process_pending, job_skills, INGEST_PENDING_BLOCK, update_similar).add_done_callback(next_block)
+
+@app.post("/admin/ingest")
+def admin_ingest():
+    # Partner-Feed als Request-Body (oder Datei-Upload "file"), wird zeilenweise gelesen
+    token = request.args.get("token") or request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    # Admin-Token oder eigenes INGEST_TOKEN (für Partner); Vergleich in konstanter Zeit
+    if not token or not any(hmac.compare_digest(token.encode(), t.encode()) for t in (INGEST_TOKEN, ADMIN_TOKEN) if t):
+        abort(401)
+    source = request.args.get("source", "").strip()
+    if not source:
+        return {"error": "source fehlt"}, 400
+    upload = request.files.get("file")
+    if upload:
+        raw, hint = upload.stream, upload.filename or upload.mimetype
+    else:
+        raw, hint = BufferedReader(request.stream), request.mimetype
+    stream = TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+    fmt = ingest.detect_format(request.args.get("format"), hint)
+    report = ingest.ingest(ingest.read_records(stream, fmt), source,
+                           lambda src, rows: writer.run(ingest.write_chunk, src, rows))
+    # Geo-Index/ähnliche Jobs blockweise im Writer nachziehen, ohne darauf zu warten
+    bulk = report["inserted"] + report["updated"] >= INGEST_REBUILD_MIN
+    if report["inserted"] + report["updated"]:
+        queue_pending(not bulk)
+    if bulk:
+        # Neuaufbau rechnet im Hintergrund-Thread, der Writer schreibt nur kurze Blöcke
+        ingest.rebuild_similar_async(writer.run, job_skills)
+    return report
+
+@app.get("/admin/duplicates")
+def admin_duplicates():
+    token = request.args.get("token","")
+    if token != ADMIN_TOKEN:
+        abort(403)
+    with read_db() as conn:
+        found = dedup.clusters(conn.cursor())
+    return render_template("admin_duplicates.html", clusters=found, token=token, policy=DEDUP_POLICY,
+                           meta_title=f"Dubletten — {SITE_NAME}")
+
+@app.post("/admin/job/<int:job_id>/status")
+def admin_job_status(job_id: int):
+    # Dublette ausblenden bzw. wieder veröffentlichen
+    token = request.args.get("token","")
+    if token != ADMIN_TOKEN:
+        abort(403)
+    status = request.form.get("status", "")
+    if status not in ("published", "duplicate"):
+        abort(400)
+    writer.run(lambda cur: cur.execute("UPDATE jobs SET status=? WHERE id=?", (status, job_id)))
+    return redirect(url_for("admin_duplicates", token=token))
+
+@app.post("/admin/job/<int:job_id>/restore")
+def admin_job_restore(job_id: int):
+    token = request.args.get("token","")
+    if token != ADMIN_TOKEN:
+        abort(403)
+    if not writer.run(archive.restore_job, job_id):
+        abort(404)
+    queue_pending()
+    return redirect(url_for("job_detail", job_id=job_id))
+
 # --- Sponsoring ---
 from urllib.parse import urlparse
 
 @app.route("/sponsor/new", methods=["GET", "POST"])
+@rate_limited("write", methods=("POST",))
 def sponsor_new():
     if request.method == "POST":
         if is_bot_post("sponsor"):
@@ -896,22 +1460,25 @@ def sponsor_new():
             return render_template("sponsor_new.html", cap_a=a, cap_b=b)
         if website and not urlparse(website).scheme:
             website = "https://" + website
-        with db() as conn:
-            cur = conn.cursor()
+        price_cents = int(round(current_price_eur() * 100))  # hier gleicher AB-Preis; kann separat gemacht werden
+        ab = current_ab_group()[0]
+
+        def tx(cur):
             cur.execute(
                 """INSERT INTO sponsors (company, website, banner_text, image_url, status)
                    VALUES (?,?,?,?, 'pending')""",
                 (company, website, banner_text, image_url)
             )
             sponsor_id = cur.lastrowid
-            price_cents = int(round(current_price_eur() * 100))  # hier gleicher AB-Preis; kann separat gemacht werden
-            ab = current_ab_group()[0]
-            cur.execute("""INSERT INTO orders (job_id, price_cents, currency, reference, ab_group)
-                           VALUES (?,?,?,?,?)""", (0, price_cents, "EUR", "TEMP", ab))
+            imgproxy.register(cur, image_url)
+            cur.execute("""INSERT INTO orders (job_id, price_cents, currency, reference, ab_group, experiment)
+                           VALUES (?,?,?,?,?,?)""", (0, price_cents, "EUR", "TEMP", ab, AB_EXPERIMENT))
             order_id = cur.lastrowid
-            ref = order_reference(order_id)
-            cur.execute("UPDATE orders SET reference=? WHERE id=?", (ref, order_id))
+            cur.execute("UPDATE orders SET reference=? WHERE id=?", (order_reference(order_id), order_id))
             cur.execute("UPDATE sponsors SET order_id=? WHERE id=?", (order_id, sponsor_id))
+            return sponsor_id
+
+        sponsor_id = writer.run(tx)
         return redirect(url_for("sponsor_checkout", sponsor_id=sponsor_id))
     a,b = random.randint(1,9), random.randint(1,9)
     session["captcha_sponsor"] = a + b
@@ -919,7 +1486,7 @@ def sponsor_new():
 
 @app.get("/sponsor/checkout/<int:sponsor_id>")
 def sponsor_checkout(sponsor_id: int):
-    with db() as conn:
+    with read_db() as conn:
         cur = conn.cursor()
         cur.execute("SELECT * FROM sponsors WHERE id=?", (sponsor_id,))
         sp = cur.fetchone()
@@ -937,14 +1504,19 @@ def sponsor_mark_paid(sponsor_id: int):
     token = request.args.get("token","")
     if token != ADMIN_TOKEN:
         abort(403)
-    with db() as conn:
-        cur = conn.cursor()
+    def tx(cur):
         # Bestellung als bezahlt
         cur.execute("SELECT order_id FROM sponsors WHERE id=?", (sponsor_id,))
-        order_id = cur.fetchone()["order_id"]
-        cur.execute("UPDATE orders SET status='paid', paid_at=CURRENT_TIMESTAMP WHERE id=?", (order_id,))
+        sp = cur.fetchone()
+        if not sp:
+            return False
+        cur.execute("UPDATE orders SET status='paid', paid_at=CURRENT_TIMESTAMP WHERE id=?", (sp["order_id"],))
         # Sponsor aktivieren
         cur.execute("UPDATE sponsors SET status='paid' WHERE id=?", (sponsor_id,))
+        return True
+
+    if not writer.run(tx):
+        abort(404)
     return redirect(url_for("admin", token=token))
 
 # --- robots/sitemap/feed/landing/weekly (wie zuvor) ---
@@ -964,32 +1536,23 @@ def sitemap_xml():
     for j in jobs[:500]:
         urls.append(f"<url><loc>{url_for('job_detail', job_id=j['id'], _external=True)}</loc><changefreq>weekly</changefreq></url>")
 
-    # Städte & Skills
-    city_counts = {}
-    for j in jobs:
-        for ls in location_variants(j.get("location","")):
-            if ls:
-                city_counts[ls] = city_counts.get(ls, 0) + 1
-    for slug, _cnt in list(sorted(city_counts.items(), key=lambda x: x[1], reverse=True))[:50]:
+    # Städte & Skills (Bitset-Facetten statt Schleife über alle Jobs)
+    fx = facet_index.sync()
+    top_city = fx.counts("city", top=50)
+    for slug, _cnt in top_city:
         urls.append(f"<url><loc>{url_for('city_page', city_slug=slug, _external=True)}</loc><changefreq>weekly</changefreq></url>")
 
-    skill_counts = {}
-    for j in jobs:
-        txt = f"{j['title']} {j.get('description','')}"
-        for s in job_skills(txt):
-            skill_counts[s] = skill_counts.get(s, 0) + 1
-    for slug, _cnt in list(sorted(skill_counts.items(), key=lambda x: x[1], reverse=True))[:50]:
+    top_skill = fx.counts("skill", top=50)
+    for slug, _cnt in top_skill:
         urls.append(f"<url><loc>{url_for('skill_page', skill_slug=slug, _external=True)}</loc><changefreq>weekly</changefreq></url>")
 
-    # Kombinationen (Top 50 reale Paare)
-    combo_counts = {}
-    for j in jobs:
-        cities = location_variants(j.get("location",""))
-        skills = job_skills(f"{j['title']} {j.get('description','')}")
-        for c in cities:
-            for s in skills:
-                combo_counts[(c,s)] = combo_counts.get((c,s), 0) + 1
-    for (c,s),cnt in list(sorted(combo_counts.items(), key=lambda x: x[1], reverse=True))[:50]:
+    # Kombinationen (Top 50 reale Paare) — Kandidaten aus den Top-Städten × allen Skills
+    combo_counts = []
+    for c, _ in top_city:
+        cmask = fx.get("city", c)
+        for s, n in fx.counts("skill", cmask):
+            combo_counts.append(((c, s), n))
+    for (c,s),cnt in sorted(combo_counts, key=lambda x: x[1], reverse=True)[:50]:
         urls.append(f"<url><loc>{url_for('city_skill_page', city_slug=c, skill_slug=s, _external=True)}</loc><changefreq>weekly</changefreq></url>")
 
     # Weekly
@@ -1027,64 +1590,47 @@ def feed_xml():
 
 @app.get("/c/<city_slug>")
 def city_page(city_slug: str):
-    jobs = collect_jobs()
-    sel = []
-    display_name = None
-    for j in jobs:
-        variants = location_variants(j.get("location",""))
-        if city_slug in variants:
-            sel.append(j)
-            if not display_name:
-                for part in re.split(r"[,\-/|–—]+", j.get("location","")):
-                    if slugify(part) == city_slug:
-                        display_name = part.strip().title()
-                        break
-    sel.sort(key=lambda j: (not featured_or_grace(j), j["created_at"]))
+    # Alias-URLs (/c/munich, /c/muenchen) auf den kanonischen Slug umleiten
+    canon = geo.canonical_slug(city_slug)
+    if canon and canon != city_slug:
+        # nur ?km übernehmen: andere Client-Keys (city_slug, _anchor, …) landeten sonst in url_for
+        return redirect(url_for("city_page", city_slug=canon, km=request.args.get("km") or None), code=301)
+    km = radius_km_arg()
+    near = jobs_near(city_slug, km) if km else None
+    fx = facet_index.sync()
+    mask = fx.get("city", city_slug)
+    if near:
+        mask |= fx.published() & mask_of(near)
+    order = listing_order(ids_of(mask))
+    first = min(order, key=lambda j: j["id"]) if order else None
+    display_name = city_display(city_slug, first.get("location", "") if first else "")
 
     # Top-Skills in dieser Stadt
-    skill_counts = {}
-    for j in sel:
-        txt = f"{j['title']} {j.get('description','')}"
-        for s in job_skills(txt):
-            skill_counts[s] = skill_counts.get(s, 0) + 1
-    top_skills = sorted([(s, SKILL_LABEL.get(s, s.title()), c) for s,c in skill_counts.items()],
-                        key=lambda x: x[2], reverse=True)[:8]
-
-    return render_template("landing_city.html",
-                           jobs=sel,
+    top_skills = [(s, SKILL_LABEL.get(s, s.title()), c) for s, c in fx.counts("skill", mask, 8)]
+
+    return render_listing("landing_city.html",
+                           jobs=iter_jobs(j["id"] for j in order),
                            city=display_name or city_slug.title(),
                            city_slug=city_slug,
                            top_skills=top_skills,
-                           country=None,
+                           country=(geo.city(city_slug) or {}).get("country"),
+                           km=km,
+                           radius_choices=RADIUS_CHOICES if geo.city(city_slug) else (),
                            meta_title=f"Python‑Jobs in {display_name or city_slug.title()} | {SITE_NAME}",
                            meta_desc=f"Aktuelle Python‑Jobs in {display_name or city_slug.title()} (DACH).")
 
 @app.get("/s/<skill_slug>")
 def skill_page(skill_slug: str):
-    jobs = collect_jobs()
-    sel = []
-    for j in jobs:
-        txt = f"{j['title']} {j.get('description','')}"
-        if skill_slug in job_skills(txt):
-            sel.append(j)
-    sel.sort(key=lambda j: (not featured_or_grace(j), j["created_at"]))
+    fx = facet_index.sync()
+    mask = fx.get("skill", skill_slug)
+    order = listing_order(ids_of(mask))
     label = SKILL_LABEL.get(skill_slug, skill_slug.title())
 
     # Top-Städte für diesen Skill
-    city_counts = {}
-    city_name = {}
-    for j in sel:
-        loc_label = j.get("location") or ""
-        for part in re.split(r"[,\-/|–—]+", loc_label):
-            s = slugify(part)
-            if s:
-                city_counts[s] = city_counts.get(s, 0) + 1
-                city_name.setdefault(s, part.strip().title())
-    top_cities = sorted([(s, city_name.get(s, s.title()), c) for s,c in city_counts.items()],
-                        key=lambda x: x[2], reverse=True)[:8]
+    top_cities = [(s, city_display(s), c) for s, c in fx.counts("city", mask, 8)]
 
-    return render_template("landing_skill.html",
-                           jobs=sel,
+    return render_listing("landing_skill.html",
+                           jobs=iter_jobs(j["id"] for j in order),
                            skill_label=label,
                            skill_slug=skill_slug,
                            top_cities=top_cities,
@@ -1092,24 +1638,16 @@ def skill_page(skill_slug: str):
                            meta_desc=f"Python‑Jobs mit {label} im DACH‑Raum.")
 @app.get("/c/<city_slug>/s/<skill_slug>")
 def city_skill_page(city_slug: str, skill_slug: str):
-    jobs = collect_jobs()
-    sel = []
-    display_name = None
-    for j in jobs:
-        variants = location_variants(j.get("location",""))
-        if city_slug in variants:
-            txt = f"{j['title']} {j.get('description','')}"
-            if skill_slug in job_skills(txt):
-                sel.append(j)
-                if not display_name:
-                    for part in re.split(r"[,\-/|–—]+", j.get("location","")):
-                        if slugify(part) == city_slug:
-                            display_name = part.strip().title()
-                            break
-    sel.sort(key=lambda j: (not featured_or_grace(j), j["created_at"]))
+    canon = geo.canonical_slug(city_slug)
+    if canon and canon != city_slug:
+        return redirect(url_for("city_skill_page", city_slug=canon, skill_slug=skill_slug), code=301)
+    fx = facet_index.sync()
+    order = listing_order(ids_of(fx.get("city", city_slug) & fx.get("skill", skill_slug)))
+    first = min(order, key=lambda j: j["id"]) if order else None
+    display_name = city_display(city_slug, first.get("location", "") if first else "")
     label = SKILL_LABEL.get(skill_slug, skill_slug.title())
-    return render_template("landing_combo.html",
-                           jobs=sel,
+    return render_listing("landing_combo.html",
+                           jobs=iter_jobs(j["id"] for j in order),
                            city=display_name or city_slug.title(),
                            skill_label=label,
                            meta_title=f"{label}‑Jobs in {display_name or city_slug.title()} | {SITE_NAME}",
@@ -1127,12 +1665,9 @@ def weekly_by_id(year: int, week: int):
     d = date.fromisocalendar(year, week, 1)  # Montag
     start = datetime(d.year, d.month, d.day, 0, 0, 0)
     end = start + timedelta(days=7)
-    with db() as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM jobs WHERE status='published' AND datetime(created_at) >= ? AND datetime(created_at) < ? ORDER BY created_at DESC",
-                    (start.strftime("%Y-%m-%d %H:%M:%S"), end.strftime("%Y-%m-%d %H:%M:%S")))
-        sel = cur.fetchall()
-    return render_template("weekly.html",
+    sel = iter_query("SELECT * FROM jobs WHERE status='published' AND datetime(created_at) >= ? AND datetime(created_at) < ? ORDER BY created_at DESC",
+                     (start.strftime("%Y-%m-%d %H:%M:%S"), end.strftime("%Y-%m-%d %H:%M:%S")))
+    return render_listing("weekly.html",
                            jobs=sel,
                            year=year, week=week,
                            start=start.strftime("%Y-%m-%d"),
@@ -1140,91 +1675,28 @@ def weekly_by_id(year: int, week: int):
                            meta_title=f"Top Python‑Jobs – Woche {week}/{year} | {SITE_NAME}",
                            meta_desc=f"Neue Python‑Jobs im DACH‑Raum in Woche {week}/{year}.")
 
-# --- Rechnung PDF ---
-def invoice_pdf_buffer(order, job=None, sponsor=None):
-    buf = BytesIO()
-    c = canvas.Canvas(buf, pagesize=A4)
-    width, height = A4
-
-    # Header
-    c.setFont("Helvetica-Bold", 16)
-    title = "Rechnung" if order["status"] == "paid" else "Proforma-Rechnung"
-    c.drawString(40, height-60, f"{title} — {SITE_NAME}")
-    c.setFont("Helvetica", 10)
-    c.drawString(40, height-78, f"Rechnungsnr.: INV-{datetime.utcnow().strftime('%Y')}-{order['id']:05d}")
-    c.drawString(40, height-92, f"Datum: {datetime.utcnow().strftime('%Y-%m-%d')}")
-    c.drawString(40, height-106, f"Referenz: {order['reference']}")
-
-    # Anbieter (wir)
-    y = height - 140
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(40, y, "Leistungserbringer")
-    c.setFont("Helvetica", 10)
-    c.drawString(40, y-16, OWNER_NAME)
-    c.drawString(40, y-30, f"IBAN: {IBAN}")
-    if BIC:
-        c.drawString(40, y-44, f"BIC: {BIC}")
-
-    # Kunde
-    y -= 80
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(40, y, "Leistungsempfänger")
-    c.setFont("Helvetica", 10)
-    if job:
-        c.drawString(40, y-16, job.get("company",""))
-        if job.get("email"):
-            c.drawString(40, y-30, job["email"])
-    elif sponsor:
-        c.drawString(40, y-16, sponsor.get("company",""))
-        if sponsor.get("website"):
-            c.drawString(40, y-30, sponsor["website"])
-    else:
-        c.drawString(40, y-16, "Unbekannt")
-
-    # Positionen
-    y -= 70
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(40, y, "Positionen")
-    c.setFont("Helvetica", 10)
-
-    item = ""
-    if job:
-        item = "Featured Job Listing (30 Tage)"
-    elif sponsor:
-        item = "Sponsoring Top‑Banner (7 Tage)"
-    else:
-        item = "Leistung"
-
-    amount = order["price_cents"]/100.0
-    c.drawString(40, y-18, f"1x {item}")
-    c.drawRightString(width-40, y-18, f"{amount:,.2f} EUR".replace(",", "X").replace(".", ",").replace("X", "."))
-
-    # Summe
-    y -= 50
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(40, y, "Gesamt")
-    c.drawRightString(width-40, y, f"{amount:,.2f} EUR".replace(",", "X").replace(".", ",").replace("X", "."))
-
-    # Fuß
-    y -= 40
-    c.setFont("Helvetica", 8)
-    c.drawString(40, y, "Hinweis: Beispiel-Rechnung. USt-Hinweis bitte an dein Unternehmen anpassen (z. B. §19 UStG / Reverse Charge).")
-    if order["status"] != "paid":
-        c.setFillColorRGB(0.8, 0.0, 0.0)
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(40, y-16, "Unbezahlt — Zahlung per SEPA-Überweisung, Verwendungszweck siehe Checkout.")
-        c.setFillColorRGB(0,0,0)
-
-    c.showPage()
-    c.save()
-    return buf.getvalue()
+# --- Rechnung PDF (Rendering in app/invoices.py) ---
+@app.get("/admin/invoices.zip")
+def admin_invoices_zip():
+    # Sammel-Export mit den Filtern der Bestell-Konsole (Zeitraum, Status, …); PDFs im Prozess-Pool,
+    # ZIP wird gestreamt
+    if request.args.get("token", "") != ADMIN_TOKEN:
+        abort(403)
+    filters = orders_console.parse_filters(request.args)
+    with read_db() as conn:
+        rows = orders_console.export_rows(conn.cursor(), filters)
+    name = "_".join(["rechnungen"] + [filters[k] for k in ("from", "to", "status") if k in filters])
+    return Response(stream_with_context(invoices.zip_stream(rows)), mimetype="application/zip",
+                    headers={"Content-Disposition": f"attachment; filename={name}.zip",
+                             "Cache-Control": "private, no-store"})
 
 @app.get("/admin/order/<int:order_id>/invoice.pdf")
+@conditional(invoice_version, "private, no-cache")
 def order_invoice_pdf(order_id: int):
     token = request.args.get("token","")
     if token != ADMIN_TOKEN:
         abort(403)
-    with db() as conn:
+    with read_db() as conn:
         cur = conn.cursor()
         cur.execute("SELECT * FROM orders WHERE id=?", (order_id,))
         order = cur.fetchone()
@@ -1233,16 +1705,17 @@ def order_invoice_pdf(order_id: int):
         job = None
         sponsor = None
         if order["job_id"] != 0:
-            cur.execute("SELECT * FROM jobs WHERE id=?", (order["job_id"],))
-            job = cur.fetchone()
+            job = archive.find_job(cur, order["job_id"])
         else:
             cur.execute("SELECT * FROM sponsors WHERE order_id=?", (order_id,))
             sponsor = cur.fetchone()
     pdf = invoice_pdf_buffer(order, job=job, sponsor=sponsor)
     return send_file(BytesIO(pdf), mimetype="application/pdf", download_name=f"invoice_{order_id}.pdf")
 @app.get("/invoice/<int:order_id>.pdf")
+@conditional(invoice_version, "private, no-cache")
+@rate_limited("render")
 def invoice_public(order_id: int):
-    with db() as conn:
+    with read_db() as conn:
         cur = conn.cursor()
         cur.execute("SELECT * FROM orders WHERE id=?", (order_id,))
         order = cur.fetchone()
@@ -1250,8 +1723,7 @@ def invoice_public(order_id: int):
             abort(404)
         job = sponsor = None
         if order["job_id"] != 0:
-            cur.execute("SELECT * FROM jobs WHERE id=?", (order["job_id"],))
-            job = cur.fetchone()
+            job = archive.find_job(cur, order["job_id"])
         else:
             cur.execute("SELECT * FROM sponsors WHERE order_id=?", (order_id,))
             sponsor = cur.fetchone()
@@ -0,0 +1,120 @@
+# Alte Jobs aus der heißen jobs-Tabelle nach jobs_archive verschieben (gleiche IDs),
+# damit Listings, Sitemap, Feed und Indizes nur den aktuellen Bestand sehen.
+#   python -m app.archive                    (alle fälligen Jobs archivieren)
+#   python -m app.archive --restore 17 18    (zurückholen)
+# Im Webprozess läuft archive_expired() blockweise im Housekeeping.
+import argparse
+import sys
+
+from .config import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH
+from . import geo
+
+# nur für heiße Jobs gepflegt; beim Archivieren mit entfernt
+_DERIVED = ("job_geo", "job_vectors", "ingest_pending")
+
+
+def _columns(cur, table: str) -> list:
+    cur.execute(f"PRAGMA table_info({table})")
+    return [r["name"] for r in cur.fetchall()]
+
+
+def shared_columns(cur) -> str:
+    archived = set(_columns(cur, "jobs_archive"))
+    return ",".join(c for c in _columns(cur, "jobs") if c in archived)
+
+
+def archive_jobs(cur, ids) -> int:
+    ids = list(ids)
+    if not ids:
+        return 0
+    cols = shared_columns(cur)
+    marks = ",".join("?" * len(ids))
+    cur.execute(f"""INSERT OR REPLACE INTO jobs_archive ({cols}, archived_at)
+                    SELECT {cols}, datetime('now') FROM jobs WHERE id IN ({marks})""", ids)
+    for table in _DERIVED:
+        cur.execute(f"DELETE FROM {table} WHERE job_id IN ({marks})", ids)
+    cur.execute(f"DELETE FROM job_similar WHERE job_id IN ({marks}) OR similar_id IN ({marks})", ids + ids)
+    # Löschen feuert trg_jobs_changes_del -> Facetten ziehen nach
+    cur.execute(f"DELETE FROM jobs WHERE id IN ({marks})", ids)
+    return len(ids)
+
+
+def archive_expired(cur, days: int = ARCHIVE_AFTER_DAYS, limit: int = ARCHIVE_BATCH) -> int:
+    # Featured-/Grace-Jobs bleiben, solange sie laufen; created_at-Vergleich als String nutzt idx_jobs_created
+    if days <= 0:
+        return 0
+    cur.execute("""SELECT id FROM jobs
+                   WHERE created_at < datetime('now', ?)
+                     AND is_featured = 0
+                     AND (grace_expires_at IS NULL OR grace_expires_at <= datetime('now'))
+                   ORDER BY created_at LIMIT ?""", (f"-{int(days)} days", limit))
+    return archive_jobs(cur, [r["id"] for r in cur.fetchall()])
+
+
+def restore_job(cur, job_id: int) -> bool:
+    cols = shared_columns(cur)
+    cur.execute(f"INSERT INTO jobs ({cols}) SELECT {cols} FROM jobs_archive WHERE id=?", (job_id,))
+    if not cur.rowcount:
+        return False
+    cur.execute("DELETE FROM jobs_archive WHERE id=?", (job_id,))
+    # neu veröffentlicht: sonst archiviert der nächste Lauf den Job gleich wieder
+    cur.execute("UPDATE jobs SET created_at=CURRENT_TIMESTAMP WHERE id=?", (job_id,))
+    cur.execute("SELECT location FROM jobs WHERE id=?", (job_id,))
+    geo.index_job_geo(cur, job_id, cur.fetchone()["location"])
+    # ähnliche Jobs über die Nacharbeiten-Queue (ingest.process_pending)
+    cur.execute("INSERT OR IGNORE INTO ingest_pending (job_id) VALUES (?)", (job_id,))
+    return True
+
+
+def find_job(cur, job_id: int):
+    # heiß oder archiviert; archivierte Zeilen haben archived_at gesetzt
+    cur.execute("SELECT * FROM jobs WHERE id=?", (job_id,))
+    job = cur.fetchone()
+    if job:
+        return job
+    cur.execute("SELECT * FROM jobs_archive WHERE id=?", (job_id,))
+    return cur.fetchone()
+
+
+def stats(cur) -> dict:
+    cur.execute("SELECT COUNT(*) AS n FROM jobs")
+    hot = cur.fetchone()["n"]
+    cur.execute("SELECT COUNT(*) AS n, MAX(archived_at) AS last FROM jobs_archive")
+    row = cur.fetchone()
+    return dict(after_days=ARCHIVE_AFTER_DAYS, hot=hot, archived=row["n"], last_archived_at=row["last"])
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.archive", description="Alte Jobs archivieren/zurückholen")
+    ap.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS)
+    ap.add_argument("--restore", type=int, nargs="+", metavar="JOB_ID")
+    args = ap.parse_args(argv)
+
+    from .app import job_skills
+    from .db import db, init_db
+    from .ingest import process_pending
+    init_db()
+
+    if args.restore:
+        with db() as conn:
+            cur = conn.cursor()
+            for job_id in args.restore:
+                print(f"Job {job_id}: {'zurückgeholt' if restore_job(cur, job_id) else 'nicht im Archiv'}")
+            process_pending(cur, job_skills)
+        return 0
+
+    total = 0
+    while True:
+        with db() as conn:
+            n = archive_expired(conn.cursor(), args.days)
+        if not n:
+            break
+        total += n
+    with db() as conn:
+        s = stats(conn.cursor())
+    print(f"{total} Jobs archiviert (älter als {args.days} Tage); heiß: {s['hot']}, Archiv: {s['archived']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+# Kontoauszüge (CAMT.053 XML, MT940) gegen Bestellungen abgleichen.
+#   python -m app.bankimport auszug.xml [--dry-run]
+# Web: POST /admin/import_statement (Formularfeld "statement"), Bericht als Seite.
+# Gelesen wird gestreamt (iterparse bzw. zeilenweise), verarbeitete Buchungen werden sofort
+# verworfen -> Speicher unabhängig von der Dateigröße. Referenzen werden blockweise gesucht.
+import argparse
+import io
+import re
+import sys
+import xml.etree.ElementTree as ET
+from decimal import Decimal, InvalidOperation
+
+BATCH = 500
+MAX_LISTED = 200  # so viele Einträge je Kategorie im Bericht, gezählt wird alles
+REF_RE = re.compile(r"PYDACH-(\d{5})(?:-([A-Z0-9]{3,8}))?")
+_MT_TAG = re.compile(r"^:(\d\d[A-Z]?):(.*)$")
+_MT_61 = re.compile(r"^(\d{6})(\d{4})?(R?[CD])[A-Z]?(\d+,\d{0,2})")
+_MT_SUBFIELD = re.compile(r"\?\d\d")
+ParseError = ET.ParseError
+
+
+def _cents(value: str):
+    try:
+        return int((Decimal(value.strip().replace(",", ".")) * 100).to_integral_value())
+    except (InvalidOperation, AttributeError):
+        return None
+
+
+def detect_format(head: bytes, filename: str = "") -> str:
+    # erste Bytes reichen: XML beginnt mit "<", MT940 mit ":20:" bzw. SWIFT-Block "{1:"
+    text = head.lstrip(b"\xef\xbb\xbf \r\n\t")
+    if text.startswith(b"<") or filename.lower().endswith(".xml"):
+        return "camt"
+    if text.startswith((b":20:", b"{1:", b":940:")) or filename.lower().endswith((".sta", ".mt940")):
+        return "mt940"
+    return ""
+
+
+# --- CAMT.053 ---
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _find(elem, *path):
+    # namespace-unabhängig (camt.053.001.02 … .08)
+    for name in path:
+        if elem is None:
+            return None
+        elem = next((c for c in elem if _local(c.tag) == name), None)
+    return elem
+
+
+def _text(elem, *path) -> str:
+    e = _find(elem, *path)
+    return (e.text or "").strip() if e is not None else ""
+
+
+def _remittance(elem) -> str:
+    parts = []
+    rmt = _find(elem, "RmtInf")
+    if rmt is not None:
+        parts += [(e.text or "").strip() for e in rmt.iter() if _local(e.tag) in ("Ustrd", "Ref")]
+    parts.append(_text(elem, "Refs", "EndToEndId"))
+    return " ".join(p for p in parts if p and p != "NOTPROVIDED")
+
+
+def read_camt(stream):
+    # -> (nr, cent, währung, verwendungszweck, buchungstag, name) je Gutschrift (Sammler: je TxDtls)
+    stack, n = [], 0
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            continue
+        stack.pop()
+        if _local(elem.tag) != "Ntry":
+            continue
+        n += 1
+        if _text(elem, "CdtDbtInd") == "CRDT" and _text(elem, "RvslInd").lower() != "true":
+            amt = _find(elem, "Amt")
+            booked = _text(elem, "BookgDt", "Dt") or _text(elem, "BookgDt", "DtTm")[:10]
+            txs = [t for d in elem if _local(d.tag) == "NtryDtls" for t in d if _local(t.tag) == "TxDtls"]
+            if len(txs) > 1:
+                for tx in txs:
+                    tamt = _find(tx, "Amt")
+                    if tamt is None:
+                        tamt = _find(tx, "AmtDtls", "TxAmt", "Amt")
+                    yield (n, _cents(tamt.text if tamt is not None else ""),
+                           (tamt if tamt is not None else amt).get("Ccy", ""),
+                           _remittance(tx), booked, _text(tx, "RltdPties", "Dbtr", "Nm"))
+            else:
+                tx = txs[0] if txs else elem
+                yield (n, _cents(amt.text if amt is not None else ""), amt.get("Ccy", "") if amt is not None else "",
+                       " ".join(p for p in (_remittance(tx), _text(elem, "AddtlNtryInf")) if p),
+                       booked, _text(tx, "RltdPties", "Dbtr", "Nm"))
+        # Buchung verwerfen, damit der Baum nicht mitwächst
+        elem.clear()
+        if stack:
+            stack[-1].remove(elem)
+
+
+# --- MT940 ---
+def _mt940_purpose(value: str) -> tuple:
+    # :86: mit Unterfeldern (?20…?29, ?60…?63 Verwendungszweck, ?32/?33 Name) oder Freitext.
+    # Unterfelder ohne Trenner zusammensetzen: Referenzen werden oft über ?2x-Grenzen umbrochen
+    if not _MT_SUBFIELD.search(value):
+        return value, ""
+    fields = {}
+    for code, text in re.findall(r"\?(\d\d)([^?]*)", value):
+        fields[code] = fields.get(code, "") + text
+    purpose = "".join(fields.get(str(k), "") for k in list(range(20, 30)) + list(range(60, 64)))
+    return purpose, (fields.get("32", "") + fields.get("33", "")).strip()
+
+
+def read_mt940(stream):
+    # Textstream; :61: = Umsatzzeile, folgendes :86: = Verwendungszweck (?20…?29 Unterfelder)
+    currency, n, pending = "", 0, None
+    tag, buf = None, []
+
+    def flush(tag, value):
+        nonlocal currency, n, pending
+        out = None
+        if tag in ("60F", "60M") and len(value) >= 10:
+            currency = value[7:10]
+        elif tag == "61":
+            if pending:
+                out = pending
+            n += 1
+            m = _MT_61.match(value)
+            if m and m.group(3) == "C":
+                d = m.group(1)
+                pending = [n, _cents(m.group(4)), currency, "", f"20{d[:2]}-{d[2:4]}-{d[4:6]}", ""]
+            else:
+                pending = None  # Lastschrift/Storno
+        elif tag == "86" and pending:
+            pending[3], pending[5] = _mt940_purpose(value)
+            out, pending = pending, None
+        return out
+
+    for raw in stream:
+        line = raw.rstrip("\r\n")
+        m = _MT_TAG.match(line)
+        if m or line.startswith("-"):
+            if tag:
+                rec = flush(tag, "".join(buf))
+                if rec:
+                    yield tuple(rec)
+            tag, buf = (m.group(1), [m.group(2)]) if m else (None, [])
+        elif tag:
+            buf.append(line)
+    if tag:
+        rec = flush(tag, "".join(buf))
+        if rec:
+            yield tuple(rec)
+    if pending:
+        yield tuple(pending)
+
+
+# --- Abgleich ---
+def new_report() -> dict:
+    return dict(entries=0, matched=[], mismatched=[], unknown=[], counts=dict(matched=0, mismatched=0, unknown=0),
+                newly_paid=0, already_paid=0, paid_cents=0)
+
+
+def _add(report: dict, kind: str, item: dict):
+    report["counts"][kind] += 1
+    if len(report[kind]) < MAX_LISTED:
+        report[kind].append(item)
+
+
+def find_reference(text: str):
+    # Nummer = Bestell-ID; der Suffix kann wie beim CSV-Import variieren. Zweiter Versuch ohne
+    # Leerraum: Banken umbrechen den Verwendungszweck mitten in der Referenz
+    text = (text or "").upper()
+    return REF_RE.search(text) or REF_RE.search(re.sub(r"\s+", "", text))
+
+
+def reconcile_batch(cur, entries: list, pay_fn, dry_run: bool = False) -> dict:
+    # ein Block Gutschriften -> Teilbericht; pay_fn(cur, order_id) markiert bezahlt (Writer-Job-Signatur)
+    part = new_report()
+    found = [(e, find_reference(e[3])) for e in entries]
+    ids = sorted({int(m.group(1)) for _, m in found if m})
+    orders = {}
+    for start in range(0, len(ids), BATCH):
+        chunk = ids[start:start + BATCH]
+        cur.execute(f"""SELECT id, reference, price_cents, currency, status FROM orders
+                        WHERE id IN ({','.join('?' * len(chunk))})""", chunk)
+        orders.update({o["id"]: o for o in cur.fetchall()})
+    for e, m in found:
+        item = dict(line=e[0], amount=(e[1] or 0) / 100.0, currency=e[2], booked=e[4], name=e[5],
+                    text=e[3][:140], reference=m.group(0) if m else "")
+        part["entries"] += 1
+        o = orders.get(int(m.group(1))) if m else None
+        if not o:
+            _add(part, "unknown", item)
+            continue
+        item.update(order_id=o["id"], expected=o["price_cents"] / 100.0, status=o["status"])
+        if e[1] != o["price_cents"] or (e[2] and e[2] != o["currency"]):
+            _add(part, "mismatched", item)
+            continue
+        _add(part, "matched", item)
+        part["paid_cents"] += e[1]
+        if o["status"] == "paid":
+            part["already_paid"] += 1
+        else:
+            if not dry_run:
+                pay_fn(cur, o["id"])
+            o["status"] = "paid"  # doppelte Gutschrift im selben Block
+            part["newly_paid"] += 1
+    return part
+
+
+def merge(report: dict, part: dict):
+    for key in ("entries", "newly_paid", "already_paid", "paid_cents"):
+        report[key] += part[key]
+    for kind in ("matched", "mismatched", "unknown"):
+        report["counts"][kind] += part["counts"][kind]
+        report[kind] += part[kind][:MAX_LISTED - len(report[kind])]
+
+
+def reconcile(entries, run_batch, batch: int = BATCH) -> dict:
+    # run_batch(liste) -> Teilbericht: CLI = eigene Transaktion, Web = Writer-Job
+    report, block = new_report(), []
+    for e in entries:
+        block.append(e)
+        if len(block) >= batch:
+            merge(report, run_batch(block))
+            block = []
+    if block:
+        merge(report, run_batch(block))
+    return report
+
+
+def read_statement(binary, fmt: str):
+    # Binärstream -> Gutschriften; CAMT liest expat direkt (Encoding aus der XML-Deklaration)
+    if fmt == "camt":
+        return read_camt(binary)
+    return read_mt940(io.TextIOWrapper(binary, encoding="latin-1", newline=""))
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.bankimport", description="Kontoauszug (CAMT.053/MT940) abgleichen")
+    ap.add_argument("file")
+    ap.add_argument("--format", choices=("camt", "mt940"))
+    ap.add_argument("--dry-run", action="store_true", help="nur Bericht, nichts als bezahlt markieren")
+    args = ap.parse_args(argv)
+
+    from .app import _mark_order_paid
+    from .db import db, init_db
+    init_db()
+
+    def run_batch(block):
+        with db() as conn:
+            return reconcile_batch(conn.cursor(), block, _mark_order_paid, args.dry_run)
+
+    with open(args.file, "rb") as f:
+        fmt = args.format or detect_format(f.read(64), args.file)
+        if not fmt:
+            ap.error("Format nicht erkannt (--format camt|mt940)")
+        f.seek(0)
+        r = reconcile(read_statement(f, fmt), run_batch)
+    print(f"{r['entries']} Gutschriften: {r['counts']['matched']} zugeordnet ({r['newly_paid']} neu bezahlt, "
+          f"{r['already_paid']} schon bezahlt), {r['counts']['mismatched']} Betrag abweichend, "
+          f"{r['counts']['unknown']} unbekannt")
+    for e in r["mismatched"]:
+        print(f"  Betrag: {e['reference']} Bestellung {e['order_id']} erwartet {e['expected']:.2f}, "
+              f"erhalten {e['amount']:.2f} {e['currency']} (Eintrag {e['line']})")
+    for e in r["unknown"]:
+        print(f"  unbekannt: Eintrag {e['line']} {e['amount']:.2f} {e['currency']} {e['name']} – {e['text']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
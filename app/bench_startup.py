@@ -0,0 +1,60 @@
+# Startzeit-Benchmark: python -m app.bench_startup [--budget-ms 1500] [--runs 5]
+# Misst `import app.app` in frischen Interpretern und scheitert (Exit-Code 1),
+# wenn der beste Lauf über dem Budget liegt.
+import argparse
+import os
+import subprocess
+import sys
+
+from .config import BASE_DIR, STARTUP_BUDGET_MS
+
+SNIPPET = (
+    "import time; t = time.perf_counter(); import app.app; "
+    "print((time.perf_counter() - t) * 1000.0)"
+)
+
+HEAVY_MODULES = ("PIL.Image", "reportlab.pdfgen.canvas", "segno")
+
+
+def measure_once() -> float:
+    out = subprocess.run([sys.executable, "-c", SNIPPET], cwd=str(BASE_DIR),
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def heavy_modules_loaded() -> list:
+    snippet = ("import sys, app.app; "
+               f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", snippet], cwd=str(BASE_DIR),
+                         capture_output=True, text=True, check=True,
+                         env={**os.environ, "WARMUP_RENDERERS": "0"})
+    line = out.stdout.strip().splitlines()[-1] if out.stdout.strip() else ""
+    return [m for m in line.split(",") if m]
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Startzeit-Budget für import app.app prüfen")
+    ap.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args(argv)
+
+    # erster Lauf legt ggf. die DB an / migriert -> nicht mitzählen
+    measure_once()
+    times = [measure_once() for _ in range(max(1, args.runs))]
+    best = min(times)
+    print(f"import app.app: best {best:.1f} ms, median {sorted(times)[len(times)//2]:.1f} ms "
+          f"(budget {args.budget_ms:.0f} ms, {len(times)} Läufe)")
+
+    failed = False
+    eager = heavy_modules_loaded()
+    if eager:
+        print(f"FEHLER: schwere Module beim Import geladen: {', '.join(eager)}")
+        failed = True
+    if best > args.budget_ms:
+        print("FEHLER: Startzeit-Budget überschritten")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
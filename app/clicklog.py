@@ -0,0 +1,218 @@
+# Klick-Log mit Monats-Partitionen: clicks_YYYYMM (roh), User-Agent/Referrer interniert
+# in click_ua/click_ref, ältere Monate verdichtet nach click_daily (Tag, Job, Art, Anzahl).
+# Die View "clicks" vereint die Roh-Partitionen (gleiche Spalten wie die frühere Tabelle).
+# Platz wird per auto_vacuum=INCREMENTAL in kleinen Schritten freigegeben (kein VACUUM-Lock).
+#   python -m app.clicklog                      (verdichten + Speicher freigeben, Statistik)
+#   python -m app.clicklog --enable-incremental (einmalig: bestehende DB umstellen, voller VACUUM)
+import argparse
+import re
+import sys
+from datetime import datetime
+
+from .config import CLICK_RAW_MONTHS, CLICK_VACUUM_PAGES
+
+MAX_STR = 512
+_PART_RE = re.compile(r"^clicks_(\d{6})$")
+
+
+def partition_name(ts: datetime = None) -> str:
+    return "clicks_" + (ts or datetime.utcnow()).strftime("%Y%m")
+
+
+def partitions(cur) -> list:
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'clicks\\_%' ESCAPE '\\' ORDER BY name")
+    return [r["name"] for r in cur.fetchall() if _PART_RE.match(r["name"])]
+
+
+def rebuild_view(cur, parts=None):
+    parts = partitions(cur) if parts is None else parts
+    cur.execute("DROP VIEW IF EXISTS clicks")
+    if not parts:
+        cur.execute("""CREATE VIEW clicks AS SELECT NULL AS id, NULL AS job_id, NULL AS kind,
+                       NULL AS created_at, NULL AS ip, NULL AS ua, NULL AS ref WHERE 0""")
+        return
+    cur.execute("CREATE VIEW clicks AS " + " UNION ALL ".join(
+        f"""SELECT c.id, c.job_id, c.kind, c.created_at, c.ip, u.ua, r.ref FROM {p} c
+            LEFT JOIN click_ua u ON u.id = c.ua_id LEFT JOIN click_ref r ON r.id = c.ref_id"""
+        for p in parts))
+
+
+def ensure_partition(cur, name: str, view: bool = True) -> str:
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,))
+    if cur.fetchone():
+        return name
+    cur.execute(f"""
+    CREATE TABLE {name} (
+        id         INTEGER PRIMARY KEY,
+        job_id     INTEGER NOT NULL,
+        kind       TEXT    NOT NULL,
+        created_at TEXT    NOT NULL DEFAULT (datetime('now')),
+        ip         TEXT,
+        ua_id      INTEGER,
+        ref_id     INTEGER
+    )
+    """)
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_kind ON {name}(kind, created_at)")
+    if view:
+        rebuild_view(cur)
+    return name
+
+
+def intern(cur, table: str, column: str, value: str):
+    # meist schon bekannt -> ein Index-Lookup; sonst einfügen
+    if not value:
+        return None
+    value = value[:MAX_STR]
+    cur.execute(f"SELECT id FROM {table} WHERE {column}=?", (value,))
+    row = cur.fetchone()
+    if row:
+        return row["id"]
+    cur.execute(f"INSERT INTO {table} ({column}) VALUES (?)", (value,))
+    return cur.lastrowid
+
+
+def insert_click(cur, job_id: int, kind: str, ip: str = "", ua: str = "", ref: str = ""):
+    part = ensure_partition(cur, partition_name())
+    cur.execute(f"INSERT INTO {part} (job_id, kind, ip, ua_id, ref_id) VALUES (?,?,?,?,?)",
+                (job_id, kind, ip, intern(cur, "click_ua", "ua", ua), intern(cur, "click_ref", "ref", ref)))
+
+
+def _month_index(yyyymm: str) -> int:
+    return int(yyyymm[:4]) * 12 + int(yyyymm[4:]) - 1
+
+
+def compact(cur, raw_months: int = CLICK_RAW_MONTHS, now: datetime = None) -> list:
+    # Partitionen außerhalb des Roh-Fensters -> Tagesaggregate, dann DROP
+    now = now or datetime.utcnow()
+    keep_from = now.year * 12 + now.month - 1 - (max(raw_months, 1) - 1)
+    parts = partitions(cur)
+    old = [p for p in parts if _month_index(_PART_RE.match(p).group(1)) < keep_from]
+    if not old:
+        return []
+    for p in old:
+        cur.execute(f"""
+            INSERT INTO click_daily (day, job_id, kind, n)
+            SELECT date(created_at), job_id, kind, COUNT(*) FROM {p} WHERE 1 GROUP BY 1, 2, 3
+            ON CONFLICT(day, job_id, kind) DO UPDATE SET n = n + excluded.n
+        """)
+    live = [p for p in parts if p not in old]
+    rebuild_view(cur, live)
+    for p in old:
+        cur.execute(f"DROP TABLE {p}")
+    # nicht mehr referenzierte UA/Referrer-Strings entfernen
+    for table, col in (("click_ua", "ua_id"), ("click_ref", "ref_id")):
+        if live:
+            # NULL (leerer UA/Referrer) ausfiltern: ein NULL in der Liste macht NOT IN nie wahr
+            used = " UNION ".join(f"SELECT {col} FROM {p} WHERE {col} IS NOT NULL" for p in live)
+            cur.execute(f"DELETE FROM {table} WHERE id NOT IN ({used})")
+        else:
+            cur.execute(f"DELETE FROM {table}")
+    return old
+
+
+def incremental_vacuum(cur, pages: int = CLICK_VACUUM_PAGES) -> int:
+    # gibt höchstens `pages` freie Seiten ans Dateisystem zurück; kurze Schreibtransaktion
+    cur.execute("PRAGMA auto_vacuum")
+    if cur.fetchone()["auto_vacuum"] != 2:
+        return 0  # DB noch nicht umgestellt (siehe --enable-incremental)
+    cur.execute("PRAGMA freelist_count")
+    free = cur.fetchone()["freelist_count"]
+    if not free:
+        return 0
+    # das sqlite3-Modul führt das PRAGMA nur einen Schritt weit aus = genau eine Seite pro execute()
+    for _ in range(min(free, int(pages))):
+        cur.execute("PRAGMA incremental_vacuum")
+    cur.execute("PRAGMA freelist_count")
+    return free - cur.fetchone()["freelist_count"]
+
+
+def maintain(cur) -> dict:
+    # Housekeeping-Schritt: verdichten + ein Stück Speicher freigeben
+    return dict(compacted=compact(cur), vacuumed_pages=incremental_vacuum(cur))
+
+
+def total_by_kind(cur, kind: str) -> int:
+    # Roh-Partitionen + verdichtete Tage
+    cur.execute("""SELECT (SELECT COUNT(*) FROM clicks WHERE kind=?)
+                        + (SELECT COALESCE(SUM(n), 0) FROM click_daily WHERE kind=?) AS n""", (kind, kind))
+    return cur.fetchone()["n"]
+
+
+def migrate_legacy(cur):
+    # alte Einzeltabelle clicks -> Monats-Partitionen (einmalig aus init_db)
+    cur.execute("SELECT type FROM sqlite_master WHERE name='clicks'")
+    row = cur.fetchone()
+    if not row or row["type"] != "table":
+        return 0
+    cur.execute("INSERT OR IGNORE INTO click_ua (ua) SELECT DISTINCT substr(ua, 1, ?) FROM clicks WHERE ua != ''", (MAX_STR,))
+    cur.execute("INSERT OR IGNORE INTO click_ref (ref) SELECT DISTINCT substr(ref, 1, ?) FROM clicks WHERE ref != ''", (MAX_STR,))
+    cur.execute("SELECT DISTINCT strftime('%Y%m', created_at) AS m FROM clicks WHERE created_at IS NOT NULL")
+    months = [r["m"] for r in cur.fetchall() if r["m"]]
+    moved = 0
+    for m in months:
+        part = ensure_partition(cur, "clicks_" + m, view=False)
+        cur.execute(f"""
+            INSERT INTO {part} (job_id, kind, created_at, ip, ua_id, ref_id)
+            SELECT c.job_id, c.kind, c.created_at, c.ip, u.id, r.id FROM clicks c
+            LEFT JOIN click_ua u ON u.ua = substr(c.ua, 1, ?)
+            LEFT JOIN click_ref r ON r.ref = substr(c.ref, 1, ?)
+            WHERE strftime('%Y%m', c.created_at) = ? ORDER BY c.id
+        """, (MAX_STR, MAX_STR, m))
+        moved += cur.rowcount
+    cur.execute("DROP TABLE clicks")
+    rebuild_view(cur)
+    return moved
+
+
+def stats(cur) -> dict:
+    parts = partitions(cur)
+    out = dict(raw_months=CLICK_RAW_MONTHS, partitions={})
+    for p in parts:
+        cur.execute(f"SELECT COUNT(*) AS n FROM {p}")
+        out["partitions"][p] = cur.fetchone()["n"]
+    for key, sql in (("daily_rows", "SELECT COUNT(*) AS n FROM click_daily"),
+                     ("user_agents", "SELECT COUNT(*) AS n FROM click_ua"),
+                     ("referrers", "SELECT COUNT(*) AS n FROM click_ref")):
+        cur.execute(sql)
+        out[key] = cur.fetchone()["n"]
+    for pragma in ("auto_vacuum", "page_count", "freelist_count"):
+        cur.execute(f"PRAGMA {pragma}")
+        out[pragma] = cur.fetchone()[pragma]
+    return out
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.clicklog", description="Klick-Log verdichten und Speicher freigeben")
+    ap.add_argument("--enable-incremental", action="store_true",
+                    help="auto_vacuum=INCREMENTAL für eine bestehende DB setzen (voller VACUUM, einmalig)")
+    args = ap.parse_args(argv)
+
+    from .db import db, get_connection, init_db
+    init_db()
+    if args.enable_incremental:
+        conn = get_connection()
+        conn.isolation_level = None  # VACUUM nicht in einer Transaktion
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        conn.close()
+    with db() as conn:
+        cur = conn.cursor()
+        old = compact(cur)
+    total = 0
+    while True:
+        with db() as conn:
+            n = incremental_vacuum(conn.cursor())
+        if not n:
+            break
+        total += n
+    with db() as conn:
+        s = stats(conn.cursor())
+    print(f"verdichtet: {', '.join(old) or '-'}; {total} Seiten freigegeben")
+    print(f"Partitionen: {s['partitions']}; Tagesaggregate: {s['daily_rows']}; "
+          f"UA: {s['user_agents']}, Referrer: {s['referrers']}; auto_vacuum={s['auto_vacuum']}, "
+          f"{s['page_count']} Seiten ({s['freelist_count']} frei)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
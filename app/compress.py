@@ -0,0 +1,260 @@
+# Response-Kompression (gzip, optional brotli) mit Cache für komprimierte Varianten.
+# Gleicher Body -> gleicher Hash -> nur einmal komprimieren (Feed, Sitemap, Listings, Static).
+# Statische Dateien vorab auf Platte komprimieren (für nginx gzip_static/brotli_static):
+#   python -m app.compress
+import gzip
+import hashlib
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+from flask import request
+
+try:
+    import brotli  # optional: pip install brotli
+except ImportError:  # pragma: no cover - abhängig von der Umgebung
+    brotli = None
+
+from .config import COMPRESS_MIN_BYTES, COMPRESS_LEVEL, BROTLI_QUALITY, COMPRESS_CACHE_MB
+
+COMPRESSIBLE = {
+    "text/html", "text/plain", "text/css", "text/csv", "text/javascript", "text/xml",
+    "application/xml", "application/rss+xml", "application/json", "application/x-ndjson",
+    "application/javascript", "image/svg+xml",
+}
+
+# an den ETag angehängt, damit jede Kodierung einen eigenen starken Validator hat
+ETAG_SUFFIX = {"br": "-br", "gzip": "-gz"}
+
+
+def available_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: str):
+    # einfache q-Werte-Auswertung; bei Gleichstand gewinnt brotli
+    prefs = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        prefs[name] = q
+    best, best_q = None, 0.0
+    for enc in available_encodings():
+        q = prefs.get(enc, prefs.get("*", 0.0))
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    # mtime=0 -> deterministische Ausgabe
+    return gzip.compress(data, compresslevel=COMPRESS_LEVEL, mtime=0)
+
+
+class CompressedCache:
+    # LRU über (Inhalts-Hash, Kodierung), begrenzt auf max_bytes komprimierte Daten
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def get(self, key, data_fn, encoding: str) -> bytes:
+        with self._lock:
+            v = self._data.get((key, encoding))
+            if v is not None:
+                self._data.move_to_end((key, encoding))
+                self.hits += 1
+                return v
+        data = data_fn()
+        v = compress_bytes(data, encoding)
+        with self._lock:
+            self.misses += 1
+            if (key, encoding) not in self._data and len(v) <= self.max_bytes:
+                self._data[(key, encoding)] = v
+                self._size += len(v)
+                while self._size > self.max_bytes:
+                    _, old = self._data.popitem(last=False)
+                    self._size -= len(old)
+        return v
+
+    def account(self, n_in: int, n_out: int):
+        with self._lock:
+            self.bytes_in += n_in
+            self.bytes_out += n_out
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(
+                encodings=list(available_encodings()),
+                entries=len(self._data), cached_bytes=self._size,
+                hits=self.hits, misses=self.misses,
+                bytes_in=self.bytes_in, bytes_out=self.bytes_out,
+            )
+
+
+cache = CompressedCache(COMPRESS_CACHE_MB * 1024 * 1024)
+
+
+def _precompressed(path: Path, encoding: str):
+    # vorab erzeugte style.css.gz/.br nutzen, wenn nicht älter als das Original
+    p = path.with_name(path.name + (".br" if encoding == "br" else ".gz"))
+    try:
+        if p.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+            return p.read_bytes()
+    except OSError:
+        pass
+    return None
+
+
+def _static_body(app, resp, encoding: str):
+    filename = (request.view_args or {}).get("filename")
+    if not filename or not app.static_folder:
+        return None
+    path = Path(app.static_folder, filename).resolve()
+    if not path.is_relative_to(Path(app.static_folder).resolve()) or not path.is_file():
+        return None
+    pre = _precompressed(path, encoding)
+    if pre is not None:
+        return pre
+    st = path.stat()
+    return cache.get(("static", str(path), st.st_mtime_ns), path.read_bytes, encoding)
+
+
+STREAM_FLUSH_BYTES = 4096  # gestreamte Bodies: so viel sammeln, dann komprimieren + flushen
+
+
+def _compress_stream(chunks, encoding: str, close=None):
+    # gestreamte Templates: blockweise komprimieren, nach jedem Block flushen -> Client kann sofort rendern
+    if encoding == "br":
+        c = brotli.Compressor(quality=BROTLI_QUALITY)
+        step = lambda b: c.process(b) + c.flush()
+        finish = c.finish
+    else:
+        z = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)  # 31 = gzip-Header
+        step = lambda b: z.compress(b) + z.flush(zlib.Z_SYNC_FLUSH)
+        finish = z.flush
+    buf = b""
+    try:
+        for chunk in chunks:
+            buf += chunk
+            if len(buf) >= STREAM_FLUSH_BYTES:
+                yield step(buf)
+                buf = b""
+        yield step(buf) + finish()
+    finally:
+        if close:
+            close()  # Client weg -> Template-Generator (und dessen DB-Verbindung) schließen
+
+
+def compress_response(app, resp):
+    if resp.status_code != 200:
+        return resp
+    if resp.is_streamed and not resp.direct_passthrough:
+        return _compress_streamed(resp)
+    if resp.mimetype not in COMPRESSIBLE or "Content-Encoding" in resp.headers:
+        return resp
+    if "no-transform" in (resp.headers.get("Cache-Control") or "") or request.method == "HEAD":
+        return resp
+    length = resp.content_length
+    if length is not None and length < COMPRESS_MIN_BYTES:
+        return resp
+    resp.vary.add("Accept-Encoding")
+    encoding = negotiate(request.headers.get("Accept-Encoding", ""))
+    if not encoding:
+        return resp
+
+    if resp.direct_passthrough:
+        # send_static_file/send_file: Datei lesen statt den Stream zu konsumieren
+        if request.endpoint != "static":
+            return resp
+        body = _static_body(app, resp, encoding)
+        if body is None:
+            return resp
+        if hasattr(resp.response, "close"):
+            resp.response.close()
+        resp.direct_passthrough = False
+        n_in = length or 0
+    else:
+        data = resp.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return resp
+        body = cache.get(hashlib.sha1(data).digest(), lambda: data, encoding)
+        n_in = len(data)
+
+    cache.account(n_in, len(body))
+    resp.set_data(body)
+    resp.headers["Content-Encoding"] = encoding
+    etag, weak = resp.get_etag()
+    if etag:
+        resp.set_etag(etag + ETAG_SUFFIX[encoding], weak)
+    return resp
+
+
+def _compress_streamed(resp):
+    if resp.mimetype not in COMPRESSIBLE or "Content-Encoding" in resp.headers or request.method == "HEAD":
+        return resp
+    if "no-transform" in (resp.headers.get("Cache-Control") or ""):
+        return resp
+    resp.vary.add("Accept-Encoding")
+    encoding = negotiate(request.headers.get("Accept-Encoding", ""))
+    if not encoding:
+        return resp
+    resp.response = _compress_stream(resp.iter_encoded(), encoding, getattr(resp.response, "close", None))
+    resp.headers["Content-Encoding"] = encoding
+    return resp
+
+
+def init_app(app):
+    @app.before_request
+    def _strip_etag_suffix():
+        # Client schickt den ETag der komprimierten Variante zurück -> für Views/Static
+        # (conditional(), send_static_file) auf den Basis-ETag zurückführen
+        inm = request.environ.get("HTTP_IF_NONE_MATCH")
+        if inm and ('-gz"' in inm or '-br"' in inm):
+            request.environ["HTTP_IF_NONE_MATCH"] = inm.replace('-gz"', '"').replace('-br"', '"')
+
+    @app.after_request
+    def _compress(resp):
+        return compress_response(app, resp)
+
+
+def precompress_dir(folder: Path) -> int:
+    n = 0
+    for p in sorted(folder.rglob("*")):
+        if not p.is_file() or p.suffix in (".gz", ".br"):
+            continue
+        if p.suffix not in (".css", ".js", ".svg", ".html", ".xml", ".txt", ".json"):
+            continue
+        data = p.read_bytes()
+        if len(data) < COMPRESS_MIN_BYTES:
+            continue
+        for enc in available_encodings():
+            out = compress_bytes(data, enc)
+            p.with_name(p.name + (".br" if enc == "br" else ".gz")).write_bytes(out)
+            print(f"{p.relative_to(folder)} [{enc}] {len(data)} -> {len(out)} Bytes")
+            n += 1
+    return n
+
+
+if __name__ == "__main__":
+    target = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).resolve().parent / "static"
+    print(f"{precompress_dir(target)} Dateien komprimiert in {target}")
@@ -0,0 +1,70 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from pathlib import Path
+
+from flask import Response, make_response, request, session
+from werkzeug.http import is_resource_modified
+
+# Deploy-Fingerprint: ändert sich, sobald Templates oder Code neu ausgerollt werden,
+# ist aber für alle Worker desselben Deploys gleich
+_APP_DIR = Path(__file__).resolve().parent
+_SALT = hashlib.sha1("|".join(
+    f"{p.name}:{p.stat().st_mtime_ns}"
+    for p in sorted(list(_APP_DIR.glob("*.py")) + list((_APP_DIR / "templates").glob("*.html")))
+).encode()).hexdigest()[:12]
+
+
+def make_etag(*parts) -> str:
+    raw = "|".join(str(p) for p in (_SALT,) + parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:24]
+
+
+def parse_ts(value):
+    # SQLite-Strings ("YYYY-MM-DD HH:MM:SS", UTC) -> aware datetime
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        try:
+            dt = datetime.fromisoformat(str(value).replace("Z", ""))
+        except ValueError:
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.replace(microsecond=0)
+
+
+def latest(*values):
+    ts = [t for t in (parse_ts(v) for v in values) if t]
+    return max(ts) if ts else None
+
+
+def conditional(version_fn, cache_control: str = "no-cache"):
+    # Route-Decorator (unter @app.get setzen):
+    # version_fn(**view_args) -> (etag_parts, last_modified) oder None (= nicht cachebar,
+    # View normal ausführen, z. B. 404/403). Passt der Validator, gibt es 304 ohne Rendern.
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            # Flash-Meldungen sind einmalig -> Seiten mit Flash nie als 304 beantworten
+            v = None if session.get("_flashes") else version_fn(**kwargs)
+            if v is None:
+                return fn(*args, **kwargs)
+            parts, last_modified = v
+            etag = make_etag(request.endpoint, *parts)
+            headers = {"Cache-Control": cache_control}
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                resp = Response(status=304, headers=headers)
+            else:
+                resp = make_response(fn(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+                resp.headers.update(headers)
+            resp.set_etag(etag)
+            if last_modified:
+                resp.last_modified = last_modified
+            return resp
+        return wrapper
+    return deco
@@ -1,8 +1,16 @@
 import sqlite3
 from contextlib import contextmanager
+from pathlib import Path
 from typing import Iterable
 
-from .config import DB_PATH
+from .config import DB_PATH, DB_BUSY_TIMEOUT, AB_EXPERIMENT
+from . import geo
+from . import clicklog
+from . import experiments
+from .clicklog import insert_click  # noqa: F401 (re-export)
+
+# Bei jeder Schema-Änderung in init_db() hochzählen
+SCHEMA_VERSION = 15
 
 
 def dict_factory(cursor, row):
@@ -12,9 +20,14 @@ def dict_factory(cursor, row):
     return d
 
 
-def get_connection():
+def get_connection(readonly: bool = False):
     # Keine automatische Timestamp-Konvertierung; wir arbeiten mit Strings
-    conn = sqlite3.connect(DB_PATH)
+    if readonly:
+        # Leser im WAL-Modus: eigener Snapshot, blockiert den Writer nicht und umgekehrt
+        conn = sqlite3.connect(Path(DB_PATH).resolve().as_uri() + "?mode=ro", uri=True,
+                               timeout=DB_BUSY_TIMEOUT)
+    else:
+        conn = sqlite3.connect(DB_PATH, timeout=DB_BUSY_TIMEOUT)
     conn.row_factory = dict_factory
     return conn
 
@@ -32,9 +45,27 @@ def db() -> Iterable[sqlite3.Connection]:
         conn.close()
 
 
-def init_db():
+@contextmanager
+def read_db() -> Iterable[sqlite3.Connection]:
+    # nur lesen; Schreiben läuft im Webprozess über app.writer
+    conn = get_connection(readonly=True)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def init_db(force: bool = False):
     with db() as conn:
         cur = conn.cursor()
+        # wirkt nur bei neuer (leerer) DB; bestehende: python -m app.clicklog --enable-incremental
+        cur.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        # WAL ist persistent in der Datei; danach ein No-op
+        cur.execute("PRAGMA journal_mode=WAL")
+        # Schema schon aktuell -> keine CREATE/PRAGMA-Runde beim Worker-Start
+        cur.execute("PRAGMA user_version")
+        if not force and cur.fetchone()["user_version"] >= SCHEMA_VERSION:
+            return
         cur.execute("""
         CREATE TABLE IF NOT EXISTS jobs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -96,26 +127,256 @@ def init_db():
         if "image_url" not in s_cols:
             cur.execute("ALTER TABLE sponsors ADD COLUMN image_url TEXT")
 
-        # ✅ A. Klick-Logging (apply/share etc.)
+        # ✅ A. Klick-Logging (apply/share etc.): Monats-Partitionen, siehe weiter unten / app/clicklog.py
+
+        # --- Migration: Zeilenversionen für ETag/Last-Modified (jobs, orders, sponsors)
+        for table in ("jobs", "orders", "sponsors"):
+            cur.execute(f"PRAGMA table_info({table})")
+            t_cols = [r["name"] for r in cur.fetchall()]
+            if "version" not in t_cols:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            if "updated_at" not in t_cols:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN updated_at TIMESTAMP")
+            cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_version AFTER UPDATE ON {table}
+            WHEN NEW.version = OLD.version
+            BEGIN
+                UPDATE {table} SET version = OLD.version + 1, updated_at = datetime('now') WHERE id = NEW.id;
+            END
+            """)
+
+        # Umkreissuche: Koordinaten je Job/Stadt mit Rasterzelle (siehe geo.grid_cell);
+        # der Index deckt lat/lon/job_id mit ab -> Kandidaten ohne Tabellenzugriff
+        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='job_geo'")
+        backfill_geo = cur.fetchone() is None
         cur.execute("""
-        CREATE TABLE IF NOT EXISTS clicks (
-            id        INTEGER PRIMARY KEY AUTOINCREMENT,
+        CREATE TABLE IF NOT EXISTS job_geo (
             job_id    INTEGER NOT NULL,
-            kind      TEXT    NOT NULL,                           -- z.B. 'apply'
-            created_at TEXT   NOT NULL DEFAULT (datetime('now')),
-            ip        TEXT,
-            ua        TEXT,
-            ref       TEXT
+            city_slug TEXT    NOT NULL,
+            lat       REAL    NOT NULL,
+            lon       REAL    NOT NULL,
+            cell      INTEGER NOT NULL,
+            PRIMARY KEY (job_id, city_slug)
+        )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_job_geo_cell ON job_geo(cell, lat, lon, job_id)")
+        if backfill_geo or force:
+            cur.execute("SELECT id, location FROM jobs")
+            for j in cur.fetchall():
+                geo.index_job_geo(cur, j["id"], j["location"])
+
+        # Ähnliche Jobs: vorberechnete Top-k je Job + Vektoren/IDF für inkrementelle Updates
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS job_similar (
+            job_id     INTEGER NOT NULL,
+            rank       INTEGER NOT NULL,
+            similar_id INTEGER NOT NULL,
+            score      REAL    NOT NULL,
+            PRIMARY KEY (job_id, rank)
+        )
+        """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS job_vectors (
+            job_id INTEGER PRIMARY KEY,
+            vec    BLOB NOT NULL
+        )
+        """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS similar_meta (
+            id       INTEGER PRIMARY KEY CHECK (id = 1),
+            idf      BLOB,
+            built_at TIMESTAMP,
+            n_jobs   INTEGER
+        )
+        """)
+
+        # Änderungs-Log für Jobs: In-Memory-Indizes (Facetten …) ziehen nur neue seq nach
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS job_changes (
+            seq    INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL
+        )
+        """)
+        cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_jobs_changes_ins AFTER INSERT ON jobs
+        BEGIN INSERT INTO job_changes (job_id) VALUES (NEW.id); END
+        """)
+        # feuert einmal pro Änderung: beim Versions-Bump aus trg_jobs_version
+        cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_jobs_changes_upd AFTER UPDATE ON jobs
+        WHEN NEW.version != OLD.version
+        BEGIN INSERT INTO job_changes (job_id) VALUES (NEW.id); END
+        """)
+        cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_jobs_changes_del AFTER DELETE ON jobs
+        BEGIN INSERT INTO job_changes (job_id) VALUES (OLD.id); END
+        """)
+
+        # --- Migration: Partner-Feeds (app/ingest.py) -> Upsert über (source, external_id)
+        cur.execute("PRAGMA table_info(jobs)")
+        j_cols = [r["name"] for r in cur.fetchall()]
+        for col in ("source", "external_id", "content_hash"):
+            if col not in j_cols:
+                cur.execute(f"ALTER TABLE jobs ADD COLUMN {col} TEXT")
+        # NULL-Werte (Formular-Jobs) kollidieren in SQLite-UNIQUE-Indizes nicht
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_external ON jobs(source, external_id)")
+        # Nacharbeiten für importierte Jobs (Geo-Index, ähnliche Jobs), abgearbeitet in Blöcken
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_pending (
+            job_id    INTEGER PRIMARY KEY,
+            queued_at TEXT NOT NULL DEFAULT (datetime('now'))
         )
         """)
+        # Fehlversuche je Eintrag; ab INGEST_MAX_ATTEMPTS Dead Letter (bleibt liegen, wird nicht mehr gezogen)
+        cur.execute("PRAGMA table_info(ingest_pending)")
+        p_cols = [r["name"] for r in cur.fetchall()]
+        if "attempts" not in p_cols:
+            cur.execute("ALTER TABLE ingest_pending ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        if "last_error" not in p_cols:
+            cur.execute("ALTER TABLE ingest_pending ADD COLUMN last_error TEXT")
+
+        # Archiv für alte Jobs (app/archive.py): gleiche Spalten und IDs wie jobs + archived_at
+        cur.execute("CREATE TABLE IF NOT EXISTS jobs_archive AS SELECT * FROM jobs WHERE 0")
+        cur.execute("PRAGMA table_info(jobs_archive)")
+        a_cols = [r["name"] for r in cur.fetchall()]
+        cur.execute("PRAGMA table_info(jobs)")
+        for r in cur.fetchall():
+            if r["name"] not in a_cols:
+                cur.execute(f"ALTER TABLE jobs_archive ADD COLUMN {r['name']} {r['type']}")
+        if "archived_at" not in a_cols:
+            cur.execute("ALTER TABLE jobs_archive ADD COLUMN archived_at TEXT")
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_archive_id ON jobs_archive(id)")
+        # Feed-Jobs: (source, external_id) über heiß + Archiv eindeutig (Ingest holt Archiviertes zurück).
+        # Altlasten: ältere Kopien behalten ihre Zeile (Bestellungen zeigen darauf), nur ohne external_id
+        cur.execute("""UPDATE jobs_archive SET external_id = NULL
+                       WHERE external_id IS NOT NULL
+                         AND (EXISTS (SELECT 1 FROM jobs j WHERE j.source = jobs_archive.source
+                                                             AND j.external_id = jobs_archive.external_id)
+                              OR id < (SELECT MAX(b.id) FROM jobs_archive b WHERE b.source = jobs_archive.source
+                                                                               AND b.external_id = jobs_archive.external_id))""")
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_archive_external ON jobs_archive(source, external_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at)")
+
+        # Klick-Log (app/clicklog.py): internierte Strings, Tagesaggregate, Monats-Partitionen
+        cur.execute("CREATE TABLE IF NOT EXISTS click_ua (id INTEGER PRIMARY KEY, ua TEXT NOT NULL UNIQUE)")
+        cur.execute("CREATE TABLE IF NOT EXISTS click_ref (id INTEGER PRIMARY KEY, ref TEXT NOT NULL UNIQUE)")
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS click_daily (
+            day    TEXT    NOT NULL,
+            job_id INTEGER NOT NULL,
+            kind   TEXT    NOT NULL,
+            n      INTEGER NOT NULL,
+            PRIMARY KEY (day, job_id, kind)
+        ) WITHOUT ROWID
+        """)
+        # bisherige Tabelle clicks -> clicks_YYYYMM + View clicks
+        clicklog.migrate_legacy(cur)
+        clicklog.rebuild_view(cur)
+
+        # Bestell-Konsole (app/orders.py): Keyset über id, je Filter ein passender Index
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status, id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_orders_ab ON orders(ab_group, id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_orders_created ON orders(created_at)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_sponsors_order ON sponsors(order_id)")
+
+        # A/B-Experimente (app/experiments.py): Experiment je Bestellung, Statistik per Trigger
+        cur.execute("PRAGMA table_info(orders)")
+        if "experiment" not in [r["name"] for r in cur.fetchall()]:
+            cur.execute("ALTER TABLE orders ADD COLUMN experiment TEXT")
+        cur.execute("UPDATE orders SET experiment=? WHERE experiment IS NULL", (AB_EXPERIMENT,))
+        experiments.install(cur)
+
+        # Job-Alerts (app/alerts.py): gespeicherte Suchen, invertierter Term-Index, Versand-Outbox
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS alerts (
+            id         INTEGER PRIMARY KEY AUTOINCREMENT,
+            email      TEXT    NOT NULL,
+            q          TEXT    NOT NULL DEFAULT '',
+            city       TEXT    NOT NULL DEFAULT '',
+            skill      TEXT    NOT NULL DEFAULT '',
+            n_terms    INTEGER NOT NULL,
+            token      TEXT    NOT NULL UNIQUE,
+            status     TEXT    NOT NULL DEFAULT 'active',
+            created_at TEXT    NOT NULL DEFAULT (datetime('now'))
+        )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_alerts_email ON alerts(email)")
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS alert_terms (
+            term     TEXT    NOT NULL,
+            alert_id INTEGER NOT NULL,
+            PRIMARY KEY (term, alert_id)
+        ) WITHOUT ROWID
+        """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS alert_outbox (
+            id         INTEGER PRIMARY KEY AUTOINCREMENT,
+            alert_id   INTEGER NOT NULL,
+            job_id     INTEGER NOT NULL,
+            queued_at  TEXT    NOT NULL DEFAULT (datetime('now')),
+            claimed_at TEXT,
+            sent_at    TEXT,
+            attempts   INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (alert_id, job_id)
+        )
+        """)
+        # nur offene Einträge im Index -> Sender findet seinen nächsten Block ohne Scan
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_alert_outbox_open ON alert_outbox(id) WHERE sent_at IS NULL")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_alert_outbox_sent ON alert_outbox(sent_at) WHERE sent_at IS NOT NULL")
+
+        # Dubletten (app/dedup.py): MinHash-Signatur je Job, LSH-Bänder als Lookup, gefundene Paare
+        cur.execute("CREATE TABLE IF NOT EXISTS job_minhash (job_id INTEGER PRIMARY KEY, sig BLOB NOT NULL)")
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS job_lsh (
+            band   INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            job_id INTEGER NOT NULL,
+            PRIMARY KEY (band, bucket, job_id)
+        ) WITHOUT ROWID
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_job_lsh_job ON job_lsh(job_id)")
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS job_duplicates (
+            job_id   INTEGER NOT NULL,
+            other_id INTEGER NOT NULL,
+            score    REAL    NOT NULL,
+            PRIMARY KEY (job_id, other_id)
+        ) WITHOUT ROWID
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_job_duplicates_other ON job_duplicates(other_id)")
+        # gelöschte/archivierte Jobs verlassen den Index
+        cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_jobs_dedup_del AFTER DELETE ON jobs
+        BEGIN
+            DELETE FROM job_lsh WHERE job_id = OLD.id;
+            DELETE FROM job_minhash WHERE job_id = OLD.id;
+            DELETE FROM job_duplicates WHERE job_id = OLD.id OR other_id = OLD.id;
+        END
+        """)
+
+        # Bild-Proxy (app/imgproxy.py): /img/<key> -> Quell-URL; Bestand einmalig nachtragen
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS image_sources (
+            key        TEXT PRIMARY KEY,
+            url        TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (datetime('now'))
+        ) WITHOUT ROWID
+        """)
+        from . import imgproxy
+        cur.execute("SELECT logo_url AS url FROM jobs WHERE logo_url != '' UNION SELECT image_url FROM sponsors WHERE image_url != ''")
+        for r in cur.fetchall():
+            imgproxy.register(cur, r["url"])
+
+        cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def prune_job_changes(cur, keep: int = 10000):
+    # Änderungs-Log begrenzen; Prozesse, die weiter zurückliegen, bauen ihre Indizes neu auf
+    cur.execute("DELETE FROM job_changes WHERE seq <= (SELECT MAX(seq) FROM job_changes) - ?", (keep,))
 
 
 # ✅ B. Neue Hilfsfunktion zum Logging
 def log_click(job_id: int, kind: str, ip: str = "", ua: str = "", ref: str = ""):
+    # eigene Transaktion (Skripte); im Webprozess: writer.submit(insert_click, ...)
     with db() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO clicks (job_id, kind, ip, ua, ref) VALUES (?, ?, ?, ?, ?)",
-            (job_id, kind, ip, ua, ref),
-        )
-        conn.commit()
+        insert_click(conn.cursor(), job_id, kind, ip, ua, ref)
@@ -0,0 +1,179 @@
+# Dubletten-Erkennung: MinHash über Wort-Shingles (Titel, Firma, Beschreibung) + LSH-Bänder in SQLite.
+# Ein neuer Job fragt nur die Buckets seiner Bänder ab (PK-Lookups) und vergleicht die wenigen
+# Kandidaten über ihre Signaturen -> Aufwand unabhängig von der Zahl der Jobs.
+#   python -m app.dedup --rebuild      Signaturen für alle Jobs (neu) berechnen
+#   python -m app.dedup                Dubletten-Cluster ausgeben
+# DEDUP_POLICY: "flag" (merken, Admin-Ansicht), "reject" (Formular lehnt ab, Import setzt
+# status='duplicate'), "off".
+import argparse
+import hashlib
+import sys
+import zlib
+
+from . import geo
+from .config import DEDUP_POLICY, DEDUP_THRESHOLD
+
+SHINGLE = 3          # Wörter pro Shingle
+BANDS = 16
+ROWS = 4             # BANDS * ROWS = Signaturlänge; Kandidaten ab ~ (1/BANDS) ** (1/ROWS) ≈ 0.5 Jaccard
+NUM_PERM = BANDS * ROWS
+_PRIME = 4294967291  # größte Primzahl < 2**32: a*x + b passt noch in uint64
+_SEED = 20240611     # feste Permutationen -> Signaturen sind über Prozesse/Deploys vergleichbar
+_perms = None
+
+
+def _permutations():
+    global _perms
+    if _perms is None:
+        import numpy as np
+        rng = np.random.default_rng(_SEED)
+        a = rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+        b = rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+        _perms = (a[:, None], b[:, None])
+    return _perms
+
+
+def shingles(title: str, company: str, description: str) -> set:
+    # gleiche Faltung wie Alerts (Umlaute, Satzzeichen weg); kurze Texte -> einzelne Wörter
+    words = geo.tokens(f"{title} {company} {description}".lower().translate(geo._UMLAUTS))
+    if len(words) < SHINGLE:
+        return {zlib.crc32(w.encode("utf-8")) for w in words}
+    return {zlib.crc32(" ".join(words[i:i + SHINGLE]).encode("utf-8")) for i in range(len(words) - SHINGLE + 1)}
+
+
+def signature(title: str, company: str, description: str) -> bytes:
+    import numpy as np
+    sh = shingles(title, company, description)
+    if not sh:
+        return b""
+    a, b = _permutations()
+    x = np.fromiter(sh, dtype=np.uint64, count=len(sh))[None, :]
+    return ((a * x + b) % _PRIME).min(axis=1).astype(np.uint32).tobytes()
+
+
+def bands(sig: bytes) -> list:
+    # [(band, bucket)]; bucket = 64-Bit-Hash der ROWS Werte des Bands (als signed int für SQLite)
+    step = ROWS * 4
+    return [(i, int.from_bytes(hashlib.blake2b(sig[i * step:(i + 1) * step], digest_size=8).digest(), "big", signed=True))
+            for i in range(BANDS)]
+
+
+def similarity(s1: bytes, s2: bytes) -> float:
+    # Anteil gleicher MinHash-Werte ≈ Jaccard der Shingle-Mengen
+    import numpy as np
+    if not s1 or len(s1) != len(s2):
+        return 0.0
+    return float((np.frombuffer(s1, dtype=np.uint32) == np.frombuffer(s2, dtype=np.uint32)).mean())
+
+
+# --- DB (Writer-Job-Signatur: cur zuerst) ---
+def find(cur, sig: bytes, exclude: int = None, threshold: float = DEDUP_THRESHOLD) -> list:
+    # -> [(job_id, ähnlichkeit)] absteigend; nur Jobs, die sich mindestens ein Band teilen
+    if not sig:
+        return []
+    keys = bands(sig)
+    # CROSS JOIN erzwingt die Reihenfolge: Bänder -> PK-Lookup in job_lsh -> Signatur (kein Scan)
+    cur.execute(f"""WITH k(band, bucket) AS (VALUES {','.join(['(?,?)'] * len(keys))})
+                    SELECT DISTINCT l.job_id, m.sig FROM k CROSS JOIN job_lsh l CROSS JOIN job_minhash m
+                    WHERE l.band = k.band AND l.bucket = k.bucket AND m.job_id = l.job_id""",
+                [v for k in keys for v in k])
+    out = [(r["job_id"], similarity(sig, r["sig"])) for r in cur.fetchall() if r["job_id"] != exclude]
+    return sorted(((j, round(s, 3)) for j, s in out if s >= threshold), key=lambda x: -x[1])
+
+
+def store(cur, job_id: int, sig: bytes):
+    cur.execute("DELETE FROM job_lsh WHERE job_id=?", (job_id,))
+    if not sig:
+        cur.execute("DELETE FROM job_minhash WHERE job_id=?", (job_id,))
+        return
+    cur.execute("INSERT OR REPLACE INTO job_minhash (job_id, sig) VALUES (?,?)", (job_id, sig))
+    cur.executemany("INSERT OR IGNORE INTO job_lsh (band, bucket, job_id) VALUES (?,?,?)",
+                    [(b, h, job_id) for b, h in bands(sig)])
+
+
+def flag(cur, job_id: int, dups: list):
+    # Paare immer (kleinere id, größere id) -> ein Eintrag je Paar
+    cur.execute("DELETE FROM job_duplicates WHERE job_id=? OR other_id=?", (job_id, job_id))
+    cur.executemany("INSERT OR REPLACE INTO job_duplicates (job_id, other_id, score) VALUES (?,?,?)",
+                    [(min(job_id, o), max(job_id, o), s) for o, s in dups])
+
+
+def check_job(cur, job_id: int, title: str, company: str, description: str, sig: bytes = None,
+              policy: str = DEDUP_POLICY) -> list:
+    # nach dem Einfügen/Ändern eines Jobs: Signatur ablegen, Dubletten merken; -> Dubletten
+    if policy == "off":
+        return []
+    if sig is None:
+        sig = signature(title, company, description)
+    dups = find(cur, sig, exclude=job_id)
+    store(cur, job_id, sig)
+    flag(cur, job_id, dups)
+    return dups
+
+
+def clusters(cur, limit: int = 200) -> list:
+    # Zusammenhangskomponenten über job_duplicates (Union-Find), größte zuerst
+    cur.execute("SELECT job_id, other_id, score FROM job_duplicates")
+    pairs = cur.fetchall()
+    parent = {}
+
+    def root(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for p in pairs:
+        parent[root(p["job_id"])] = root(p["other_id"])
+    groups, best = {}, {}
+    for p in pairs:
+        r = root(p["job_id"])
+        best[r] = max(best.get(r, 0.0), p["score"])
+    for x in parent:
+        groups.setdefault(root(x), []).append(x)
+    ids = sorted(parent)
+    jobs = {}
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        cur.execute(f"""SELECT id, title, company, location, status, source, created_at FROM jobs
+                        WHERE id IN ({','.join('?' * len(chunk))})""", chunk)
+        jobs.update({r["id"]: r for r in cur.fetchall()})
+    out = [dict(jobs=[jobs[i] for i in sorted(g) if i in jobs], score=best.get(r, 0.0)) for r, g in groups.items()]
+    out = [c for c in out if len(c["jobs"]) > 1]
+    out.sort(key=lambda c: (-len(c["jobs"]), -c["score"], -c["jobs"][-1]["id"]))
+    return out[:limit]
+
+
+def rebuild(cur) -> int:
+    # alle Signaturen neu; Dubletten in id-Reihenfolge (ältere Anzeige = Original)
+    cur.execute("DELETE FROM job_lsh")
+    cur.execute("DELETE FROM job_minhash")
+    cur.execute("DELETE FROM job_duplicates")
+    cur.execute("SELECT id, title, company, description FROM jobs ORDER BY id")
+    rows = cur.fetchall()
+    for r in rows:
+        check_job(cur, r["id"], r["title"], r["company"], r["description"], policy="flag")
+    return len(rows)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.dedup", description="Dubletten (MinHash/LSH)")
+    ap.add_argument("--rebuild", action="store_true", help="Signaturen für alle Jobs neu berechnen")
+    args = ap.parse_args(argv)
+
+    from .db import db, init_db
+    init_db()
+    with db() as conn:
+        cur = conn.cursor()
+        if args.rebuild:
+            print(f"{rebuild(cur)} Jobs signiert")
+        found = clusters(cur)
+    print(f"{len(found)} Dubletten-Cluster")
+    for c in found:
+        print(f"  {c['score']:.2f}: " + ", ".join(f"#{j['id']} {j['title']} ({j['company']})" for j in c["jobs"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+# A/B-Experimente: deterministische Zuteilung per Hash (beliebig viele Arme, gewichtet) und
+# laufende Kennzahlen je Arm in experiment_stats. Die Tabelle pflegen Trigger auf orders
+# (Einfügen, Bezahlt/Unbezahlt, Löschen) -> der Report liest nur eine Zeile pro Arm.
+# Varianz des Umsatzes pro Bestellung aus exakten Integer-Summen (Summe, Quadratsumme in Cent).
+import hashlib
+import math
+
+from .config import AB_ARMS, AB_EXPERIMENT, PRICE_EUR_A, PRICE_EUR_B
+
+NO_ARM = "—"  # Bestellungen ohne ab_group (Altbestand)
+
+
+def parse_arms(spec: str) -> list:
+    # "A:149,B:199,C:249:0.5" -> [(arm, preis_eur, gewicht)]; leer -> PRICE_EUR_A/B
+    arms = []
+    for part in (spec or "").split(","):
+        bits = [b.strip() for b in part.split(":")]
+        if not bits[0]:
+            continue
+        if len(bits) < 2:
+            raise ValueError(f"AB_ARMS: Preis fehlt bei {bits[0]!r}")
+        arms.append((bits[0], float(bits[1]), float(bits[2]) if len(bits) > 2 else 1.0))
+    return arms or [("A", PRICE_EUR_A, 1.0), ("B", PRICE_EUR_B, 1.0)]
+
+
+ARMS = parse_arms(AB_ARMS)
+PRICES = {arm: price for arm, price, _ in ARMS}
+
+
+def bucket(unit: str, experiment: str = AB_EXPERIMENT, arms: list = ARMS) -> str:
+    # gleiche Einheit (Besucher-ID) + Experiment -> immer derselbe Arm; unabhängig je Experiment
+    h = int.from_bytes(hashlib.sha256(f"{experiment}:{unit}".encode("utf-8")).digest()[:8], "big")
+    x = h / 2.0 ** 64 * sum(w for _, _, w in arms)
+    for arm, _, w in arms:
+        if x < w:
+            return arm
+        x -= w
+    return arms[-1][0]
+
+
+def _contribution(row: str, sign: str) -> tuple:
+    # Beitrag einer Bestellung (OLD/NEW) zu den Summen
+    paid = f"({row}.status = 'paid')"
+    return (f"{sign}1", f"{sign}{paid}", f"{sign}{paid} * {row}.price_cents",
+            f"{sign}{paid} * {row}.price_cents * {row}.price_cents")
+
+
+def _upsert(row: str) -> str:
+    n, paid, rev, sq = _contribution(row, "")
+    return f"""INSERT INTO experiment_stats (experiment, arm, orders, paid, revenue_cents, revenue_sq)
+        VALUES (COALESCE({row}.experiment, '{AB_EXPERIMENT}'), COALESCE({row}.ab_group, '{NO_ARM}'), {n}, {paid}, {rev}, {sq})
+        ON CONFLICT(experiment, arm) DO UPDATE SET
+            orders = orders + excluded.orders, paid = paid + excluded.paid,
+            revenue_cents = revenue_cents + excluded.revenue_cents, revenue_sq = revenue_sq + excluded.revenue_sq;"""
+
+
+def _subtract(row: str) -> str:
+    n, paid, rev, sq = _contribution(row, "-")
+    return f"""UPDATE experiment_stats SET orders = orders {n}, paid = paid {paid},
+            revenue_cents = revenue_cents {rev}, revenue_sq = revenue_sq {sq}
+        WHERE experiment = COALESCE({row}.experiment, '{AB_EXPERIMENT}') AND arm = COALESCE({row}.ab_group, '{NO_ARM}');"""
+
+
+def install(cur):
+    # aus init_db: Tabelle, Trigger, einmaliger Backfill aus orders
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='experiment_stats'")
+    backfill = cur.fetchone() is None
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS experiment_stats (
+        experiment    TEXT    NOT NULL,
+        arm           TEXT    NOT NULL,
+        orders        INTEGER NOT NULL DEFAULT 0,
+        paid          INTEGER NOT NULL DEFAULT 0,
+        revenue_cents INTEGER NOT NULL DEFAULT 0,
+        revenue_sq    INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (experiment, arm)
+    ) WITHOUT ROWID
+    """)
+    for name in ("ins", "upd", "del"):
+        cur.execute(f"DROP TRIGGER IF EXISTS trg_orders_exp_{name}")
+    cur.execute(f"CREATE TRIGGER trg_orders_exp_ins AFTER INSERT ON orders BEGIN {_upsert('NEW')} END")
+    # Versions-Trigger und Referenz-Update ändern keine der Spalten -> WHEN filtert sie heraus
+    cur.execute(f"""CREATE TRIGGER trg_orders_exp_upd AFTER UPDATE ON orders
+        WHEN OLD.status IS NOT NEW.status OR OLD.price_cents IS NOT NEW.price_cents
+          OR OLD.ab_group IS NOT NEW.ab_group OR OLD.experiment IS NOT NEW.experiment
+        BEGIN {_subtract('OLD')} {_upsert('NEW')} END""")
+    cur.execute(f"CREATE TRIGGER trg_orders_exp_del AFTER DELETE ON orders BEGIN {_subtract('OLD')} END")
+    if backfill:
+        cur.execute(f"""
+            INSERT INTO experiment_stats (experiment, arm, orders, paid, revenue_cents, revenue_sq)
+            SELECT COALESCE(experiment, '{AB_EXPERIMENT}'), COALESCE(ab_group, '{NO_ARM}'), COUNT(*),
+                   SUM(status = 'paid'), SUM((status = 'paid') * price_cents),
+                   SUM((status = 'paid') * price_cents * price_cents)
+            FROM orders GROUP BY 1, 2
+        """)
+
+
+def _pvalue(z: float) -> float:
+    # zweiseitig, Normalapproximation
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+def _arm_figures(r) -> dict:
+    n, paid, rev, sq = r["orders"], r["paid"], r["revenue_cents"], r["revenue_sq"]
+    mean = rev / n if n else 0.0
+    var = (sq - rev * rev / n) / (n - 1) if n > 1 else 0.0  # Cent², Umsatz pro Bestellung
+    return dict(ab=r["arm"], orders=n, paid=paid,
+                conv=round(paid / n * 100.0, 1) if n else 0.0,
+                revenue_eur=rev / 100.0, rpo_eur=round(mean / 100.0, 2),
+                sd_eur=round(math.sqrt(max(var, 0.0)) / 100.0, 2), _mean=mean, _var=max(var, 0.0))
+
+
+def report(cur, experiment: str = AB_EXPERIMENT) -> list:
+    # eine Zeile je Arm; Vergleich jedes Arms mit dem Kontrollarm (erster konfigurierter Arm)
+    cur.execute("SELECT * FROM experiment_stats WHERE experiment=? ORDER BY arm", (experiment,))
+    rows = [_arm_figures(r) for r in cur.fetchall()]
+    control = next((r for r in rows if r["ab"] == ARMS[0][0]), rows[0] if rows else None)
+    for r in rows:
+        r.update(p_conv=None, p_rpo=None, lift=None)
+        if r is control or not control or not r["orders"] or not control["orders"]:
+            continue
+        n1, n2 = control["orders"], r["orders"]
+        p1, p2 = control["paid"] / n1, r["paid"] / n2
+        pool = (control["paid"] + r["paid"]) / (n1 + n2)
+        se = math.sqrt(pool * (1 - pool) * (1 / n1 + 1 / n2))
+        if se:
+            r["p_conv"] = round(_pvalue((p2 - p1) / se), 4)
+        se = math.sqrt(control["_var"] / n1 + r["_var"] / n2)  # Welch, Umsatz pro Bestellung
+        if se:
+            r["p_rpo"] = round(_pvalue((r["_mean"] - control["_mean"]) / se), 4)
+        if control["_mean"]:
+            r["lift"] = round((r["_mean"] / control["_mean"] - 1) * 100.0, 1)
+    for r in rows:
+        del r["_mean"], r["_var"]
+    return rows
+
+
+def totals(cur) -> dict:
+    # Summen über alle Experimente = alle Bestellungen (ohne Scan über orders)
+    cur.execute("""SELECT COALESCE(SUM(orders), 0) AS orders, COALESCE(SUM(paid), 0) AS paid,
+                          COALESCE(SUM(revenue_cents), 0) AS revenue_cents FROM experiment_stats""")
+    return cur.fetchone()
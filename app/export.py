@@ -0,0 +1,239 @@
+# Statischer Export der öffentlichen Seiten für nginx/CDN (Flask bleibt für Checkout, Apply, Admin, Suche).
+#   python -m app.export --out export/ --base-url https://pydach.example
+# Inkrementell: nur Seiten, deren Jobs sich seit dem letzten Export geändert haben (job_changes),
+# plus neue/weggefallene Seiten; Rendern im Prozess-Pool über den Flask-Test-Client.
+# nginx: try_files $uri $uri/index.html @flask;  (Anfragen mit Query-String direkt an Flask)
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+from .config import BASE_DIR, COMPRESS_MIN_BYTES
+
+MANIFEST = ".export-manifest.json"
+MANIFEST_VERSION = 1
+WEEKS = 8          # wie in der Sitemap
+BATCH = 50         # Seiten pro Pool-Auftrag
+GZIP_TYPES = ("text/html", "application/xml", "application/rss+xml", "text/plain")
+
+_client = None
+_base_url = ""
+
+
+def target(out: Path, path: str) -> Path:
+    # "/" -> index.html, "/job/5" -> job/5/index.html, "/sitemap.xml" -> sitemap.xml
+    rel = path.strip("/")
+    if not rel:
+        return out / "index.html"
+    if "." in rel.rsplit("/", 1)[-1]:
+        return out / rel
+    return out / rel / "index.html"
+
+
+def _write(p: Path, data: bytes):
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_name(f".{p.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, p)
+
+
+def _remove(p: Path):
+    for f in (p, p.with_name(p.name + ".gz")):
+        try:
+            f.unlink()
+        except FileNotFoundError:
+            pass
+
+
+# --- Worker (eigener Prozess, eigene App-Instanz) ---
+def _init_worker(base_url: str):
+    global _client, _base_url
+    from . import app as web
+    web._housekeeping_due[0] = float("inf")  # Export schreibt nicht in die DB
+    _client = web.app.test_client()
+    _base_url = base_url
+
+
+def _render_batch(paths, out: str, known: dict) -> list:
+    # -> [(pfad, status, sha1 oder None, geschrieben?)]
+    from .compress import compress_bytes
+    results = []
+    for path in paths:
+        r = _client.get(path, base_url=_base_url, headers={"Accept-Encoding": "identity"})
+        p = target(Path(out), path)
+        if r.status_code != 200:
+            # 404/410/Redirect: Datei entfernen, nginx reicht an Flask durch
+            _remove(p)
+            results.append((path, r.status_code, None, False))
+            continue
+        body = r.get_data()
+        digest = hashlib.sha1(body).hexdigest()
+        if known.get(path) == digest and p.exists():
+            results.append((path, 200, digest, False))
+            continue
+        _write(p, body)
+        if r.mimetype in GZIP_TYPES and len(body) >= COMPRESS_MIN_BYTES:
+            _write(p.with_name(p.name + ".gz"), compress_bytes(body, "gzip"))  # für gzip_static
+        results.append((path, 200, digest, True))
+    return results
+
+
+# --- Planung (Hauptprozess) ---
+def _week_path(created_at: str) -> str:
+    try:
+        y, w, _ = date.fromisoformat((created_at or "")[:10]).isocalendar()
+    except ValueError:
+        return ""
+    return f"/weekly/{y}-{w}"
+
+
+def job_deps(web, job) -> dict:
+    fx = web.facet_index
+    return dict(c=sorted(fx.extractors["city"](job)), s=sorted(fx.extractors["skill"](job)),
+                w=_week_path(job["created_at"]))
+
+
+def all_pages(web) -> set:
+    fx = web.facet_index.sync()
+    pages = {"/", "/robots.txt", "/sitemap.xml", "/feed.xml"}
+    pages |= {f"/job/{j}" for j in web.ids_of(fx.published())}
+    for c, _ in fx.counts("city"):
+        pages.add(f"/c/{c}")
+        pages |= {f"/c/{c}/s/{s}" for s, _ in fx.counts("skill", fx.get("city", c))}
+    pages |= {f"/s/{s}" for s, _ in fx.counts("skill")}
+    today = date.today()
+    for k in range(WEEKS):
+        y, w, _ = (today - timedelta(weeks=k)).isocalendar()
+        pages.add(f"/weekly/{y}-{w}")
+    return pages
+
+
+def _pages_for(deps: dict) -> set:
+    out = {f"/c/{c}" for c in deps.get("c", ())} | {f"/s/{s}" for s in deps.get("s", ())}
+    out |= {f"/c/{c}/s/{s}" for c in deps.get("c", ()) for s in deps.get("s", ())}
+    if deps.get("w"):
+        out.add(deps["w"])
+    return out
+
+
+def plan(web, cur, manifest: dict, fingerprint: dict, full: bool = False):
+    # -> (zu rendernde Seiten, zu löschende Seiten, neue deps, seq)
+    cur.execute("SELECT COALESCE(MAX(seq), 0) AS s FROM job_changes")
+    seq = cur.fetchone()["s"]
+    current = all_pages(web)
+    deps = dict(manifest.get("deps", {}))
+    old_pages = set(manifest.get("pages", {}))
+
+    if not full:
+        cur.execute("SELECT MIN(seq) AS lo FROM job_changes")
+        lo = cur.fetchone()["lo"]
+        last = manifest.get("seq", -1)
+        full = (manifest.get("version") != MANIFEST_VERSION or last < 0
+                or manifest.get("fingerprint") != fingerprint
+                or (lo is not None and lo > last + 1))  # Log über unseren Stand hinaus gekürzt
+    if full:
+        changed = None
+    else:
+        cur.execute("SELECT DISTINCT job_id FROM job_changes WHERE seq > ?", (manifest["seq"],))
+        changed = [r["job_id"] for r in cur.fetchall()]
+
+    # deps für geänderte (bzw. beim Vollexport alle) Jobs neu bestimmen
+    if changed is None:
+        cur.execute("SELECT * FROM jobs WHERE status='published'")
+        rows = cur.fetchall()
+        deps = {}
+    else:
+        rows = []
+        for start in range(0, len(changed), 500):
+            chunk = changed[start:start + 500]
+            cur.execute(f"SELECT * FROM jobs WHERE status='published' AND id IN ({','.join('?' * len(chunk))})", chunk)
+            rows += cur.fetchall()
+    fresh = {str(j["id"]): job_deps(web, j) for j in rows}
+
+    if changed is None:
+        todo = set(current)
+    else:
+        todo = current - old_pages  # neue Seiten (neue Stadt, neue Woche …)
+        if changed:
+            todo |= {"/", "/sitemap.xml", "/feed.xml"}
+            marks = ",".join("?" * len(changed))
+            cur.execute(f"SELECT DISTINCT job_id FROM job_similar WHERE similar_id IN ({marks})", changed)
+            # Detailseiten, deren "Ähnliche Jobs"-Box einen geänderten Job zeigt
+            todo |= {f"/job/{r['job_id']}" for r in cur.fetchall()}
+            for jid in changed:
+                todo.add(f"/job/{jid}")
+                todo |= _pages_for(deps.pop(str(jid), {}))
+                todo |= _pages_for(fresh.get(str(jid), {}))
+    deps.update(fresh)
+    todo &= current | old_pages          # nur Seiten, die es gibt oder gab
+    gone = old_pages - current
+    return sorted(todo - gone), sorted(gone), deps, seq
+
+
+def export(out: Path, base_url: str, workers: int = None, full: bool = False) -> dict:
+    from . import app as web
+    from .conditional import _SALT, make_etag
+    from .db import read_db
+
+    t0 = time.perf_counter()
+    out.mkdir(parents=True, exist_ok=True)
+    try:
+        manifest = json.loads((out / MANIFEST).read_text("utf-8"))
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+    # Deploy (Templates/Code), Sponsor-Banner und Basis-URL stecken in jeder Seite -> Vollexport
+    with web.app.test_request_context(base_url=base_url):
+        fingerprint = dict(deploy=_SALT, sponsor=make_etag(*web._sponsor_parts()), base_url=base_url)
+    with read_db() as conn:
+        todo, gone, deps, seq = plan(web, conn.cursor(), manifest, fingerprint, full)
+
+    pages = dict(manifest.get("pages", {}))
+    for path in gone:
+        _remove(target(out, path))
+        pages.pop(path, None)
+
+    batches = [todo[i:i + BATCH] for i in range(0, len(todo), BATCH)]
+    results = []
+    if len(batches) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(base_url,)) as pool:
+            futures = [pool.submit(_render_batch, b, str(out), {p: pages.get(p) for p in b}) for b in batches]
+            for f in futures:
+                results += f.result()
+    elif batches:
+        _init_worker(base_url)
+        results = _render_batch(todo, str(out), pages)
+
+    written = skipped = 0
+    for path, status, digest, wrote in results:
+        if digest:
+            pages[path] = digest
+        else:
+            pages.pop(path, None)
+            skipped += 1
+        written += wrote
+    manifest = dict(version=MANIFEST_VERSION, seq=seq, fingerprint=fingerprint, deps=deps, pages=pages)
+    _write(out / MANIFEST, json.dumps(manifest, separators=(",", ":")).encode("utf-8"))
+    return dict(rendered=len(results), written=written, unchanged=len(results) - written - skipped,
+                skipped=skipped, removed=len(gone), pages=len(pages), seconds=round(time.perf_counter() - t0, 2))
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.export", description="Öffentliche Seiten statisch exportieren")
+    ap.add_argument("--out", default=os.getenv("EXPORT_DIR", str(BASE_DIR / "export")))
+    ap.add_argument("--base-url", default=os.getenv("EXPORT_BASE_URL", "http://localhost"))
+    ap.add_argument("--workers", type=int, default=None, help="Prozesse (Default: CPU-Kerne)")
+    ap.add_argument("--full", action="store_true", help="alles neu rendern")
+    args = ap.parse_args(argv)
+    r = export(Path(args.out), args.base_url.rstrip("/"), args.workers, args.full)
+    print(f"{r['rendered']} Seiten gerendert ({r['written']} geschrieben, {r['unchanged']} unverändert, "
+          f"{r['skipped']} ohne 200), {r['removed']} entfernt, {r['pages']} gesamt in {r['seconds']}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
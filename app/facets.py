@@ -0,0 +1,143 @@
+# In-Memory-Facetten: ein Bitset (Python-int, Bit = Job-ID) je Stadt, Skill und Status.
+# Zählen = Schnittmenge + popcount statt Schleife über alle Jobs.
+# Synchronisiert sich pro Prozess inkrementell über die job_changes-Tabelle (Trigger in db.py).
+import threading
+
+from .db import read_db
+
+
+def mask_of(ids) -> int:
+    # Bitset aus Job-IDs bauen (bytearray statt wiederholtem |= auf großen ints)
+    ids = list(ids)
+    if not ids:
+        return 0
+    buf = bytearray(max(ids) // 8 + 1)
+    for i in ids:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+def ids_of(mask: int) -> list:
+    import numpy as np
+    if not mask:
+        return []
+    raw = np.frombuffer(mask.to_bytes((mask.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(raw, bitorder="little")).tolist()
+
+
+class FacetIndex:
+
+    def __init__(self, extractors: dict):
+        # extractors: facet -> fn(job_row) -> iterable von Werten (z. B. Städte-Slugs)
+        self.extractors = extractors
+        self.bits = {f: {} for f in extractors}
+        self.bits["status"] = {}
+        self._values = {}      # job_id -> {facet: set(werte)} für Updates/Löschungen
+        self._seq = -1         # letzte verarbeitete job_changes.seq; -1 = noch nie geladen
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+        self.incremental = 0
+
+    # --- Pflege ---
+    def _set(self, facet: str, value, job_id: int, on: bool):
+        d = self.bits[facet]
+        bit = 1 << job_id
+        if on:
+            d[value] = d.get(value, 0) | bit
+        elif value in d:
+            d[value] &= ~bit
+            if not d[value]:
+                del d[value]
+
+    def _apply(self, job_id: int, job):
+        old = self._values.pop(job_id, {})
+        new = {}
+        if job:
+            new["status"] = {job["status"]}
+            if job["status"] == "published":
+                for f, fn in self.extractors.items():
+                    new[f] = set(fn(job))
+            self._values[job_id] = new
+        for f in set(old) | set(new):
+            for v in old.get(f, set()) - new.get(f, set()):
+                self._set(f, v, job_id, False)
+            for v in new.get(f, set()) - old.get(f, set()):
+                self._set(f, v, job_id, True)
+
+    def _rebuild(self, cur):
+        cur.execute("SELECT COALESCE(MAX(seq), 0) AS s FROM job_changes")
+        seq = cur.fetchone()["s"]
+        cur.execute("SELECT * FROM jobs")
+        jobs = cur.fetchall()
+        tmp = {f: {} for f in self.bits}
+        values = {}
+        for j in jobs:
+            vals = {"status": {j["status"]}}
+            if j["status"] == "published":
+                for f, fn in self.extractors.items():
+                    vals[f] = set(fn(j))
+            values[j["id"]] = vals
+            for f, vs in vals.items():
+                for v in vs:
+                    tmp[f].setdefault(v, []).append(j["id"])
+        self.bits = {f: {v: mask_of(ids) for v, ids in d.items()} for f, d in tmp.items()}
+        self._values = values
+        self._seq = seq
+        self.rebuilds += 1
+
+    def sync(self):
+        # vor jeder Abfrage: neue Einträge im Änderungs-Log nachziehen (meist leere PK-Range)
+        with self._lock, read_db() as conn:
+            cur = conn.cursor()
+            if self._seq < 0:
+                self._rebuild(cur)
+                return self
+            cur.execute("SELECT MIN(seq) AS lo FROM job_changes")
+            lo = cur.fetchone()["lo"]
+            if lo is not None and lo > self._seq + 1:
+                # Log wurde über unseren Stand hinaus gekürzt -> neu aufbauen
+                self._rebuild(cur)
+                return self
+            cur.execute("SELECT seq, job_id FROM job_changes WHERE seq > ? ORDER BY seq", (self._seq,))
+            changes = cur.fetchall()
+            if not changes:
+                return self
+            changed = sorted({c["job_id"] for c in changes})
+            for start in range(0, len(changed), 500):
+                chunk = changed[start:start + 500]
+                cur.execute(f"SELECT * FROM jobs WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+                rows = {r["id"]: r for r in cur.fetchall()}
+                for job_id in chunk:
+                    self._apply(job_id, rows.get(job_id))
+            self._seq = changes[-1]["seq"]
+            self.incremental += len(changed)
+        return self
+
+    # --- Abfragen ---
+    def get(self, facet: str, value) -> int:
+        return self.bits.get(facet, {}).get(value, 0)
+
+    def published(self) -> int:
+        return self.get("status", "published")
+
+    def counts(self, facet: str, mask: int = None, top: int = None) -> list:
+        # [(wert, anzahl)] absteigend; mask=None -> alle veröffentlichten Jobs
+        with self._lock:
+            if mask is None:
+                mask = self.published()
+            out = []
+            for v, bits in self.bits.get(facet, {}).items():
+                n = (bits & mask).bit_count()
+                if n:
+                    out.append((v, n))
+        out.sort(key=lambda x: (-x[1], x[0]))
+        return out[:top] if top else out
+
+    def stats(self) -> dict:
+        return dict(
+            facets={f: len(d) for f, d in self.bits.items()},
+            jobs=len(self._values),
+            seq=self._seq,
+            rebuilds=self.rebuilds,
+            incremental_updates=self.incremental,
+        )
@@ -0,0 +1,113 @@
+# Fragment-Cache für Job-Karten in Listings: jede Karte (<li>) wird einmal gerendert und unter
+# (Job-ID, Zeilenversion, Featured/Grace, Variante) abgelegt. Die Zeilenversion zählt der
+# Trigger trg_jobs_version bei jedem Update hoch -> geänderte Jobs bekommen automatisch einen
+# neuen Schlüssel, alte Einträge fallen per LRU heraus.
+# In Templates (jobs darf ein Generator sein, jeder Block wird einzeln ausgegeben/gestreamt):
+#   {% for cards in job_cards(jobs, "landing") %}{{ cards }}{% else %}<li>leer</li>{% endfor %}
+import threading
+from collections import OrderedDict
+
+from flask import request
+from markupsafe import Markup
+
+from .config import FRAGMENT_CACHE_MB, STREAM_CHUNK
+
+TEMPLATE = "_job_card.html"
+# Variante -> Template-Parameter (Ort-Fallback, Badges ja/nein)
+VARIANTS = {
+    "index": dict(fallback="Remote/DACH", badges=True),
+    "landing": dict(fallback="DACH/Remote", badges=True),
+    "weekly": dict(fallback="DACH/Remote", badges=False),
+}
+
+
+class FragmentCache:
+    # LRU über Schlüssel -> HTML, begrenzt auf max_bytes
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: list) -> list:
+        out = []
+        with self._lock:
+            for key in keys:
+                v = self._data.get(key) if key is not None else None
+                if v is not None:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                out.append(v)
+        return out
+
+    def put_many(self, items):
+        with self._lock:
+            for key, html in items:
+                self.misses += 1
+                if key is None or key in self._data or len(html) > self.max_bytes:
+                    continue
+                self._data[key] = html
+                self._size += len(html)
+            while self._size > self.max_bytes:
+                _, old = self._data.popitem(last=False)
+                self._size -= len(old)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(entries=len(self._data), cached_bytes=self._size, hits=self.hits, misses=self.misses)
+
+
+cache = FragmentCache(FRAGMENT_CACHE_MB * 1024 * 1024)
+
+
+def card_key(job, variant: str):
+    # ohne Zeilenversion (z. B. Teil-SELECT) nicht cachen
+    version = job.get("version")
+    if version is None or job.get("id") is None:
+        return None
+    return (job["id"], version, bool(job.get("is_featured")), bool(job.get("grace_expires_at")),
+            variant, request.script_root)
+
+
+def render_cards(app, jobs, variant: str = "landing") -> Markup:
+    # Treffer aus dem Cache, nur Fehlende durch Jinja; Reihenfolge bleibt erhalten
+    jobs = list(jobs)
+    # Debug-Modus: Templates laden neu -> nichts cachen
+    keys = [None if app.debug else card_key(j, variant) for j in jobs]
+    html = cache.get_many(keys)
+    missing = [i for i, h in enumerate(html) if h is None]
+    if missing:
+        tpl = app.jinja_env.get_template(TEMPLATE)
+        params = VARIANTS[variant]
+        fresh = []
+        for i in missing:
+            html[i] = tpl.render(j=jobs[i], **params)
+            fresh.append((keys[i], html[i]))
+        cache.put_many(fresh)
+    return Markup("\n    ".join(html))
+
+
+def iter_cards(app, jobs, variant: str = "landing", size: int = STREAM_CHUNK):
+    # Iterable von Jobs -> Blöcke fertiger Karten (Markup)
+    block = []
+    for j in jobs:
+        block.append(j)
+        if len(block) >= size:
+            yield render_cards(app, block, variant)
+            block = []
+    if block:
+        yield render_cards(app, block, variant)
+
+
+def init_app(app):
+    @app.template_global()
+    def job_cards(jobs, variant="landing"):
+        return iter_cards(app, jobs, variant)
@@ -0,0 +1,154 @@
+# Offline-Gazetteer für DACH-Städte (app/data/dach_cities.csv).
+# Wird einmal in einen Token-Trie geladen; resolve_city_slugs() läuft linear über den Ortsstring.
+import csv
+import math
+import re
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+
+GAZETTEER_PATH = Path(__file__).resolve().parent / "data" / "dach_cities.csv"
+
+_END = "$"  # Trie-Endmarke (Tokens bestehen nur aus [a-z0-9])
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+
+
+def _ascii(s: str) -> str:
+    return unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("ascii")
+
+
+def city_slug(name: str) -> str:
+    # wie app.slugify() (bestehende /c/<slug>-URLs bleiben gleich), nur ß -> ss statt wegfallen
+    return re.sub(r"[^a-zA-Z0-9]+", "-", _ascii((name or "").replace("ß", "ss"))).strip("-").lower()
+
+
+def tokens(s: str) -> list:
+    # "München" -> ["munchen"]; Umlaut-Umschreibung separat über _key_variants()
+    return _TOKEN_RE.findall(_ascii((s or "").lower()))
+
+
+def _key_variants(name: str):
+    low = name.lower()
+    seen = set()
+    for v in (low, low.translate(_UMLAUTS)):
+        t = tuple(tokens(v))
+        if t and t not in seen:
+            seen.add(t)
+            yield t
+
+
+@lru_cache(maxsize=1)
+def gazetteer():
+    # -> (cities nach slug, Token-Trie, alias-slug -> kanonischer slug)
+    cities, trie, alias_slugs = {}, {}, {}
+    with open(GAZETTEER_PATH, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            slug = city_slug(row["name"])
+            aliases = [a.strip() for a in (row.get("aliases") or "").split("|") if a.strip()]
+            cities[slug] = dict(slug=slug, name=row["name"], country=row["country"],
+                                lat=float(row["lat"]), lon=float(row["lon"]), aliases=aliases)
+            for name in [row["name"]] + aliases:
+                alias_slugs.setdefault(city_slug(name), slug)
+                alias_slugs.setdefault(re.sub(r"[^a-z0-9]+", "-", _ascii(name.lower())).strip("-"), slug)
+                alias_slugs.setdefault(city_slug(name.lower().translate(_UMLAUTS)), slug)
+                for key in _key_variants(name):
+                    node = trie
+                    for t in key:
+                        node = node.setdefault(t, {})
+                    # erster Eintrag gewinnt (größere Stadt steht weiter oben)
+                    node.setdefault(_END, slug)
+    return cities, trie, alias_slugs
+
+
+def resolve_city_slugs(loc: str) -> tuple:
+    # längster Treffer ab jeder Tokenposition; Reihenfolge wie im String, ohne Dubletten
+    if not loc:
+        return ()
+    _, trie, _ = gazetteer()
+    toks = tokens(loc)
+    out = []
+    i, n = 0, len(toks)
+    while i < n:
+        node, j, hit, hit_end = trie, i, None, i
+        while j < n and toks[j] in node:
+            node = node[toks[j]]
+            j += 1
+            if _END in node:
+                hit, hit_end = node[_END], j
+        if hit:
+            if hit not in out:
+                out.append(hit)
+            i = hit_end
+        else:
+            i += 1
+    return tuple(out)
+
+
+def city(slug: str):
+    return gazetteer()[0].get(slug)
+
+
+def canonical_slug(slug: str):
+    # Alias-Slug (z. B. "munich", "muenchen") -> kanonischer Slug ("munchen"), sonst None
+    return gazetteer()[2].get(slug)
+
+
+# --- Umkreissuche: Raster-Index in job_geo + Haversine-Verfeinerung ---
+GRID_DEG = 0.25          # Zellgröße (~28 km N/S); Änderung erfordert init_db(force=True)
+MAX_RADIUS_KM = 300.0
+EARTH_KM = 6371.0088
+
+
+def grid_cell(lat: float, lon: float) -> int:
+    return (math.floor(lat / GRID_DEG) + 1000) * 10000 + (math.floor(lon / GRID_DEG) + 5000)
+
+
+def index_job_geo(cur, job_id: int, location: str):
+    # beim Einstellen/Import: Koordinaten aller erkannten Städte des Jobs ablegen
+    cur.execute("DELETE FROM job_geo WHERE job_id=?", (job_id,))
+    rows = []
+    for slug in resolve_city_slugs(location or ""):
+        c = city(slug)
+        rows.append((job_id, slug, c["lat"], c["lon"], grid_cell(c["lat"], c["lon"])))
+    if rows:
+        cur.executemany("INSERT OR REPLACE INTO job_geo (job_id, city_slug, lat, lon, cell) VALUES (?,?,?,?,?)", rows)
+    return len(rows)
+
+
+def _cell_ranges(lat: float, lon: float, radius_km: float):
+    # Bounding-Box -> pro Rasterzeile ein zusammenhängender cell-Bereich (BETWEEN statt IN-Liste)
+    dlat = radius_km / 111.2
+    dlon = radius_km / (111.2 * max(0.01, math.cos(math.radians(lat))))
+    lat0, lat1 = math.floor((lat - dlat) / GRID_DEG), math.floor((lat + dlat) / GRID_DEG)
+    lon0, lon1 = math.floor((lon - dlon) / GRID_DEG), math.floor((lon + dlon) / GRID_DEG)
+    for ilat in range(lat0, lat1 + 1):
+        base = (ilat + 1000) * 10000
+        yield base + lon0 + 5000, base + lon1 + 5000
+
+
+def jobs_within(cur, lat: float, lon: float, radius_km: float) -> dict:
+    # -> {job_id: Distanz in km}; Kandidaten nur aus den Rasterzellen der Bounding-Box
+    import numpy as np
+
+    radius_km = min(float(radius_km), MAX_RADIUS_KM)
+    ranges = list(_cell_ranges(lat, lon, radius_km))
+    where = " OR ".join(["cell BETWEEN ? AND ?"] * len(ranges))
+    # Tupel statt dict_factory-Zeilen: direkt als Matrix verwendbar
+    raw = cur.connection.cursor()
+    raw.row_factory = None
+    raw.execute(f"SELECT job_id, lat, lon FROM job_geo WHERE {where}", [v for r in ranges for v in r])
+    rows = raw.fetchall()
+    if not rows:
+        return {}
+    m = np.array(rows, dtype=np.float64)
+    ids = m[:, 0].astype(np.int64)
+    la, lo = np.radians(m[:, 1]), np.radians(m[:, 2])
+    la0, lo0 = math.radians(lat), math.radians(lon)
+    a = np.sin((la - la0) / 2) ** 2 + math.cos(la0) * np.cos(la) * np.sin((lo - lo0) / 2) ** 2
+    dist = 2 * EARTH_KM * np.arcsin(np.sqrt(a))
+    out = {}
+    for job_id, d in zip(ids[dist <= radius_km].tolist(), dist[dist <= radius_km].tolist()):
+        if job_id not in out or d < out[job_id]:
+            out[job_id] = d
+    return out
@@ -0,0 +1,410 @@
+# Bild-Proxy für Firmenlogos (jobs.logo_url) und Sponsor-Banner (sponsors.image_url): Templates
+# verlinken /img/<key>/<variante> statt fremder Hosts. key = sha256 der Quell-URL, image_sources
+# ordnet key -> URL zu (eingetragen beim Speichern von Job/Sponsor) -> nur bekannte URLs werden geladen.
+# Erster Abruf: ein Worker-Pool lädt das Original einmal (Typ, Größe, Pixelzahl geprüft), legt es
+# inhaltsadressiert (sha256 der Bytes) auf Platte ab und rechnet die Variante mit Pillow (WebP, sonst
+# PNG). Danach liefert Flask nur noch Dateien mit langem Cache-Header.
+# Plattencache unter IMG_CACHE_DIR:
+#   src/<key>                      -> sha256 des Originals ("!" + Fehler: erst nach IMG_RETRY_SECONDS neu)
+#   orig/<sha[:2]>/<sha>           Original
+#   var/<sha[:2]>/<sha>.<variante>.<format>
+# Über IMG_CACHE_MB fliegen die ältesten Dateien (mtime; Treffer frischen sie täglich auf).
+#   python -m app.imgproxy <url> [--variant logo]   Abruf testen (trägt die URL ein)
+#   python -m app.imgproxy --evict | --stats
+import argparse
+import hashlib
+import http.client
+import ipaddress
+import logging
+import os
+import re
+import socket
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from .config import (IMG_ALLOW_PRIVATE, IMG_CACHE_DIR, IMG_CACHE_MB, IMG_MAX_BYTES, IMG_MAX_PIXELS,
+                     IMG_RETRY_SECONDS, IMG_TIMEOUT, IMG_WORKERS, SITE_NAME)
+
+log = logging.getLogger(__name__)
+
+# Variante -> Box (Breite, Höhe) in Pixeln; skaliert wird nur nach unten, Seitenverhältnis bleibt
+VARIANTS = {
+    "logo": (128, 128),
+    "logo-sm": (64, 64),
+    "banner": (480, 56),  # Sponsor-Leiste: 28 px hoch, doppelte Dichte
+}
+MIMETYPES = {"webp": "image/webp", "png": "image/png"}
+SOURCE_TYPES = {"image/png": "PNG", "image/jpeg": "JPEG", "image/gif": "GIF", "image/webp": "WEBP"}
+KEY_RE = re.compile(r"[0-9a-f]{32}")
+TOUCH_AFTER = 86400  # mtime höchstens täglich auffrischen
+
+
+def image_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+
+
+def is_proxyable(url: str) -> bool:
+    parts = urlsplit(url or "")
+    return parts.scheme in ("http", "https") and bool(parts.hostname)
+
+
+def register(cur, url: str):
+    # beim Speichern von Job/Sponsor; leere oder nicht-HTTP-URLs bleiben draußen
+    url = (url or "").strip()
+    if is_proxyable(url):
+        cur.execute("INSERT OR IGNORE INTO image_sources (key, url) VALUES (?,?)", (image_key(url), url))
+
+
+def lookup(cur, key: str):
+    cur.execute("SELECT url FROM image_sources WHERE key=?", (key,))
+    row = cur.fetchone()
+    return row["url"] if row else None
+
+
+# --- Abruf ---
+def resolve(host: str, port: int) -> list:
+    # einmal auflösen und prüfen -> getaddrinfo-Einträge; verbunden wird genau mit diesen Adressen
+    # (kein zweites Auflösen -> kein DNS-Rebinding zwischen Prüfung und Verbindung)
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"Host nicht auflösbar: {host}") from None
+    if not IMG_ALLOW_PRIVATE:
+        # nur öffentliche Adressen (kein SSRF auf localhost/Intranet/Metadaten-Dienste)
+        for info in infos:
+            if not ipaddress.ip_address(info[4][0].split("%")[0]).is_global:
+                raise ValueError(f"Host nicht erlaubt: {host}")
+    return infos
+
+
+def _pinned_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+    # Ersatz für socket.create_connection in http.client: Host-Header und TLS-SNI bleiben beim Namen
+    host, port = address
+    err = None
+    for family, type_, proto, _, sockaddr in resolve(host, port):
+        sock = socket.socket(family, type_, proto)
+        try:
+            if timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
+                sock.settimeout(timeout)
+            if source_address:
+                sock.bind(source_address)
+            sock.connect(sockaddr)
+            return sock
+        except OSError as e:
+            sock.close()
+            err = e
+    raise err or OSError(f"keine Verbindung zu {host}")
+
+
+class _PinnedHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _pinned_connection
+
+
+class _PinnedHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _pinned_connection
+
+
+class _PinnedHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_PinnedHTTPConnection, req)
+
+
+class _PinnedHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_PinnedHTTPSConnection, req, context=self._context)
+
+
+class _CheckedRedirects(urllib.request.HTTPRedirectHandler):
+    # Weiterleitungen nur auf http(s); das Ziel prüft die Verbindung selbst (_pinned_connection)
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        if not is_proxyable(newurl):
+            raise ValueError(f"Weiterleitung nicht erlaubt: {newurl}")
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+# ohne Proxy-Handler: Verbindungen gehen immer direkt an die geprüfte Adresse
+_opener = urllib.request.build_opener(urllib.request.ProxyHandler({}), _PinnedHTTPHandler, _PinnedHTTPSHandler,
+                                      _CheckedRedirects)
+
+
+def fetch(url: str, max_bytes: int = IMG_MAX_BYTES, timeout: float = IMG_TIMEOUT) -> bytes:
+    # -> Bytes des Originals; falscher Typ, zu groß, HTTP-Fehler -> ValueError
+    if not is_proxyable(url):
+        raise ValueError(f"keine HTTP-URL: {url}")
+    req = urllib.request.Request(url, headers={"User-Agent": f"{SITE_NAME} image proxy", "Accept": ", ".join(SOURCE_TYPES)})
+    try:
+        with _opener.open(req, timeout=timeout) as resp:
+            ctype = resp.headers.get_content_type()
+            if ctype not in SOURCE_TYPES:
+                raise ValueError(f"kein unterstütztes Bild: {ctype}")
+            if int(resp.headers.get("Content-Length") or 0) > max_bytes:
+                raise ValueError("Bild zu groß")
+            data = resp.read(max_bytes + 1)
+    except (urllib.error.URLError, OSError) as e:
+        raise ValueError(f"Abruf fehlgeschlagen: {e}") from None
+    if len(data) > max_bytes:
+        raise ValueError("Bild zu groß")
+    return data
+
+
+def open_image(data: bytes):
+    # Pillow prüft das Format selbst (Content-Type kann lügen); Pixelzahl vor dem Dekodieren
+    from PIL import Image
+    try:
+        img = Image.open(BytesIO(data))
+    except Exception:
+        raise ValueError("Bild nicht lesbar") from None
+    if img.format not in SOURCE_TYPES.values():
+        raise ValueError(f"Format nicht erlaubt: {img.format}")
+    if img.width * img.height > IMG_MAX_PIXELS:
+        raise ValueError(f"Bild zu groß: {img.width}x{img.height}")
+    return img
+
+
+def render(data: bytes, variant: str, fmt: str) -> bytes:
+    # Original -> Variante (erstes Frame bei GIF/animiertem WebP)
+    from PIL import Image, ImageOps
+    img = open_image(data)
+    img.seek(0)
+    img = ImageOps.exif_transpose(img)
+    img = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P", "PA") or "transparency" in img.info else "RGB")
+    img.thumbnail(VARIANTS[variant], Image.LANCZOS)
+    out = BytesIO()
+    if fmt == "webp":
+        img.save(out, format="WEBP", quality=85, method=4)
+    else:
+        img.save(out, format="PNG", optimize=True)
+    return out.getvalue()
+
+
+# --- Plattencache ---
+def _write(path: Path, data: bytes):
+    # atomar: andere Worker/Prozesse sehen nie halbe Dateien
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+class ImageCache:
+
+    def __init__(self, root: str = IMG_CACHE_DIR, max_bytes: int = IMG_CACHE_MB * 1024 * 1024,
+                 workers: int = IMG_WORKERS):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="imgproxy")
+        self._inflight = {}  # (key, variante, format) -> Future; gleiche Anfragen teilen sich einen Abruf
+        self._lock = threading.Lock()
+        self._evicting = False
+        self.hits = 0
+        self.misses = 0
+        self.fetched = 0
+        self.errors = 0
+        self.evicted = 0
+
+    def _source(self, key: str):
+        # -> sha256 des Originals, "!…" bei frischem Fehler, None = unbekannt/abgelaufen
+        p = self.root / "src" / key
+        try:
+            v = p.read_text()
+            if v.startswith("!") and time.time() - p.stat().st_mtime > IMG_RETRY_SECONDS:
+                return None
+            return v
+        except OSError:
+            return None
+
+    def _variant_path(self, sha: str, variant: str, fmt: str) -> Path:
+        return self.root / "var" / sha[:2] / f"{sha}.{variant}.{fmt}"
+
+    def cached(self, key: str, variant: str, fmt: str):
+        # Schnellweg ohne DB und Pool -> (Pfad, sha) oder None
+        sha = self._source(key)
+        if not sha or sha.startswith("!"):
+            return None
+        path = self._variant_path(sha, variant, fmt)
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        if time.time() - st.st_mtime > TOUCH_AFTER:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        with self._lock:
+            self.hits += 1
+        return path, sha
+
+    def produce(self, key: str, url: str, variant: str, fmt: str, timeout: float = IMG_TIMEOUT * 2):
+        # Cache-Fehlschlag: im Pool laden/skalieren und darauf warten -> (Pfad, sha) oder None
+        k = (key, variant, fmt)
+        with self._lock:
+            self.misses += 1
+            fut = self._inflight.get(k)
+            if fut is None:
+                fut = self._inflight[k] = self._pool.submit(self._produce, key, url, variant, fmt)
+                fut.add_done_callback(lambda f: self._done(k, f))
+        try:
+            return fut.result(timeout=timeout)
+        except Exception as e:
+            log.info("imgproxy %s: %s", url, e)
+            return None
+
+    def _done(self, k, fut):
+        with self._lock:
+            if self._inflight.get(k) is fut:
+                del self._inflight[k]
+
+    def _produce(self, key: str, url: str, variant: str, fmt: str):
+        sha = self._source(key)
+        if sha and sha.startswith("!"):
+            raise ValueError(sha[1:])
+        data = None
+        if sha:
+            try:
+                data = (self.root / "orig" / sha[:2] / sha).read_bytes()
+            except OSError:
+                sha = None  # Original verdrängt -> neu laden
+        if data is None:
+            try:
+                data = fetch(url)
+                open_image(data)
+            except ValueError as e:
+                self._fail(key, e)
+                raise
+            sha = hashlib.sha256(data).hexdigest()
+            _write(self.root / "orig" / sha[:2] / sha, data)
+            _write(self.root / "src" / key, sha.encode("ascii"))
+            with self._lock:
+                self.fetched += 1
+        path = self._variant_path(sha, variant, fmt)
+        if not path.exists():
+            try:
+                out = render(data, variant, fmt)
+            except Exception as e:
+                # Pillow scheitert oft erst beim Dekodieren (abgeschnittene Datei …): wie ein Abruffehler
+                # merken, sonst lädt und dekodiert jede weitere Anfrage das Bild erneut im Pool
+                self._fail(key, e)
+                raise ValueError(f"Bild nicht lesbar: {e}") from None
+            _write(path, out)
+        return path, sha
+
+    def _fail(self, key: str, err: Exception):
+        # negativer Eintrag in src/<key>, gilt IMG_RETRY_SECONDS
+        with self._lock:
+            self.errors += 1
+        _write(self.root / "src" / key, f"!{err}".encode("utf-8"))
+
+    # --- Verdrängung ---
+    def evict(self, max_bytes: int = None) -> tuple:
+        # älteste Dateien (mtime) löschen, bis der Cache unter 90 % der Grenze liegt -> (Dateien, Bytes)
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        files, total = [], 0
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                try:
+                    st = os.stat(os.path.join(dirpath, name))
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, os.path.join(dirpath, name)))
+                total += st.st_size
+        if total <= max_bytes:
+            return 0, 0
+        files.sort()
+        n = freed = 0
+        for _, size, path in files:
+            if total - freed <= max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            n += 1
+            freed += size
+        with self._lock:
+            self.evicted += n
+        return n, freed
+
+    def kick_evict(self):
+        # aus dem Housekeeping: im Pool, höchstens ein Lauf gleichzeitig
+        with self._lock:
+            if self._evicting:
+                return
+            self._evicting = True
+
+        def run():
+            try:
+                self.evict()
+            except Exception:
+                log.exception("imgproxy: Verdrängung fehlgeschlagen")
+            finally:
+                self._evicting = False
+
+        self._pool.submit(run)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(hits=self.hits, misses=self.misses, fetched=self.fetched, errors=self.errors,
+                        evicted=self.evicted, inflight=len(self._inflight))
+
+
+def init_app(app):
+    # {{ img_src(job.logo_url, "logo") }} -> /img/<key>/logo; leer/keine HTTP-URL -> ""
+    from flask import url_for
+
+    @app.template_global()
+    def img_src(url, variant="logo", external=False):
+        url = (url or "").strip()
+        if not is_proxyable(url):
+            return ""
+        return url_for("img_proxy", key=image_key(url), variant=variant, _external=external)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.imgproxy", description="Bild-Proxy (Logos, Sponsor-Banner)")
+    ap.add_argument("url", nargs="?", help="Quell-URL laden und Variante erzeugen")
+    ap.add_argument("--variant", choices=sorted(VARIANTS), default="logo")
+    ap.add_argument("--format", choices=sorted(MIMETYPES), default="webp")
+    ap.add_argument("--evict", action="store_true", help="Cache auf IMG_CACHE_MB kürzen")
+    ap.add_argument("--stats", action="store_true")
+    args = ap.parse_args(argv)
+
+    cache = ImageCache()
+    if args.url:
+        from .db import db, init_db
+        init_db()
+        with db() as conn:
+            register(conn.cursor(), args.url)
+        key = image_key(args.url)
+        try:
+            path, sha = cache._produce(key, args.url, args.variant, args.format)
+        except ValueError as e:
+            print(f"Fehler: {e}", file=sys.stderr)
+            return 1
+        print(f"/img/{key}/{args.variant} -> {path} ({path.stat().st_size} Bytes)")
+    if args.evict:
+        n, freed = cache.evict()
+        print(f"{n} Dateien verdrängt ({freed // 1024} KiB)")
+    if args.stats or not (args.url or args.evict):
+        n = size = 0
+        for dirpath, _, names in os.walk(cache.root):
+            for name in names:
+                n += 1
+                size += os.path.getsize(os.path.join(dirpath, name))
+        print(f"{cache.root}: {n} Dateien, {size // 1024} KiB (Grenze {IMG_CACHE_MB} MiB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
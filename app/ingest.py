@@ -0,0 +1,363 @@
+# Bulk-Import von Partner-/Aggregator-Feeds (JSON Lines oder CSV), Upsert über (source, external_id).
+#   python -m app.ingest feed.jsonl --source partnerx      (Datei oder "-" für stdin)
+#   python -m app.ingest --process-pending                 (nur Nacharbeiten abarbeiten)
+# Web: POST /admin/ingest?source=partnerx (Body = Feed, Token wie Admin oder INGEST_TOKEN)
+# Geo-Index und ähnliche Jobs laufen nicht pro Zeile, sondern später über ingest_pending.
+import argparse
+import csv
+import hashlib
+import io
+import json
+import re
+import logging
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from .config import DEDUP_POLICY, INGEST_CHUNK, INGEST_MAX_ATTEMPTS, INGEST_PENDING_BLOCK, INGEST_REBUILD_MIN
+from .db import db, read_db
+from .writer import savepoint
+from . import alerts
+from . import archive
+from . import dedup
+from . import geo
+from . import imgproxy
+from . import similar
+
+log = logging.getLogger(__name__)
+
+MAX_REJECTS = 50           # so viele Ablehnungen werden mit Zeilennummer gemeldet
+MAX_TITLE = 200
+MAX_DESCRIPTION = 20000
+
+# Feldname im Feed -> Spalte; erster vorhandener Alias gewinnt
+FIELDS = dict(
+    external_id=("external_id", "id", "guid", "ref"),
+    title=("title",),
+    company=("company", "employer"),
+    location=("location", "city"),
+    email=("email", "apply_email", "contact_email"),
+    logo_url=("logo_url", "logo"),
+    description=("description", "body", "text"),
+    created_at=("created_at", "posted_at", "date"),
+)
+_EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+UPSERT_SQL = """
+INSERT INTO jobs (source, external_id, title, company, location, email, logo_url, description,
+                  content_hash, created_at)
+VALUES (?,?,?,?,?,?,?,?,?, COALESCE(?, CURRENT_TIMESTAMP))
+ON CONFLICT(source, external_id) DO UPDATE SET
+    title=excluded.title, company=excluded.company, location=excluded.location,
+    email=excluded.email, logo_url=excluded.logo_url, description=excluded.description,
+    content_hash=excluded.content_hash
+"""
+
+
+def detect_format(fmt: str = "", hint: str = "") -> str:
+    # explizites format > Content-Type/Dateiendung > JSON Lines
+    fmt = (fmt or "").lower()
+    if fmt in ("csv", "jsonl"):
+        return fmt
+    return "csv" if "csv" in (hint or "").lower() else "jsonl"
+
+
+def read_records(stream, fmt: str):
+    # Textstream -> (zeilennummer, datensatz, fehler); liest zeilenweise, nie den ganzen Feed
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for rec in reader:
+            yield reader.line_num, rec, None
+        return
+    for n, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            yield n, None, "ungültiges JSON"
+            continue
+        if not isinstance(rec, dict):
+            yield n, None, "kein JSON-Objekt"
+            continue
+        yield n, rec, None
+
+
+def _field(rec: dict, name: str) -> str:
+    for key in FIELDS[name]:
+        v = rec.get(key)
+        if v is not None and str(v).strip():
+            return str(v).strip()
+    return ""
+
+
+def _timestamp(value: str):
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return dt.replace(tzinfo=None).isoformat(sep=" ", timespec="seconds")
+
+
+def normalize(rec: dict) -> tuple:
+    # -> (external_id, title, company, location, email, logo_url, description, content_hash, created_at)
+    # ValueError mit Grund, wenn der Datensatz abgelehnt wird
+    v = {name: _field(rec, name) for name in FIELDS}
+    for name in ("external_id", "title", "company", "description"):
+        if not v[name]:
+            raise ValueError(f"{name} fehlt")
+    if len(v["title"]) > MAX_TITLE:
+        raise ValueError("title zu lang")
+    if len(v["description"]) > MAX_DESCRIPTION:
+        raise ValueError("description zu lang")
+    if v["email"] and not _EMAIL_RE.match(v["email"]):
+        raise ValueError("email ungültig")
+    content = (v["title"], v["company"], v["location"], v["email"], v["logo_url"], v["description"])
+    digest = hashlib.sha1("\x1f".join(content).encode("utf-8")).hexdigest()
+    return (v["external_id"],) + content + (digest, _timestamp(v["created_at"]))
+
+
+def write_chunk(cur, source: str, rows: list) -> tuple:
+    # ein Block = eine Transaktion; unveränderte Datensätze (gleicher Hash) werden gar nicht geschrieben
+    marks = ",".join("?" * len(rows))
+    ext_ids = [r[0] for r in rows]
+    cur.execute(f"SELECT external_id, content_hash FROM jobs WHERE source=? AND external_id IN ({marks})",
+                [source] + ext_ids)
+    known = {r["external_id"]: r["content_hash"] for r in cur.fetchall()}
+    # archivierte Jobs: unverändert -> bleiben im Archiv; geändert -> zurückholen (gleiche ID), dann Update.
+    # Sonst legte der Upsert eine zweite Kopie an und der alte Job wäre beim nächsten Restore doppelt
+    missing = [e for e in ext_ids if e not in known]
+    if missing:
+        cur.execute(f"""SELECT id, external_id, content_hash FROM jobs_archive
+                        WHERE source=? AND external_id IN ({",".join("?" * len(missing))})""", [source] + missing)
+        archived = {r["external_id"]: r for r in cur.fetchall()}
+        for r in rows:
+            a = archived.get(r[0])
+            if a is None:
+                continue
+            if a["content_hash"] != r[7]:
+                archive.restore_job(cur, a["id"])
+            known[r[0]] = a["content_hash"]
+    todo = [r for r in rows if known.get(r[0]) != r[7]]
+    if todo:
+        cur.executemany(UPSERT_SQL, [(source,) + r for r in todo])
+        cur.execute(f"""INSERT OR IGNORE INTO ingest_pending (job_id)
+                        SELECT id FROM jobs WHERE source=? AND external_id IN ({",".join("?" * len(todo))})""",
+                    [source] + [r[0] for r in todo])
+    inserted = sum(1 for r in todo if r[0] not in known)
+    return inserted, len(todo) - inserted, len(rows) - len(todo)
+
+
+def ingest(records, source: str, write_fn, chunk: int = INGEST_CHUNK) -> dict:
+    # write_fn(source, rows) -> (neu, geändert, unverändert): CLI = eigene Transaktion, Web = Writer-Job
+    t0 = time.perf_counter()
+    report = dict(source=source, read=0, inserted=0, updated=0, unchanged=0, rejected=0, rejects=[])
+    batch = {}
+
+    def flush():
+        if not batch:
+            return
+        ins, upd, same = write_fn(source, list(batch.values()))
+        report["inserted"] += ins
+        report["updated"] += upd
+        report["unchanged"] += same
+        batch.clear()
+
+    for n, rec, err in records:
+        report["read"] += 1
+        row = None
+        if err is None:
+            try:
+                row = normalize(rec)
+            except ValueError as e:
+                err = str(e)
+        if err:
+            report["rejected"] += 1
+            if len(report["rejects"]) < MAX_REJECTS:
+                report["rejects"].append(dict(line=n, reason=err))
+            continue
+        batch[row[0]] = row  # doppelte external_id im Block: letzter Eintrag gewinnt
+        if len(batch) >= chunk:
+            flush()
+    flush()
+    secs = time.perf_counter() - t0
+    report["seconds"] = round(secs, 3)
+    report["rows_per_sec"] = round(report["read"] / secs, 1) if secs > 0 else 0.0
+    return report
+
+
+def _process_one(cur, r, skills_fn, update_similar: bool):
+    geo.index_job_geo(cur, r["id"], r["location"])
+    imgproxy.register(cur, r["logo_url"])
+    skills = skills_fn(f"{r['title']} {r['description']}")
+    if update_similar:
+        similar.update_job(cur, r["id"], r["title"], r["description"], skills)
+    if DEDUP_POLICY != "off":
+        dups = dedup.check_job(cur, r["id"], r["title"], r["company"], r["description"])
+        # "reject": Kopie einer älteren Anzeige bleibt unsichtbar
+        if DEDUP_POLICY == "reject" and r["status"] == "published" and any(o < r["id"] for o, _ in dups):
+            cur.execute("UPDATE jobs SET status='duplicate' WHERE id=?", (r["id"],))
+            return
+    if r["status"] == "published":
+        # Job-Alerts; bereits gemeldete (alert, job)-Paare ignoriert die Outbox
+        alerts.percolate(cur, r["id"], alerts.job_terms(r["title"], r["company"], r["location"], r["description"],
+                                                        skills, geo.resolve_city_slugs(r["location"] or "")))
+
+
+def process_pending(cur, skills_fn, limit: int = INGEST_PENDING_BLOCK, update_similar: bool = True) -> int:
+    # Hintergrund-Stufe: Geo-Index, Logo-Proxy, ähnliche Jobs, Dubletten und Job-Alerts für einen Block importierter Jobs.
+    # update_similar=False bei großen Feeds: danach einmal rebuild_similar() statt n inkrementeller Updates.
+    # Jeder Job in eigenem Savepoint: ein Fehler zählt attempts hoch, nach INGEST_MAX_ATTEMPTS bleibt der
+    # Eintrag liegen (Dead Letter, python -m app.ingest --retry-failed) statt endlos wiederholt zu werden.
+    cur.execute("""SELECT p.job_id, j.id, j.title, j.company, j.description, j.location, j.status, j.logo_url
+                   FROM ingest_pending p LEFT JOIN jobs j ON j.id = p.job_id
+                   WHERE p.attempts < ?
+                   ORDER BY p.job_id LIMIT ?""", (INGEST_MAX_ATTEMPTS, limit))
+    rows = cur.fetchall()
+    done, failed = [], []
+    for r in rows:
+        if r["id"] is not None:  # sonst inzwischen gelöscht
+            try:
+                with savepoint(cur, "pending"):
+                    _process_one(cur, r, skills_fn, update_similar)
+            except Exception as e:
+                log.exception("Nacharbeiten für Job %s fehlgeschlagen", r["id"])
+                failed.append((f"{type(e).__name__}: {e}"[:500], r["job_id"]))
+                continue
+        done.append((r["job_id"],))
+    cur.executemany("DELETE FROM ingest_pending WHERE job_id=?", done)
+    cur.executemany("UPDATE ingest_pending SET attempts = attempts + 1, last_error = ? WHERE job_id=?", failed)
+    return len(rows)
+
+
+def pending_count(cur) -> int:
+    # nur offene Einträge; Dead Letters zählt failed_count()
+    cur.execute("SELECT COUNT(*) AS n FROM ingest_pending WHERE attempts < ?", (INGEST_MAX_ATTEMPTS,))
+    return cur.fetchone()["n"]
+
+
+def failed_count(cur) -> int:
+    cur.execute("SELECT COUNT(*) AS n FROM ingest_pending WHERE attempts >= ?", (INGEST_MAX_ATTEMPTS,))
+    return cur.fetchone()["n"]
+
+
+def retry_failed(cur) -> int:
+    cur.execute("UPDATE ingest_pending SET attempts = 0 WHERE attempts >= ?", (INGEST_MAX_ATTEMPTS,))
+    return cur.rowcount
+
+
+def _run_db(fn, *args):
+    # ohne Writer-Thread (CLI): jeder Schreibjob eine eigene kurze Transaktion
+    with db() as conn:
+        return fn(conn.cursor(), *args)
+
+
+def rebuild_similar(skills_fn, run=_run_db) -> int:
+    # Rechnen auf eigener Lese-Verbindung, Schreiben blockweise über run (writer.run im Webprozess)
+    with read_db() as conn:
+        return similar.rebuild(conn, skills_fn, run=run)
+
+
+_rebuild_state = dict(running=False, again=False)
+_rebuild_lock = threading.Lock()
+
+
+def rebuild_similar_async(run, skills_fn):
+    # großer Feed im Webprozess: Neuaufbau im Hintergrund-Thread statt als ein langer Writer-Job.
+    # Läuft schon einer, wird danach genau einmal neu gerechnet (er kennt die neuen Jobs evtl. nicht)
+    with _rebuild_lock:
+        if _rebuild_state["running"]:
+            _rebuild_state["again"] = True
+            return
+        _rebuild_state["running"] = True
+
+    def loop():
+        while True:
+            try:
+                rebuild_similar(skills_fn, run)
+            except Exception:
+                log.exception("Neuaufbau ähnlicher Jobs fehlgeschlagen")
+            with _rebuild_lock:
+                if not _rebuild_state["again"]:
+                    _rebuild_state["running"] = False
+                    return
+                _rebuild_state["again"] = False
+
+    threading.Thread(target=loop, name="similar-rebuild", daemon=True).start()
+
+
+def _print_report(report: dict):
+    print(f"{report['source']}: {report['read']} gelesen, {report['inserted']} neu, {report['updated']} geändert, "
+          f"{report['unchanged']} unverändert, {report['rejected']} abgelehnt "
+          f"in {report['seconds']}s ({report['rows_per_sec']} Zeilen/s)")
+    for r in report["rejects"]:
+        print(f"  Zeile {r['line']}: {r['reason']}")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.ingest", description="Partner-Feed importieren")
+    ap.add_argument("file", nargs="?", help="JSONL/CSV-Datei oder - für stdin")
+    ap.add_argument("--source", help="Feed-Name (Default: Dateiname ohne Endung)")
+    ap.add_argument("--format", choices=("jsonl", "csv"))
+    ap.add_argument("--chunk", type=int, default=INGEST_CHUNK)
+    ap.add_argument("--defer", action="store_true", help="Nacharbeiten nicht direkt ausführen")
+    ap.add_argument("--process-pending", action="store_true", help="nur offene Nacharbeiten abarbeiten")
+    ap.add_argument("--retry-failed", action="store_true",
+                    help="fehlgeschlagene Nacharbeiten (Dead Letters) erneut einreihen")
+    args = ap.parse_args(argv)
+
+    from .app import job_skills  # Skill-Erkennung lebt in der App
+    from .db import init_db
+    init_db()
+    if args.retry_failed:
+        with db() as conn:
+            print(f"{retry_failed(conn.cursor())} Nacharbeiten erneut eingereiht")
+        args.process_pending = True
+
+    if args.file and not args.process_pending:
+        source = args.source or ("stdin" if args.file == "-" else Path(args.file).stem)
+        fmt = detect_format(args.format, args.file)
+
+        def write_fn(src, rows):
+            with db() as conn:
+                return write_chunk(conn.cursor(), src, rows)
+
+        if args.file == "-":
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig", newline="")
+        else:
+            stream = open(args.file, encoding="utf-8-sig", newline="")
+        with stream:
+            report = ingest(read_records(stream, fmt), source, write_fn, args.chunk)
+        _print_report(report)
+        if args.defer:
+            return 0
+    elif not args.process_pending:
+        ap.error("Datei oder --process-pending angeben")
+
+    t0, done = time.perf_counter(), 0
+    with db() as conn:
+        bulk = pending_count(conn.cursor()) >= INGEST_REBUILD_MIN
+    while True:
+        with db() as conn:
+            n = process_pending(conn.cursor(), job_skills, update_similar=not bulk)
+        if not n:
+            break
+        done += n
+    if bulk:
+        rebuild_similar(job_skills)
+    print(f"Nacharbeiten: {done} Jobs in {time.perf_counter() - t0:.2f}s"
+          + (" (ähnliche Jobs komplett neu berechnet)" if bulk else ""))
+    with db() as conn:
+        failed = failed_count(conn.cursor())
+    if failed:
+        print(f"  {failed} fehlgeschlagen (Dead Letters, siehe ingest_pending.last_error; --retry-failed)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
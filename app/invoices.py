@@ -0,0 +1,233 @@
+# Rechnungen: PDF (ReportLab) für einzelne Bestellungen und Sammel-Export als ZIP zum Monatsende.
+# Der Export rendert blockweise in einem Prozess-Pool ("spawn": der Web-Worker hat Threads und wird
+# nicht geforkt) und schreibt das ZIP inkrementell: jedes fertige PDF geht sofort in den Stream,
+# im Speicher liegen nur die Blöcke im Fenster. ledger.csv am Ende fasst alle Rechnungen zusammen.
+# Gespeicherte PDFs gibt es nicht (Rechnungsdatum = Tag des Abrufs) -> jede Rechnung wird gerendert.
+#   python -m app.invoices --from 2025-01-01 --to 2025-01-31 [--status paid] -o rechnungen.zip
+import argparse
+import csv
+import multiprocessing
+import os
+import sys
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from io import BytesIO, StringIO
+
+from .config import BIC, IBAN, INVOICE_BATCH, INVOICE_WORKERS, OWNER_NAME, SITE_NAME
+
+LEDGER = "ledger.csv"
+LEDGER_HEADER = ["invoice_no", "order_id", "reference", "kind", "customer", "item", "amount", "currency",
+                 "status", "created_at", "paid_at", "file"]
+
+
+def invoice_number(order) -> str:
+    return f"INV-{datetime.utcnow().strftime('%Y')}-{order['id']:05d}"
+
+
+def invoice_item(job=None, sponsor=None) -> str:
+    if job:
+        return "Featured Job Listing (30 Tage)"
+    if sponsor:
+        return "Sponsoring Top‑Banner (7 Tage)"
+    return "Leistung"
+
+
+def _eur(amount: float) -> str:
+    return f"{amount:,.2f} EUR".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def invoice_pdf_buffer(order, job=None, sponsor=None):
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    width, height = A4
+
+    # Header
+    c.setFont("Helvetica-Bold", 16)
+    title = "Rechnung" if order["status"] == "paid" else "Proforma-Rechnung"
+    c.drawString(40, height-60, f"{title} — {SITE_NAME}")
+    c.setFont("Helvetica", 10)
+    c.drawString(40, height-78, f"Rechnungsnr.: {invoice_number(order)}")
+    c.drawString(40, height-92, f"Datum: {datetime.utcnow().strftime('%Y-%m-%d')}")
+    c.drawString(40, height-106, f"Referenz: {order['reference']}")
+
+    # Anbieter (wir)
+    y = height - 140
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(40, y, "Leistungserbringer")
+    c.setFont("Helvetica", 10)
+    c.drawString(40, y-16, OWNER_NAME)
+    c.drawString(40, y-30, f"IBAN: {IBAN}")
+    if BIC:
+        c.drawString(40, y-44, f"BIC: {BIC}")
+
+    # Kunde
+    y -= 80
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(40, y, "Leistungsempfänger")
+    c.setFont("Helvetica", 10)
+    if job:
+        c.drawString(40, y-16, job.get("company",""))
+        if job.get("email"):
+            c.drawString(40, y-30, job["email"])
+    elif sponsor:
+        c.drawString(40, y-16, sponsor.get("company",""))
+        if sponsor.get("website"):
+            c.drawString(40, y-30, sponsor["website"])
+    else:
+        c.drawString(40, y-16, "Unbekannt")
+
+    # Positionen
+    y -= 70
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(40, y, "Positionen")
+    c.setFont("Helvetica", 10)
+
+    amount = order["price_cents"]/100.0
+    c.drawString(40, y-18, f"1x {invoice_item(job, sponsor)}")
+    c.drawRightString(width-40, y-18, _eur(amount))
+
+    # Summe
+    y -= 50
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(40, y, "Gesamt")
+    c.drawRightString(width-40, y, _eur(amount))
+
+    # Fuß
+    y -= 40
+    c.setFont("Helvetica", 8)
+    c.drawString(40, y, "Hinweis: Beispiel-Rechnung. USt-Hinweis bitte an dein Unternehmen anpassen (z. B. §19 UStG / Reverse Charge).")
+    if order["status"] != "paid":
+        c.setFillColorRGB(0.8, 0.0, 0.0)
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(40, y-16, "Unbezahlt — Zahlung per SEPA-Überweisung, Verwendungszweck siehe Checkout.")
+        c.setFillColorRGB(0,0,0)
+
+    c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+# --- Sammel-Export ---
+def recipients(row) -> tuple:
+    # Zeile aus orders.export_rows() -> (job, sponsor) wie bei der Einzelrechnung
+    if row["job_id"] != 0:
+        job = dict(company=row["job_company"], email=row["job_email"]) if row["job_company"] is not None else None
+        return job, None
+    sponsor = dict(company=row["sponsor_company"], website=row["sponsor_website"]) if row["sponsor_company"] is not None else None
+    return None, sponsor
+
+
+def _render_batch(rows: list) -> list:
+    # läuft im Pool-Prozess; Zeilen sind einfache dicts (picklebar)
+    return [invoice_pdf_buffer(r, *recipients(r)) for r in rows]
+
+
+def iter_pdfs(rows: list, workers: int = INVOICE_WORKERS, batch: int = INVOICE_BATCH):
+    # -> (zeile, pdf) in Reihenfolge; höchstens 2 Blöcke je Prozess unterwegs
+    batches = [rows[i:i + batch] for i in range(0, len(rows), batch)]
+    workers = min(workers or os.cpu_count() or 1, len(batches))
+    if workers <= 1:
+        # ein Block bzw. ein Kern: Pool-Start lohnt nicht
+        for r in rows:
+            yield r, invoice_pdf_buffer(r, *recipients(r))
+        return
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        pending, todo = deque(), iter(batches)
+        for b in todo:
+            pending.append((b, pool.submit(_render_batch, b)))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            b, fut = pending.popleft()
+            pdfs = fut.result()
+            nxt = next(todo, None)
+            if nxt is not None:
+                pending.append((nxt, pool.submit(_render_batch, nxt)))
+            yield from zip(b, pdfs)
+    finally:
+        # Abbruch (Client weg) -> nicht gestartete Blöcke verwerfen
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+class _Sink:
+    # nicht-seekbares Ziel für ZipFile (-> Data Descriptors); drain() gibt das bisher Geschriebene ab
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+def ledger_row(row, name: str) -> list:
+    job, sponsor = recipients(row)
+    customer = (job or sponsor or {}).get("company") or "Unbekannt"
+    return [invoice_number(row), row["id"], row["reference"], "job" if row["job_id"] != 0 else "sponsor", customer,
+            invoice_item(job, sponsor), f"{row['price_cents'] / 100:.2f}", row["currency"], row["status"],
+            row["created_at"], row["paid_at"] or "", name]
+
+
+def zip_stream(rows: list, workers: int = INVOICE_WORKERS):
+    # Bytes-Blöcke eines ZIPs: invoice_<id>.pdf je Bestellung + ledger.csv (mit Summen je Status/Währung)
+    sink = _Sink()
+    stamp = time.localtime()[:6]
+    ledger = StringIO()
+    w = csv.writer(ledger)
+    w.writerow(LEDGER_HEADER)
+    totals = {}
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for row, pdf in iter_pdfs(rows, workers):
+            name = f"invoice_{row['id']}.pdf"
+            zf.writestr(zipfile.ZipInfo(name, stamp), pdf, compress_type=zipfile.ZIP_DEFLATED)
+            w.writerow(ledger_row(row, name))
+            key = (row["status"], row["currency"])
+            totals[key] = totals.get(key, 0) + row["price_cents"]
+            yield sink.drain()
+        for (status, currency), cents in sorted(totals.items()):
+            w.writerow(["Summe", "", "", "", "", "", f"{cents / 100:.2f}", currency, status, "", "", ""])
+        zf.writestr(zipfile.ZipInfo(LEDGER, stamp), ledger.getvalue().encode("utf-8"),
+                    compress_type=zipfile.ZIP_DEFLATED)
+    yield sink.drain()
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.invoices", description="Rechnungen als ZIP exportieren")
+    ap.add_argument("--from", dest="from_", metavar="YYYY-MM-DD", help="Bestellungen ab diesem Tag")
+    ap.add_argument("--to", metavar="YYYY-MM-DD", help="bis einschließlich")
+    ap.add_argument("--status", choices=("pending", "paid"))
+    ap.add_argument("--kind", choices=("job", "sponsor"))
+    ap.add_argument("--workers", type=int, default=INVOICE_WORKERS, help="Prozesse (0 = alle Kerne)")
+    ap.add_argument("-o", "--out", default="rechnungen.zip")
+    args = ap.parse_args(argv)
+
+    from . import orders
+    from .db import read_db
+    f = orders.parse_filters({"from": args.from_, "to": args.to, "status": args.status, "kind": args.kind})
+    with read_db() as conn:
+        rows = orders.export_rows(conn.cursor(), f)
+    t0 = time.perf_counter()
+    size = 0
+    with open(args.out, "wb") as fh:
+        for chunk in zip_stream(rows, args.workers):
+            fh.write(chunk)
+            size += len(chunk)
+    print(f"{len(rows)} Rechnungen -> {args.out} ({size // 1024} KiB, {time.perf_counter() - t0:.1f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
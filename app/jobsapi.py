@@ -0,0 +1,79 @@
+# Lese-API für Partner (/api/jobs): veröffentlichte Jobs wie collect_jobs(), neueste zuerst,
+# Keyset-Cursor über jobs.id (?cursor=<id> -> ältere), kein OFFSET.
+# ?fields= wählt Spalten direkt im SELECT aus; berechnete Felder (skills, cities, url) ziehen nur
+# die Spalten nach, die sie brauchen. Skill-/Stadt-Filter kommen als ID-Liste aus den Facetten.
+from datetime import datetime, timezone
+
+COLUMNS = ("id", "title", "company", "location", "description", "logo_url", "created_at", "updated_at", "is_featured")
+# berechnetes Feld -> benötigte Spalten
+COMPUTED = {"skills": ("title", "description"), "cities": ("location",), "url": ()}
+DEFAULT_FIELDS = ("id", "title", "company", "location", "created_at", "skills", "cities", "url")
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+CHUNK = 500
+
+
+def parse_fields(raw: str) -> tuple:
+    # "id,title,skills" -> Tupel in Anfrage-Reihenfolge; unbekannte Felder -> ValueError
+    if not (raw or "").strip():
+        return DEFAULT_FIELDS
+    fields = []
+    for name in raw.split(","):
+        name = name.strip()
+        if name and name not in fields:
+            if name not in COLUMNS and name not in COMPUTED:
+                raise ValueError(f"unbekanntes Feld: {name}")
+            fields.append(name)
+    return tuple(fields) or DEFAULT_FIELDS
+
+
+def parse_since(raw: str):
+    # ISO-Datum/Zeitpunkt -> SQLite-Format ("YYYY-MM-DD HH:MM:SS", UTC); leer -> None
+    if not (raw or "").strip():
+        return None
+    try:
+        dt = datetime.fromisoformat(raw.strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"since: ungültiger Zeitpunkt {raw.strip()!r}") from None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def select_columns(fields: tuple) -> list:
+    cols = ["id"]
+    for f in fields:
+        for c in COMPUTED.get(f, (f,)):
+            if c not in cols:
+                cols.append(c)
+    return cols
+
+
+def iter_rows(cur, cols: list, since: str = None, cursor: int = None, ids: list = None):
+    # Jobs absteigend nach id; ids = Kandidaten aus den Facetten (sonst alle veröffentlichten)
+    where, params = ["status='published'"], []
+    if since:
+        # neu oder geändert seit
+        where.append("(created_at >= ? OR updated_at >= ?)")
+        params += [since, since]
+    sql = f"SELECT {', '.join(cols)} FROM jobs WHERE {' AND '.join(where)}"
+    if ids is None:
+        if cursor is not None:
+            sql += " AND id < ?"
+            params.append(cursor)
+        cur.execute(sql + " ORDER BY id DESC", params)
+        while True:
+            rows = cur.fetchmany(CHUNK)
+            if not rows:
+                return
+            yield from rows
+    ids = sorted((i for i in ids if cursor is None or i < cursor), reverse=True)
+    for start in range(0, len(ids), CHUNK):
+        chunk = ids[start:start + CHUNK]
+        cur.execute(sql + f" AND id IN ({','.join('?' * len(chunk))}) ORDER BY id DESC", params + chunk)
+        yield from cur.fetchall()
+
+
+def project(row, fields: tuple, computed: dict) -> dict:
+    # computed: feld -> fn(row), z. B. skills über job_skills()
+    return {f: computed[f](row) if f in COMPUTED else row[f] for f in fields}
@@ -0,0 +1,144 @@
+# Bestell-Konsole im Admin: Keyset-Pagination über orders.id (neueste zuerst), Filter serverseitig,
+# Job (heiß oder archiviert) und Sponsor per JOIN in derselben Abfrage -> feste Arbeit pro Seite.
+# Cursor: ?before=<id> (ältere) bzw. ?after=<id> (neuere); kein OFFSET.
+from datetime import date
+
+from .config import ADMIN_PAGE_SIZE
+
+_PREFIX_END = "\U0010ffff"  # größer als jedes Zeichen -> [q, q+END) = alle Referenzen mit Präfix q
+
+PAGE_SQL = """
+SELECT o.id, o.job_id, o.price_cents, o.currency, o.reference, o.ab_group, o.status,
+       o.created_at, o.paid_at,
+       COALESCE(j.title, ja.title) AS job_title,
+       ja.id IS NOT NULL AS job_archived,
+       s.id AS sponsor_id, s.company AS sponsor_company, s.website AS sponsor_website,
+       s.status AS sponsor_status, s.starts_at AS sponsor_starts_at, s.ends_at AS sponsor_ends_at
+FROM orders o
+LEFT JOIN jobs j          ON o.job_id != 0 AND j.id = o.job_id
+LEFT JOIN jobs_archive ja ON o.job_id != 0 AND j.id IS NULL AND ja.id = o.job_id
+LEFT JOIN sponsors s      ON s.order_id = o.id
+"""
+# Rechnungsexport: komplette Bestellung plus Rechnungsempfänger (Job heiß/archiviert oder Sponsor)
+EXPORT_SQL = """
+SELECT o.*,
+       COALESCE(j.company, ja.company) AS job_company, COALESCE(j.email, ja.email) AS job_email,
+       s.company AS sponsor_company, s.website AS sponsor_website
+FROM orders o
+LEFT JOIN jobs j          ON o.job_id != 0 AND j.id = o.job_id
+LEFT JOIN jobs_archive ja ON o.job_id != 0 AND j.id IS NULL AND ja.id = o.job_id
+LEFT JOIN sponsors s      ON s.order_id = o.id
+"""
+
+
+def _day(value: str):
+    try:
+        return date.fromisoformat((value or "").strip()[:10]).isoformat()
+    except ValueError:
+        return None
+
+
+def parse_filters(args) -> dict:
+    # request.args -> bereinigte Filter (leere/ungültige Werte fallen weg)
+    f = {}
+    if args.get("status") in ("pending", "paid"):
+        f["status"] = args["status"]
+    if args.get("ab"):
+        f["ab"] = args["ab"].strip()[:8]
+    if args.get("kind") in ("job", "sponsor"):
+        f["kind"] = args["kind"]
+    for key in ("from", "to"):
+        if _day(args.get(key)):
+            f[key] = _day(args[key])
+    q = (args.get("q") or "").strip().upper()
+    if q:
+        f["q"] = q
+        f["match"] = "exact" if args.get("match") == "exact" else "prefix"
+    return f
+
+
+def _id_bounds(cur, f: dict) -> tuple:
+    # Datumsbereich -> id-Bereich (idx_orders_created); ids steigen mit created_at
+    lo = hi = None
+    if "from" in f:
+        cur.execute("SELECT MIN(id) AS i FROM orders WHERE created_at >= ?", (f["from"],))
+        lo = cur.fetchone()["i"]
+        if lo is None:
+            return 0, -1  # nichts ab diesem Tag
+    if "to" in f:
+        cur.execute("SELECT MAX(id) AS i FROM orders WHERE created_at < date(?, '+1 day')", (f["to"],))
+        hi = cur.fetchone()["i"]
+        if hi is None:
+            return 0, -1
+    return lo, hi
+
+
+def _where(cur, f: dict) -> tuple:
+    # Filter -> (Bedingungen, Parameter) für PAGE_SQL/EXPORT_SQL
+    where, params = [], []
+    if "status" in f:
+        where.append("o.status = ?")
+        params.append(f["status"])
+    if "ab" in f:
+        if f["ab"] == "—":
+            where.append("o.ab_group IS NULL")
+        else:
+            where.append("o.ab_group = ?")
+            params.append(f["ab"])
+    if f.get("kind") == "job":
+        where.append("o.job_id != 0")
+    elif f.get("kind") == "sponsor":
+        where.append("o.job_id = 0")
+    if "q" in f:
+        # idx_orders_reference: Gleichheit bzw. Bereich statt LIKE
+        if f["match"] == "exact":
+            where.append("o.reference = ?")
+            params.append(f["q"])
+        else:
+            where.append("o.reference >= ? AND o.reference < ?")
+            params += [f["q"], f["q"] + _PREFIX_END]
+    lo, hi = _id_bounds(cur, f)
+    if lo is not None:
+        where.append("o.id >= ?")
+        params.append(lo)
+    if hi is not None:
+        where.append("o.id <= ?")
+        params.append(hi)
+    return where, params
+
+
+def page(cur, f: dict, before: int = None, after: int = None, limit: int = ADMIN_PAGE_SIZE) -> dict:
+    where, params = _where(cur, f)
+    newer = after is not None and before is None
+    if newer:
+        where.append("o.id > ?")
+        params.append(int(after))
+    elif before is not None:
+        where.append("o.id < ?")
+        params.append(int(before))
+
+    sql = PAGE_SQL + (" WHERE " + " AND ".join(where) if where else "")
+    # bei Referenzsuche wenige Treffer: "+o.id" hält den Planer auf idx_orders_reference statt PK-Scan
+    sql += f" ORDER BY {'+' if 'q' in f else ''}o.id {'ASC' if newer else 'DESC'} LIMIT ?"
+    cur.execute(sql, params + [limit + 1])
+    rows = cur.fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if newer:
+        rows.reverse()
+    for o in rows:
+        o["amount"] = o["price_cents"] / 100.0
+    return dict(
+        orders=rows,
+        # Cursor für die Nachbarseiten; None = keine weitere Seite
+        older=rows[-1]["id"] if rows and (newer or more) else None,
+        newer=rows[0]["id"] if rows and (more if newer else before is not None) else None,
+    )
+
+
+def export_rows(cur, f: dict) -> list:
+    # alle Bestellungen zu den Filtern, älteste zuerst (Rechnungs-ZIP)
+    where, params = _where(cur, f)
+    sql = EXPORT_SQL + (" WHERE " + " AND ".join(where) if where else "")
+    cur.execute(sql + f" ORDER BY {'+' if 'q' in f else ''}o.id", params)
+    return cur.fetchall()
@@ -0,0 +1,177 @@
+import math
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+PRUNE_EVERY = 64  # geteilter Store: nach so vielen neuen Buckets (pro Prozess) aufräumen
+
+
+def parse_rules(spec: str) -> dict:
+    # "write=10/60,render=30/60" -> {"write": (10.0, 10/60 Tokens pro Sekunde)}
+    rules = {}
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part or "=" not in part:
+            continue
+        name, rate = part.split("=", 1)
+        try:
+            n, per = rate.split("/", 1)
+            n, per = float(n), float(per)
+        except ValueError:
+            continue
+        if n > 0 and per > 0:
+            rules[name.strip()] = (n, n / per)
+    return rules
+
+
+class TokenBucketLimiter:
+    # In-Process Token-Buckets pro (Routenklasse, Client-IP), LRU-begrenzt auf max_keys
+
+    def __init__(self, rules: dict, max_keys: int = 10000):
+        self.rules = rules
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [tokens, last_ts]
+        self._lock = threading.Lock()
+        self.allowed = Counter()
+        self.limited = Counter()
+        self.evicted = 0
+
+    def take(self, route_class: str, client: str) -> float:
+        # 0.0 = erlaubt, sonst Sekunden bis zum nächsten Token (für Retry-After)
+        rule = self.rules.get(route_class)
+        if not rule:
+            return 0.0
+        wait = self._take(f"{route_class}|{client}", rule, time.monotonic())
+        with self._lock:
+            if wait:
+                self.limited[route_class] += 1
+            else:
+                self.allowed[route_class] += 1
+        return wait
+
+    def _take(self, key: str, rule, ts: float) -> float:
+        capacity, refill = rule
+        with self._lock:
+            b = self._buckets.get(key)
+            if b is None:
+                b = [capacity, ts]
+                self._buckets[key] = b
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+                    self.evicted += 1
+            else:
+                self._buckets.move_to_end(key)
+            return _consume(b, capacity, refill, ts)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(
+                mode="memory",
+                rules={k: dict(burst=v[0], per_second=round(v[1], 4)) for k, v in self.rules.items()},
+                allowed=dict(self.allowed),
+                limited=dict(self.limited),
+                tracked_keys=len(self._buckets),
+                evicted=self.evicted,
+            )
+
+
+class SqliteTokenBucketLimiter(TokenBucketLimiter):
+    # Geteilte Buckets für mehrere Worker-Prozesse in einer eigenen SQLite-Datei
+    # (getrennt von der Haupt-DB, damit der Limiter nicht mit Job-Writes konkurriert)
+
+    def __init__(self, rules: dict, path: str, max_keys: int = 10000):
+        super().__init__(rules, max_keys=max_keys)
+        self.path = path
+        self._new_keys = 0
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                key     TEXT PRIMARY KEY,
+                tokens  REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_rate_buckets_updated ON rate_buckets(updated)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=2.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _take(self, key: str, rule, ts: float) -> float:
+        capacity, refill = rule
+        # monotonic ist pro Prozess -> für geteilte Buckets Wall-Clock verwenden
+        ts = time.time()
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE key=?", (key,)).fetchone()
+            b = [row[0], row[1]] if row else [capacity, ts]
+            wait = _consume(b, capacity, refill, ts)
+            conn.execute("INSERT OR REPLACE INTO rate_buckets (key, tokens, updated) VALUES (?,?,?)",
+                         (key, b[0], b[1]))
+            # Speicher begrenzen: volle (= lange inaktive) Buckets regelmäßig wegräumen; Zähler statt
+            # hash(key), der ist je Prozess zufällig (PYTHONHASHSEED) -> Aufräumen wäre Glückssache
+            if not row and self._count_new_key() % PRUNE_EVERY == 0:
+                self._prune(conn, ts)
+            conn.execute("COMMIT")
+            return wait
+        except sqlite3.Error:
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            # geteilter Store nicht verfügbar -> lokal weiterzählen statt Requests zu blockieren
+            return super()._take(key, rule, time.monotonic())
+
+    def _count_new_key(self) -> int:
+        with self._lock:
+            self._new_keys += 1
+            return self._new_keys
+
+    def _prune(self, conn, ts: float):
+        slowest = min(r[1] for r in self.rules.values())
+        idle = max(r[0] for r in self.rules.values()) / slowest
+        conn.execute("DELETE FROM rate_buckets WHERE updated < ?", (ts - idle,))
+        n = conn.execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0]
+        if n > self.max_keys:
+            conn.execute("""DELETE FROM rate_buckets WHERE key IN (
+                              SELECT key FROM rate_buckets ORDER BY updated LIMIT ?)""", (n - self.max_keys,))
+            with self._lock:
+                self.evicted += n - self.max_keys
+
+    def stats(self) -> dict:
+        d = super().stats()
+        d["mode"] = "sqlite"
+        try:
+            d["tracked_keys"] = self._conn().execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0]
+        except sqlite3.Error:
+            pass
+        return d
+
+
+def _consume(b, capacity: float, refill: float, ts: float) -> float:
+    tokens = min(capacity, b[0] + max(0.0, ts - b[1]) * refill)
+    b[1] = ts
+    if tokens >= 1.0:
+        b[0] = tokens - 1.0
+        return 0.0
+    b[0] = tokens
+    return (1.0 - tokens) / refill
+
+
+def make_limiter(spec: str, shared_db: str = "", max_keys: int = 10000) -> TokenBucketLimiter:
+    rules = parse_rules(spec)
+    if shared_db:
+        return SqliteTokenBucketLimiter(rules, shared_db, max_keys=max_keys)
+    return TokenBucketLimiter(rules, max_keys=max_keys)
+
+
+def retry_after_header(wait: float) -> str:
+    return str(max(1, math.ceil(wait)))
@@ -1,4 +1,5 @@
 from .db import init_db, db
+from .geo import index_job_geo
 from datetime import datetime, timedelta
 
 def seed():
@@ -30,6 +31,7 @@ def seed():
                            VALUES (?,?,?,?,?,?,?)""",
                         (j["title"], j["company"], j["location"], j["email"], j["logo_url"], j["description"],
                          (datetime.utcnow() + timedelta(hours=72)).isoformat(sep=" ", timespec="seconds")))
+            index_job_geo(cur, cur.lastrowid, j["location"])
     print("Demo-Jobs eingefügt.")
 
 if __name__ == "__main__":
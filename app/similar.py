@@ -0,0 +1,196 @@
+# "Ähnliche Jobs": gehashte TF-IDF-Vektoren (Titel, Beschreibung, Skills) als NumPy-Matrix.
+# Komplett neu bauen:  python -m app.similar
+# Beim Einstellen eines Jobs aktualisiert update_job() nur den neuen Job und seine Nachbarn.
+import math
+import re
+import sys
+import time
+import zlib
+
+from .config import SIMILAR_TOP_K, SIMILAR_CANDIDATES
+
+DIM = 512                 # Hashing-Trick: Vokabular -> DIM Buckets
+MIN_SCORE = 0.08          # darunter gilt nichts als "ähnlich"
+TITLE_WEIGHT = 2.0
+SKILL_WEIGHT = 3.0
+
+_TOKEN_RE = re.compile(r"[a-zäöüß0-9][a-zäöüß0-9+#.]*[a-zäöüß0-9+#]")
+STOPWORDS = set("""
+und oder der die das den dem des ein eine einer eines einem mit für von im in am an auf aus bei
+zu zum zur als ist sind wir ihr sie du dich dein deine uns unser unsere nicht auch sowie über
+and or the a an of for to in on at with as is are we you our your be by from
+m w d mwd gmbh ag job jobs stelle team
+""".split())
+
+
+def terms(title: str, description: str, skills=()) -> dict:
+    counts = {}
+    for weight, text in ((TITLE_WEIGHT, title), (1.0, description)):
+        for t in _TOKEN_RE.findall((text or "").lower()):
+            if len(t) > 1 and t not in STOPWORDS:
+                counts[t] = counts.get(t, 0.0) + weight
+    for s in skills:
+        counts["skill:" + s] = counts.get("skill:" + s, 0.0) + SKILL_WEIGHT
+    return counts
+
+
+def _bucket(term: str) -> int:
+    return zlib.crc32(term.encode("utf-8")) % DIM
+
+
+def vectorize(counts: dict, idf):
+    import numpy as np
+    v = np.zeros(DIM, dtype=np.float32)
+    for t, c in counts.items():
+        h = _bucket(t)
+        v[h] += (1.0 + math.log(c)) * idf[h]
+    n = float(np.linalg.norm(v))
+    return v / n if n else v
+
+
+def _load_idf(cur):
+    import numpy as np
+    cur.execute("SELECT idf FROM similar_meta WHERE id=1")
+    row = cur.fetchone()
+    if row and row["idf"]:
+        return np.frombuffer(row["idf"], dtype=np.float32)
+    return np.ones(DIM, dtype=np.float32)
+
+
+def _top_k(sims, ids, k: int):
+    import numpy as np
+    if len(sims) == 0:
+        return []
+    k = min(k, len(sims))
+    idx = np.argpartition(-sims, k - 1)[:k]
+    idx = idx[np.argsort(-sims[idx])]
+    return [(int(ids[i]), float(sims[i])) for i in idx if sims[i] >= MIN_SCORE]
+
+
+def _store(cur, job_id: int, neighbours):
+    cur.execute("DELETE FROM job_similar WHERE job_id=?", (job_id,))
+    cur.executemany("INSERT INTO job_similar (job_id, rank, similar_id, score) VALUES (?,?,?,?)",
+                    [(job_id, r, sid, round(score, 4)) for r, (sid, score) in enumerate(neighbours)])
+
+
+def _store_block(cur, items):
+    for job_id, neighbours in items:
+        _store(cur, job_id, neighbours)
+
+
+def _store_vectors(cur, items):
+    cur.executemany("INSERT OR REPLACE INTO job_vectors (job_id, vec) VALUES (?,?)", items)
+
+
+def _finish(cur, idf: bytes, n: int):
+    # nicht (mehr) veröffentlichte Jobs verlassen Nachbarlisten und Vektoren
+    cur.execute("DELETE FROM job_similar WHERE job_id NOT IN (SELECT id FROM jobs WHERE status='published')")
+    cur.execute("DELETE FROM job_vectors WHERE job_id NOT IN (SELECT id FROM jobs WHERE status='published')")
+    cur.execute("INSERT OR REPLACE INTO similar_meta (id, idf, built_at, n_jobs) VALUES (1, ?, datetime('now'), ?)",
+                (idf, n))
+
+
+def rebuild(conn, skills_fn, k: int = SIMILAR_TOP_K, block: int = 256, run=None) -> int:
+    # Offline-Neuaufbau: IDF, alle Vektoren, Top-k per blockweiser Matrixmultiplikation.
+    # run=None: alles über conn in einer Transaktion. run=fn(job, *args) (z. B. writer.run): conn nur
+    # lesen, jeder Block ist ein eigener kurzer Schreibjob -> andere Schreiber warten höchstens einen Block
+    import numpy as np
+    write = run or (lambda fn, *args: fn(conn.cursor(), *args))
+    cur = conn.cursor()
+    cur.execute("SELECT id, title, description FROM jobs WHERE status='published' ORDER BY id")
+    jobs = cur.fetchall()
+    n = len(jobs)
+    docs = [terms(j["title"], j["description"], skills_fn(f"{j['title']} {j['description']}")) for j in jobs]
+
+    df = np.zeros(DIM, dtype=np.float64)
+    for d in docs:
+        df[list({_bucket(t) for t in d})] += 1
+    idf = np.log((1.0 + n) / (1.0 + df)).astype(np.float32) + 1.0
+
+    ids = np.array([j["id"] for j in jobs], dtype=np.int64)
+    m = np.zeros((n, DIM), dtype=np.float32)
+    for i, d in enumerate(docs):
+        m[i] = vectorize(d, idf)
+
+    # Listen werden je Job ersetzt (kein DELETE vorab) -> Leser sehen nie leere Nachbarlisten
+    for start in range(0, n, block):
+        sims = m[start:start + block] @ m.T
+        items = []
+        for r in range(sims.shape[0]):
+            sims[r, start + r] = -1.0  # sich selbst ausschließen
+            items.append((int(ids[start + r]), _top_k(sims[r], ids, k)))
+        write(_store_block, items)
+        write(_store_vectors, [(int(ids[i]), m[i].astype(np.float16).tobytes())
+                               for i in range(start, min(start + block, n))])
+    write(_finish, idf.tobytes(), n)
+    return n
+
+
+def update_job(cur, job_id: int, title: str, description: str, skills=(), k: int = SIMILAR_TOP_K) -> int:
+    # inkrementell: neuen Job gegen die letzten SIMILAR_CANDIDATES Vektoren vergleichen,
+    # eigene Top-k speichern und bei Nachbarn einsortieren, deren k-ter Score kleiner ist
+    import numpy as np
+    idf = _load_idf(cur)
+    v = vectorize(terms(title, description, skills), idf)
+    cur.execute("""SELECT v.job_id, v.vec FROM job_vectors v JOIN jobs j ON j.id = v.job_id
+                   WHERE j.status='published' AND v.job_id != ?
+                   ORDER BY v.job_id DESC LIMIT ?""", (job_id, SIMILAR_CANDIDATES))
+    rows = cur.fetchall()
+    cur.execute("INSERT OR REPLACE INTO job_vectors (job_id, vec) VALUES (?,?)",
+                (job_id, v.astype(np.float16).tobytes()))
+    if not rows:
+        _store(cur, job_id, [])
+        return 0
+    ids = np.array([r["job_id"] for r in rows], dtype=np.int64)
+    m = np.frombuffer(b"".join(r["vec"] for r in rows), dtype=np.float16).reshape(len(rows), DIM)
+    sims = m.astype(np.float32) @ v
+    neighbours = _top_k(sims, ids, k)
+    _store(cur, job_id, neighbours)
+
+    # Rückrichtung: nur Jobs anfassen, für die der neue Job überhaupt infrage kommt
+    hit = sims >= MIN_SCORE
+    cand = dict(zip(ids[hit].tolist(), sims[hit].tolist()))
+    if not cand:
+        return len(neighbours)
+    marks = ",".join("?" * len(cand))
+    cur.execute(f"""SELECT job_id, COUNT(*) AS n, MIN(score) AS low FROM job_similar
+                    WHERE job_id IN ({marks}) GROUP BY job_id""", tuple(cand))
+    current = {r["job_id"]: (r["n"], r["low"]) for r in cur.fetchall()}
+    for other, score in cand.items():
+        n, low = current.get(other, (0, 0.0))
+        if n >= k and score <= low:
+            continue
+        cur.execute("SELECT similar_id, score FROM job_similar WHERE job_id=? ORDER BY rank", (other,))
+        lst = [(r["similar_id"], r["score"]) for r in cur.fetchall() if r["similar_id"] != job_id]
+        lst.append((job_id, score))
+        lst.sort(key=lambda x: -x[1])
+        _store(cur, other, lst[:k])
+    return len(neighbours)
+
+
+def similar_jobs(cur, job_id: int, limit: int = SIMILAR_TOP_K):
+    # eine indizierte Abfrage für das Panel auf der Detailseite
+    cur.execute("""SELECT j.id, j.title, j.company, j.location, j.version
+                   FROM job_similar s JOIN jobs j ON j.id = s.similar_id
+                   WHERE s.job_id=? AND j.status='published'
+                   ORDER BY s.rank LIMIT ?""", (job_id, limit))
+    return cur.fetchall()
+
+
+def main() -> int:
+    from .app import job_skills
+    from .db import db, read_db
+
+    def run(fn, *args):
+        with db() as conn:
+            return fn(conn.cursor(), *args)
+
+    t = time.perf_counter()
+    with read_db() as conn:
+        n = rebuild(conn, job_skills, run=run)
+    print(f"Ähnliche Jobs neu berechnet: {n} Jobs in {time.perf_counter() - t:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+# Autovervollständigung für Stichwort (q) und Ort (loc): je Feld ein sortiertes Array
+# normalisierter Schlüssel -> Präfix-Suche per bisect ergibt einen zusammenhängenden Bereich,
+# Ranking nach Häufigkeit (Anzahl veröffentlichter Jobs je Begriff).
+# Begriffe: q = Titel, Firmen, Skill-Labels; loc = kanonische Städtenamen (plus Gazetteer-Aliase
+# als Schlüssel). Jeder Begriff ist ab jedem Wortanfang auffindbar ("engineer" -> "Senior Python Engineer").
+# Pflege inkrementell über job_changes wie FacetIndex: pro Job die Begriffe merken, bei Änderung
+# alte abziehen, neue addieren. Antworten je (Feld, Präfix) im LRU; geänderte Begriffe räumen
+# genau ihre Präfixe aus dem Cache.
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from . import geo
+from .config import SUGGEST_CACHE_SIZE, SUGGEST_SYNC_SECONDS
+from .db import read_db
+
+FIELDS = ("q", "loc")
+LIMIT = 8
+MAX_PREFIX = 40
+_KEY_END = "\x7f"  # Schlüssel bestehen nur aus [a-z0-9 ] -> [p, p+END) = alle mit Präfix p
+
+
+def normalize(s: str) -> str:
+    # "  Mün " -> "mun"; Umlaut-Umschreibung steckt als zweite Schlüsselvariante im Index
+    return " ".join(geo.tokens(s))
+
+
+def term_keys(kind: str, display: str) -> set:
+    # alle Suchschlüssel eines Begriffs: ab jedem Wortanfang, mit und ohne Umlaut-Umschreibung
+    names = [display]
+    if kind == "city":
+        c = geo.city(geo.canonical_slug(geo.city_slug(display)) or "")
+        if c:
+            names += c["aliases"]
+    keys = set()
+    for name in names:
+        for variant in geo._key_variants(name):
+            for i in range(len(variant)):
+                keys.add(" ".join(variant[i:]))
+    return keys
+
+
+class Suggester:
+
+    def __init__(self, extractors: dict, cache_size: int = SUGGEST_CACHE_SIZE):
+        # extractors: feld -> fn(job_row) -> iterable von (art, anzeige), z. B. ("skill", "Django")
+        self.extractors = extractors
+        self._counts = {f: {} for f in extractors}   # (art, anzeige) -> Anzahl Jobs
+        self._keys = {f: [] for f in extractors}     # sortiert: (schlüssel, art, anzeige)
+        self._terms = {}                             # job_id -> {feld: set((art, anzeige))}
+        self._cache = OrderedDict()                  # (feld, präfix) -> Vorschläge
+        self.cache_size = cache_size
+        self._seq = -1
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.incremental = 0
+
+    # --- Pflege ---
+    def _terms_of(self, job) -> dict:
+        if not job or job["status"] != "published":
+            return {}
+        return {f: set(fn(job)) for f, fn in self.extractors.items()}
+
+    def _add(self, field: str, term: tuple, delta: int):
+        counts = self._counts[field]
+        n = counts.get(term, 0) + delta
+        keys, term_k = self._keys[field], term_keys(*term)
+        if n > 0:
+            counts[term] = n
+            if n == delta:  # neuer Begriff
+                for k in term_k:
+                    insort(keys, (k,) + term)
+        else:
+            counts.pop(term, None)
+            for k in term_k:
+                i = bisect_left(keys, (k,) + term)
+                if i < len(keys) and keys[i] == (k,) + term:
+                    del keys[i]
+        # Anzahl bzw. Bestand geändert -> alle Präfixe dieses Begriffs neu beantworten
+        for k in term_k:
+            for i in range(1, min(len(k), MAX_PREFIX) + 1):
+                self._cache.pop((field, k[:i]), None)
+
+    def _apply(self, job_id: int, job):
+        old = self._terms.pop(job_id, {})
+        new = self._terms_of(job)
+        if new:
+            self._terms[job_id] = new
+        for f in self.extractors:
+            for term in old.get(f, set()) - new.get(f, set()):
+                self._add(f, term, -1)
+            for term in new.get(f, set()) - old.get(f, set()):
+                self._add(f, term, 1)
+
+    def _rebuild(self, cur):
+        cur.execute("SELECT COALESCE(MAX(seq), 0) AS s FROM job_changes")
+        seq = cur.fetchone()["s"]
+        cur.execute("SELECT * FROM jobs WHERE status='published'")
+        terms, counts = {}, {f: {} for f in self.extractors}
+        for j in cur.fetchall():
+            terms[j["id"]] = t = self._terms_of(j)
+            for f, ts in t.items():
+                for term in ts:
+                    counts[f][term] = counts[f].get(term, 0) + 1
+        self._keys = {f: sorted((k,) + term for term in c for k in term_keys(*term)) for f, c in counts.items()}
+        self._counts = counts
+        self._terms = terms
+        self._cache.clear()
+        self._seq = seq
+        self.rebuilds += 1
+
+    def sync(self, max_age: float = SUGGEST_SYNC_SECONDS):
+        # Änderungs-Log höchstens alle max_age Sekunden prüfen (eigene Verbindung kostet mehr als die Suche)
+        if self._seq >= 0 and time.monotonic() - self._checked < max_age:
+            return self
+        with self._lock, read_db() as conn:
+            cur = conn.cursor()
+            self._checked = time.monotonic()
+            if self._seq < 0:
+                self._rebuild(cur)
+                return self
+            cur.execute("SELECT MIN(seq) AS lo FROM job_changes")
+            lo = cur.fetchone()["lo"]
+            if lo is not None and lo > self._seq + 1:
+                self._rebuild(cur)
+                return self
+            cur.execute("SELECT seq, job_id FROM job_changes WHERE seq > ? ORDER BY seq", (self._seq,))
+            changes = cur.fetchall()
+            if not changes:
+                return self
+            changed = sorted({c["job_id"] for c in changes})
+            for start in range(0, len(changed), 500):
+                chunk = changed[start:start + 500]
+                cur.execute(f"SELECT * FROM jobs WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+                rows = {r["id"]: r for r in cur.fetchall()}
+                for job_id in chunk:
+                    self._apply(job_id, rows.get(job_id))
+            self._seq = changes[-1]["seq"]
+            self.incremental += len(changed)
+        return self
+
+    # --- Abfragen ---
+    def suggest(self, field: str, prefix: str, limit: int = LIMIT) -> list:
+        # -> [(anzeige, art, anzahl)], häufigste zuerst; je Anzeige nur einmal
+        p = normalize(prefix)[:MAX_PREFIX]
+        if field not in self._keys or not p:
+            return []
+        with self._lock:
+            hit = self._cache.get((field, p))
+            if hit is not None:
+                self._cache.move_to_end((field, p))
+                self.hits += 1
+                return hit[:limit]
+            self.misses += 1
+            keys, counts = self._keys[field], self._counts[field]
+            lo, hi = bisect_left(keys, (p,)), bisect_left(keys, (p + _KEY_END,))
+            best = {}
+            for _, kind, display in keys[lo:hi]:
+                n = counts[(kind, display)]
+                if best.get(display, (0,))[0] < n:
+                    best[display] = (n, kind)
+            top = heapq.nsmallest(LIMIT, best.items(), key=lambda x: (-x[1][0], len(x[0]), x[0]))
+            out = [(display, kind, n) for display, (n, kind) in top]
+            self._cache[(field, p)] = out
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return out[:limit]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(terms={f: len(c) for f, c in self._counts.items()},
+                        keys={f: len(k) for f, k in self._keys.items()},
+                        cached=len(self._cache), hits=self.hits, misses=self.misses,
+                        seq=self._seq, rebuilds=self.rebuilds, incremental_updates=self.incremental)
@@ -0,0 +1,132 @@
+# Ein Schreib-Thread pro Prozess besitzt die einzige Schreibverbindung.
+# Views reichen Schreibjobs ein (submit/run) und warten ggf. auf das Future; was sich in der
+# Queue angesammelt hat, läuft in einer gemeinsamen Transaktion (Group Commit).
+# Jeder Job bekommt einen eigenen SAVEPOINT: ein Fehler rollt nur diesen Job zurück.
+# Mehrere Worker-Prozesse: je ein Writer, serialisiert über BEGIN IMMEDIATE + busy_timeout.
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from .config import WRITER_MAX_BATCH, WRITER_LINGER_MS, WRITER_TIMEOUT
+from .db import get_connection
+
+log = logging.getLogger(__name__)
+
+
+@contextmanager
+def savepoint(cur, name: str = "sp"):
+    # verschachtelbare Teiltransaktion innerhalb eines Schreibjobs
+    cur.execute(f"SAVEPOINT {name}")
+    try:
+        yield cur
+    except BaseException:
+        cur.execute(f"ROLLBACK TO {name}")
+        cur.execute(f"RELEASE {name}")
+        raise
+    cur.execute(f"RELEASE {name}")
+
+
+class Writer:
+
+    def __init__(self, max_batch: int = WRITER_MAX_BATCH, linger_ms: float = WRITER_LINGER_MS):
+        self.max_batch = max_batch
+        self.linger = linger_ms / 1000.0
+        self._q = queue.SimpleQueue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.jobs = 0
+        self.failed = 0
+        self.batches = 0
+        self.batch_errors = 0
+        self.max_batch_seen = 0
+
+    def _ensure_thread(self):
+        # erst beim ersten Schreibjob starten; nach fork (gunicorn --preload) neu
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._q = queue.SimpleQueue()
+            elif self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop, name="sqlite-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, fn, *args) -> Future:
+        # fn(cur, *args) läuft im Writer-Thread; kein Zugriff auf request/session/g dort
+        self._ensure_thread()
+        fut = Future()
+        self._q.put((fut, fn, args))
+        return fut
+
+    def run(self, fn, *args):
+        # submit + warten; Exceptions aus fn kommen hier wieder an
+        return self.submit(fn, *args).result(timeout=WRITER_TIMEOUT)
+
+    # --- Writer-Thread ---
+    def _collect(self):
+        batch = [self._q.get()]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._q.get(timeout=self.linger) if self.linger else self._q.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        conn = get_connection()
+        conn.isolation_level = None  # Transaktionen selbst steuern
+        cur = conn.cursor()
+        cur.execute("PRAGMA synchronous=NORMAL")  # im WAL-Modus crash-sicher
+        while True:
+            self._commit_batch(conn, cur, self._collect())
+
+    def _commit_batch(self, conn, cur, batch):
+        done = []
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            for fut, fn, args in batch:
+                if not fut.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with savepoint(cur, "job"):
+                        done.append((fut, True, fn(cur, *args)))
+                except Exception as e:
+                    done.append((fut, False, e))
+            cur.execute("COMMIT")
+        except Exception as e:
+            # BEGIN/COMMIT gescheitert (z. B. Lock eines anderen Prozesses länger als busy_timeout)
+            if conn.in_transaction:
+                conn.rollback()
+            self.batch_errors += 1
+            log.warning("Schreib-Batch mit %d Jobs verworfen: %s", len(batch), e)
+            for fut, _, _ in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        self.batches += 1
+        self.jobs += len(done)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        for fut, ok, value in done:
+            if ok:
+                fut.set_result(value)
+            else:
+                self.failed += 1
+                log.warning("Schreibjob fehlgeschlagen: %r", value)
+                fut.set_exception(value)
+
+    def stats(self) -> dict:
+        return dict(
+            jobs=self.jobs, failed=self.failed,
+            batches=self.batches, batch_errors=self.batch_errors,
+            avg_batch=round(self.jobs / self.batches, 2) if self.batches else 0.0,
+            max_batch=self.max_batch_seen, queued=self._q.qsize(),
+        )
+
+
+writer = Writer()
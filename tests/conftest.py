@@ -0,0 +1,9 @@
+# Vor dem ersten Import der App: Datenbank, Mail-Ausgang und Bild-Cache in ein Temp-Verzeichnis
+# (app.app legt beim Import das Schema an und startet Writer/Sender)
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="pydach-tests-")
+os.environ.setdefault("DB_PATH", os.path.join(_tmp, "test.sqlite3"))
+os.environ.setdefault("ALERT_MAIL_DIR", os.path.join(_tmp, "mail_outbox"))
+os.environ.setdefault("IMG_CACHE_DIR", os.path.join(_tmp, "img_cache"))
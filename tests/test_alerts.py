@@ -0,0 +1,90 @@
+# Job-Alerts Ende-zu-Ende: Anmelden (Double Opt-in) -> Import -> Outbox -> Versand über FileTransport,
+# One-Click-Abmeldung (RFC 8058). Datenbank/Mail-Ausgang: tests/conftest.py
+import email
+from email import policy
+
+import pytest
+
+from app import alerts, ingest
+from app.app import alert_sender, app, job_skills
+from app.db import db, read_db
+
+
+def run(fn, *a):
+    with db() as conn:
+        return fn(conn.cursor(), *a)
+
+
+def query(sql, *args):
+    with read_db() as conn:
+        return conn.execute(sql, args).fetchall()
+
+
+def mails(directory) -> list:
+    return [email.message_from_bytes(p.read_bytes(), policy=policy.default) for p in sorted(directory.glob("*.eml"))]
+
+
+@pytest.fixture
+def client(tmp_path):
+    alert_sender.transport = alerts.FileTransport(tmp_path / "confirm")
+    return app.test_client()
+
+
+def subscribe(client, mail, **search) -> str:
+    r = client.post("/alerts", data=dict(email=mail, **search))
+    assert r.status_code == 302
+    (row,) = query("SELECT token, status FROM alerts WHERE email=?", mail)
+    assert row["status"] == "pending"
+    return row["token"]
+
+
+def feed(source, records):
+    lines = [(n, rec, None) for n, rec in enumerate(records, 1)]
+    ingest.ingest(lines, source, lambda src, rows: run(ingest.write_chunk, src, rows))
+    while run(ingest.process_pending, job_skills):
+        pass
+
+
+def test_subscribe_confirm_send_unsubscribe(client, tmp_path):
+    django = subscribe(client, "django@example.org", q="Django")
+    berlin = subscribe(client, "berlin@example.org", loc="Berlin")
+    subscribe(client, "never@example.org", q="Django")  # nie bestätigt -> keine Alert-Mail
+    alert_sender._thread.join(5)
+
+    # Bestätigungsmails; GET zeigt nur das Formular
+    confirm = mails(tmp_path / "confirm")
+    assert sorted(m["To"] for m in confirm) == ["berlin@example.org", "django@example.org", "never@example.org"]
+    assert client.get(f"/alerts/confirm/{django}").status_code == 200
+    assert query("SELECT status FROM alerts WHERE token=?", django)[0]["status"] == "pending"
+    for token in (django, berlin):
+        assert client.post(f"/alerts/confirm/{token}").status_code == 302
+    assert query("SELECT COUNT(*) AS n FROM alerts WHERE status='active'")[0]["n"] == 2
+
+    feed("alerttest", [
+        dict(id="a1", title="Django Developer", company="Muster GmbH", location="Berlin", description="Python, Django"),
+        dict(id="a2", title="Django Engineer", company="Beispiel AG", location="Wien", description="Python, Django"),
+        dict(id="a3", title="Data Engineer", company="Beispiel AG", location="Hamburg", description="Python, Spark"),
+    ])
+    out = tmp_path / "out"
+    assert alerts.drain_once(run, alerts.FileTransport(out)) > 0
+    sent = {m["To"]: m for m in mails(out)}
+    assert len(mails(out)) == 2 and set(sent) == {"django@example.org", "berlin@example.org"}
+    body = sent["django@example.org"].get_content()
+    assert "Django Developer" in body and "Django Engineer" in body and "Data Engineer" not in body
+    assert "Django Developer" in sent["berlin@example.org"].get_content()
+    assert sent["django@example.org"]["List-Unsubscribe"].endswith(f"/alerts/off/{django}>")
+    assert sent["django@example.org"]["List-Unsubscribe-Post"] == "List-Unsubscribe=One-Click"
+    assert alerts.drain_once(run, alerts.FileTransport(out)) == 0  # nichts doppelt
+
+    # One-Click aus dem Mail-Client: POST mit List-Unsubscribe=One-Click, Terme raus aus dem Index
+    (alert_id,) = [r["id"] for r in query("SELECT id FROM alerts WHERE token=?", django)]
+    assert query("SELECT COUNT(*) AS n FROM alert_terms WHERE alert_id=?", alert_id)[0]["n"] > 0
+    r = client.post(f"/alerts/off/{django}", data={"List-Unsubscribe": "One-Click"})
+    assert r.status_code == 200 and r.data == b""
+    assert query("SELECT status FROM alerts WHERE id=?", alert_id)[0]["status"] == "off"
+    assert query("SELECT COUNT(*) AS n FROM alert_terms WHERE alert_id=?", alert_id)[0]["n"] == 0
+
+    feed("alerttest", [dict(id="a4", title="Django Lead", company="Muster GmbH", location="Berlin",
+                            description="Python, Django")])
+    alerts.drain_once(run, alerts.FileTransport(tmp_path / "after"))
+    assert [m["To"] for m in mails(tmp_path / "after")] == ["berlin@example.org"]
@@ -0,0 +1,84 @@
+# Kontoauszug-Import gegen die Beispieldateien im Repo (CAMT.053 und MT940, anonymisiert).
+#   python -m pytest -q
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from app import bankimport
+from app.db import dict_factory
+
+ROOT = Path(__file__).resolve().parent.parent
+SAMPLES = [("bank_sample_camt053.xml", "camt"), ("bank_sample.sta", "mt940")]
+
+
+def read(name: str, fmt: str) -> list:
+    with open(ROOT / name, "rb") as f:
+        assert bankimport.detect_format(f.read(64), name) == fmt
+        f.seek(0)
+        return list(bankimport.read_statement(f, fmt))
+
+
+@pytest.fixture
+def cur():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = dict_factory  # wie app.db
+    conn.execute("""CREATE TABLE orders (id INTEGER PRIMARY KEY, reference TEXT, price_cents INTEGER,
+                                         currency TEXT, status TEXT)""")
+    conn.executemany("INSERT INTO orders VALUES (?,?,?,?,?)", [
+        (1, "PYDACH-00001-TEST", 14900, "EUR", "pending"),
+        (2, "PYDACH-00002-TEST", 19900, "EUR", "pending"),
+        (3, "PYDACH-00003-TEST", 14900, "EUR", "pending"),
+        (4, "PYDACH-00004-TEST", 19900, "EUR", "paid"),
+    ])
+    yield conn.cursor()
+    conn.close()
+
+
+def reconcile(cur, entries: list, dry_run: bool = False) -> tuple:
+    paid = []
+    report = bankimport.reconcile(entries, lambda block: bankimport.reconcile_batch(
+        cur, block, lambda c, order_id: paid.append(order_id), dry_run), batch=2)
+    return report, paid
+
+
+def test_camt_credits_only_and_batched_txdtls():
+    entries = read("bank_sample_camt053.xml", "camt")
+    # Lastschrift fällt weg, der Sammler (Eintrag 5) liefert je TxDtls eine Gutschrift
+    assert [(e[0], e[1]) for e in entries] == [(1, 14900), (2, 15000), (3, 4990), (5, 14900), (5, 19900)]
+    assert entries[3][3] == "PYDACH-00003-TEST" and entries[3][5] == "Erika Mustermann"
+    assert entries[4][3] == "PYDACH-00004-TEST"  # EndToEndId statt RmtInf
+    assert entries[2][3] == "Rechnung 4711 danke"  # AddtlNtryInf ohne TxDtls
+
+
+def test_mt940_subfields():
+    entries = read("bank_sample.sta", "mt940")
+    assert [(e[0], e[1], e[4]) for e in entries] == [(1, 14900, "2025-11-01"), (2, 15000, "2025-11-02"),
+                                                     (3, 4990, "2025-11-02"), (5, 19900, "2025-11-03")]
+    # Referenz über die ?20/?21-Grenze umbrochen
+    assert entries[0][3] == "PYDACH-00001-TEST Featured"
+    assert entries[0][5] == "Muster Software GmbH"
+    # :86: über zwei Zeilen, Name aus ?32 + ?33
+    assert entries[3][3] == "Sponsoring PYDACH-00004-TEST" and entries[3][5] == "Max Mustermann"
+
+
+@pytest.mark.parametrize("name,fmt", SAMPLES)
+def test_reconcile(cur, name, fmt):
+    report, paid = reconcile(cur, read(name, fmt))
+    assert [e["order_id"] for e in report["matched"]] == ([1, 3, 4] if fmt == "camt" else [1, 4])
+    assert [(e["order_id"], e["amount"], e["expected"]) for e in report["mismatched"]] == [(2, 150.0, 199.0)]
+    assert [e["line"] for e in report["unknown"]] == [3]
+    assert paid == ([1, 3] if fmt == "camt" else [1])
+    assert report["already_paid"] == 1
+    assert report["entries"] == sum(report["counts"].values())
+
+
+def test_dry_run_marks_nothing(cur):
+    report, paid = reconcile(cur, read(*SAMPLES[0]), dry_run=True)
+    assert paid == [] and report["newly_paid"] == 2
+
+
+def test_duplicate_credit_counts_once(cur):
+    entries = read(*SAMPLES[0])[:1] * 2
+    report, paid = reconcile(cur, entries)
+    assert paid == [1] and report["newly_paid"] == 1 and report["already_paid"] == 1
@@ -0,0 +1,106 @@
+# Bild-Proxy gegen einen lokalen HTTP-Server (http.server) als Stand-in für fremde Hosts.
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import pytest
+
+from app import imgproxy
+
+
+def _png(size=(300, 200)) -> bytes:
+    from PIL import Image
+    img = Image.effect_noise(size, 64).convert("RGB")  # Rauschen: komprimiert schlecht -> gut abschneidbar
+    out = BytesIO()
+    img.save(out, format="PNG")
+    return out.getvalue()
+
+
+@pytest.fixture(scope="module")
+def server():
+    logo = _png()
+    files = {
+        "/logo.png": ("image/png", logo),
+        "/truncated.png": ("image/png", logo[:len(logo) // 2]),  # Header ok, Dekodieren scheitert
+        "/page": ("text/html", b"<html></html>"),
+    }
+    hits = Counter()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits[self.path] += 1
+            if self.path == "/moved":
+                self.send_response(302)
+                self.send_header("Location", "/logo.png")
+                self.end_headers()
+                return
+            if self.path not in files:
+                self.send_error(404)
+                return
+            ctype, body = files[self.path]
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", hits
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(imgproxy, "IMG_ALLOW_PRIVATE", True)  # wie IMG_ALLOW_PRIVATE=1
+    c = imgproxy.ImageCache(tmp_path, workers=2)
+    yield c
+    c._pool.shutdown(wait=True)
+
+
+def produce(cache, url, variant="logo", fmt="webp"):
+    return cache.produce(imgproxy.image_key(url), url, variant, fmt)
+
+
+def test_private_host_rejected(server):
+    base, _ = server
+    with pytest.raises(ValueError, match="nicht erlaubt"):
+        imgproxy.fetch(f"{base}/logo.png")
+
+
+def test_fetch_render_and_cache(server, cache):
+    from PIL import Image
+    base, hits = server
+    url = f"{base}/logo.png"
+    path, sha = produce(cache, url)
+    assert Image.open(path).format == "WEBP" and max(Image.open(path).size) == 128
+    assert cache.cached(imgproxy.image_key(url), "logo", "webp") == (path, sha)
+    # weitere Variante aus dem gespeicherten Original, kein zweiter Abruf
+    path_sm, _ = produce(cache, url, "logo-sm", "png")
+    assert Image.open(path_sm).format == "PNG" and max(Image.open(path_sm).size) == 64
+    assert hits["/logo.png"] == 1
+    assert cache.stats()["fetched"] == 1 and cache.stats()["errors"] == 0
+
+
+def test_redirect_followed(server, cache):
+    base, _ = server
+    assert produce(cache, f"{base}/moved") is not None
+
+
+@pytest.mark.parametrize("path", ["/page", "/missing.png", "/truncated.png"])
+def test_failures_cached(server, cache, path):
+    base, hits = server
+    url = f"{base}{path}"
+    before = hits[path]
+    assert produce(cache, url) is None
+    assert (cache.root / "src" / imgproxy.image_key(url)).read_text().startswith("!")
+    assert cache.stats()["errors"] == 1
+    # negativer Eintrag: kein neuer Abruf, auch nicht für andere Varianten
+    assert produce(cache, url, "banner", "png") is None
+    assert hits[path] == before + 1
+    assert cache.stats()["errors"] == 1